@@ -1,20 +1,159 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from model.schemas import BatchProcessRequest, BatchProcessResponse
-from services.video_processor import VideoProcessor
+import asyncio
+import hmac
+import json
+from typing import Literal
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
 from core.config import settings
+from model.schemas import (
+    BatchProcessRequest,
+    BatchProcessResponse,
+    TaskStatusResponse,
+    TaskSubmitResponse,
+)
+from services.job_manager import JobManager
+from services.job_store import create_job_store
+from services.resilience import BatchTooLargeError, OverloadedError
+from services.sheet_ledger import create_sheet_ledger, export_rows
+from services.video_processor import VideoProcessor
+from services.work_queue import create_work_queue
+from utils.apify_runs import run_watcher
 
 router = APIRouter()
+
+
+def _rejected(e: Exception) -> HTTPException:
+    """429 with Retry-After when the service is full, 413 for a batch too big to fit."""
+    if isinstance(e, OverloadedError):
+        return HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    return HTTPException(status_code=413, detail=str(e))
+
+
 video_processor = VideoProcessor()
+job_manager = JobManager(
+    video_processor,
+    create_job_store(),
+    create_work_queue() if settings.EXECUTION_MODE == "queue" else None,
+    create_sheet_ledger(),
+)
 
 @router.post("/process-batch", response_model=BatchProcessResponse)
 async def process_batch(request: BatchProcessRequest, background_tasks: BackgroundTasks):
     try:
-        results = await video_processor.process_batch(request.urls, request.sheet_name)
+        if job_manager.queue is not None:
+            # Workers do the processing; wait for them like a submitted job
+            results = await job_manager.wait(await job_manager.submit(request))
+        else:
+            results = await job_manager.process_now(request)
         return BatchProcessResponse(
             results=results,
             total_processed=len(results),
             successful=sum(1 for r in results if r.status == "success"),
             failed=sum(1 for r in results if r.status == "failed")
         )
+    except (OverloadedError, BatchTooLargeError) as e:
+        raise _rejected(e) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/process-batch/submit", response_model=TaskSubmitResponse, status_code=202
+)
+async def submit_batch(request: BatchProcessRequest):
+    try:
+        task_id = await job_manager.submit(request)
+    except (OverloadedError, BatchTooLargeError) as e:
+        raise _rejected(e) from e
+    return TaskSubmitResponse(
+        task_id=task_id, status="pending", total=len(request.urls)
+    )
+
+
+@router.get("/status/{task_id}", response_model=TaskStatusResponse)
+async def get_status(task_id: str):
+    status = await asyncio.to_thread(job_manager.status, task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task: {task_id}")
+    return status
+
+
+@router.get("/results/{task_id}/stream")
+async def stream_results(task_id: str):
+    """Stream each item's GIFResponse as NDJSON as soon as it is ready."""
+    if await asyncio.to_thread(job_manager.status, task_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task: {task_id}")
+
+    async def lines():
+        async for index, result in job_manager.stream(task_id):
+            yield json.dumps({"index": index, "result": result.model_dump()}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/apify/webhook", status_code=204)
+async def apify_webhook(request: Request, secret: str = ""):
+    """Receive Apify run-finished webhooks and wake up whoever is waiting on the run."""
+    expected = settings.APIFY_WEBHOOK_SECRET
+    if not expected or not hmac.compare_digest(secret, expected):
+        raise HTTPException(status_code=403, detail="Invalid webhook secret")
+    payload = await request.json()
+    run = payload.get("resource") or {}
+    run_watcher.notify(run)
+
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+@router.get("/sheets/{sheet_name}/export")
+async def export_sheet(sheet_name: str, format: Literal["csv", "parquet"] = "csv"):
+    """Every row of a sheet's latest submission with its result, as CSV or Parquet."""
+    rows = await asyncio.to_thread(job_manager.ledger.rows, sheet_name)
+    if rows is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sheet: {sheet_name}")
+    try:
+        data = await asyncio.to_thread(export_rows, rows, format)
+    except ImportError as e:
+        raise HTTPException(
+            status_code=501,
+            detail="Parquet export needs the 'export' extra (pyarrow) installed",
+        ) from e
+    filename = sheet_name.replace('"', "") or "sheet"
+    return Response(
+        data,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+
+def _require_queue():
+    if job_manager.queue is None:
+        raise HTTPException(
+            status_code=404, detail="Not running with EXECUTION_MODE=queue"
+        )
+    return job_manager.queue
+
+
+@router.get("/queue")
+async def queue_status():
+    """Item counts per queue state (ready, leased, done, dead)."""
+    return await asyncio.to_thread(_require_queue().counts)
+
+
+@router.get("/queue/dead")
+async def dead_letters(limit: int = 100):
+    """Items that failed every attempt, most recent first."""
+    return await asyncio.to_thread(_require_queue().dead_letters, limit)
+
+
+@router.post("/queue/dead/{item_id}/requeue", status_code=204)
+async def requeue_dead_letter(item_id: int):
+    """Give a dead-lettered item a fresh set of attempts."""
+    task_id = await asyncio.to_thread(_require_queue().requeue, item_id)
+    if task_id is None:
+        raise HTTPException(status_code=404, detail=f"No dead-lettered item {item_id}")
+    await asyncio.to_thread(job_manager.store.set_status, task_id, "running")
@@ -0,0 +1,124 @@
+"""End-to-end VideoProcessor.process_batch benchmark against local fakes.
+
+Runs batches of 10, 100 and 1000 unique TikTok, YouTube and GCS items
+through the real pipeline (Apify client, downloads, encoder pool, GCS
+client), with Apify, the video host and GCS replaced by benchmarks.fakes.
+
+    python -m benchmarks.bench_batch --sizes 10 100 --json batch.json
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from functools import partial
+from typing import List
+
+from benchmarks.common import peak_rss_mb, percentiles, write_results
+from benchmarks.fakes import FakeServices, configure_env, make_clip
+
+PLATFORMS = ["tiktok", "youtube", "gcs"]
+
+
+def _items(size: int, run_tag: str, services: FakeServices):
+    from model.schemas import VideoURL
+
+    items = []
+    for i in range(size):
+        platform = PLATFORMS[i % len(PLATFORMS)]
+        video_id = f"{run_tag}{i:06d}"
+        if platform == "tiktok":
+            url = f"https://www.tiktok.com/@bench/video/{video_id}"
+        elif platform == "youtube":
+            url = f"https://youtube.com/shorts/{video_id[-11:].rjust(11, '0')}"
+        else:
+            url = f"{services.base_url}/videos/{video_id}.mp4"
+        items.append(VideoURL(url=url, platform=platform))
+    return items
+
+
+def _record_latency(latencies: List[float], start: float, index, result):
+    latencies.append(time.perf_counter() - start)
+
+
+async def _run_batches(sizes: List[int], services: FakeServices) -> List[dict]:
+    from services.encoder import encoder_pool
+    from services.video_processor import VideoProcessor
+    from utils.apify_runs import run_watcher
+    from utils.http_client import http_client
+
+    processor = VideoProcessor()
+    encoder_pool.start()
+    rows = []
+    try:
+        for size in sizes:
+            # Unique IDs per batch so the result cache never short-circuits
+            run_tag = str(int(time.time() * 1000))[-5:]
+            items = _items(size, run_tag, services)
+            finished = []
+            start = time.perf_counter()
+            results = await processor.process_batch(
+                items,
+                "bench",
+                on_result=partial(_record_latency, finished, start),
+            )
+            elapsed = time.perf_counter() - start
+            failed = [r for r in results if r.status != "success"]
+            rows.append(
+                {
+                    "name": f"batch/{size}",
+                    "items": size,
+                    "failed": len(failed),
+                    "wall_s": round(elapsed, 3),
+                    "items_per_sec": round(size / elapsed, 3),
+                    "latency_s": percentiles(finished),
+                    "actor_runs": services.stats["actor_runs"],
+                }
+            )
+            print(
+                f"batch/{size:<6} {size / elapsed:8.2f} items/s  "
+                f"p95 {rows[-1]['latency_s'].get('p95', 0):.2f}s  failed {len(failed)}"
+            )
+            if failed:
+                print(f"  first error: {failed[0].error}")
+    finally:
+        await encoder_pool.close()
+        await run_watcher.close()
+        await http_client.close()
+        processor.close()
+    rss = peak_rss_mb()
+    for row in rows:
+        row["peak_rss_mb"] = rss
+    return rows
+
+
+def run(sizes=(10, 100, 1000), run_latency: float = 0.5) -> List[dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        clip = os.path.join(workdir, "clip.mp4")
+        make_clip(clip, 720, 1280, 10)
+        services = FakeServices(clip, run_latency=run_latency).start()
+        try:
+            configure_env(services.base_url)
+            return asyncio.run(_run_batches(list(sizes), services))
+        finally:
+            services.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--run-latency",
+        type=float,
+        default=0.5,
+        help="seconds each fake Apify run takes",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    rows = run(args.sizes, args.run_latency)
+    if args.json:
+        write_results(args.json, {"batch": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark the cost of scene-aware clip selection per item.
+
+Times ``select_start`` on its own and ``render_clip`` with and without
+``select_clip`` across resolutions, from a local file and streamed from the
+fake video host, and reports the added time per item. Clips have a keyframe
+every two seconds, like typical platform uploads, so starting later in the
+video costs a short seek rather than a long decode. ``--latency`` delays
+every video request, as a remote host would.
+
+    python -m benchmarks.bench_clip_select --repeat 5 --json clip_select.json
+"""
+import argparse
+import os
+import tempfile
+import time
+from functools import partial
+from typing import List
+
+from benchmarks.common import percentiles, write_results
+from benchmarks.fakes import FakeServices, configure_env, make_clip
+
+RESOLUTIONS = [(480, 854), (720, 1280), (1080, 1920)]
+CLIP_SECONDS = 30
+
+
+def _time(fn, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(repeat: int = 5, resolutions=RESOLUTIONS, latency: float = 0.05) -> List[dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        clips = {}
+        for height, width in resolutions:
+            clips[f"{height}p"] = os.path.join(workdir, f"{height}p.mp4")
+            make_clip(clips[f"{height}p"], width, height, CLIP_SECONDS, gop=60)
+        services = FakeServices(next(iter(clips.values())), download_delay=latency)
+        configure_env(services.base_url)
+        services.start()
+        try:
+            return _run(repeat, clips, services)
+        finally:
+            services.stop()
+
+
+def _run(repeat: int, clips: dict, services: FakeServices) -> List[dict]:
+    from core.config import settings
+    from utils.clip_selection import select_start
+    from utils.video_utils import render_clip
+
+    params = {
+        "max_duration": settings.MAX_VIDEO_DURATION,
+        "fps": settings.GIF_FPS,
+        "engine": "ffmpeg",
+    }
+    rows = []
+    for label, video_path in clips.items():
+        with open(video_path, "rb") as f:
+            services.clip = f.read()
+        url = f"{services.base_url}/videos/{label}.mp4"
+        timings = {
+            "select": _time(
+                partial(select_start, video_path, settings.MAX_VIDEO_DURATION), repeat
+            )
+        }
+        requests = {}
+        for source, name in ((video_path, "file"), (url, "url")):
+            for select_clip in (False, True):
+                key = f"render_{name}_selected" if select_clip else f"render_{name}"
+                before = services.stats["video_requests"]
+                timings[key] = _time(
+                    partial(render_clip, source, [], select_clip=select_clip, **params),
+                    repeat,
+                )
+                requests[key] = (services.stats["video_requests"] - before) / repeat
+        for name, latencies in timings.items():
+            rows.append(
+                {
+                    "name": f"clip_select/{label}/{name}",
+                    "items_per_sec": round(repeat / sum(latencies), 3),
+                    "latency_s": percentiles(latencies),
+                }
+            )
+        p50 = {
+            name: percentiles(latencies)["p50"] for name, latencies in timings.items()
+        }
+        print(
+            f"{label:<6} select p50 {p50['select']:.3f}s  "
+            f"file {p50['render_file']:.3f}s -> {p50['render_file_selected']:.3f}s "
+            f"(+{p50['render_file_selected'] - p50['render_file']:.3f}s)  "
+            f"url {p50['render_url']:.3f}s -> {p50['render_url_selected']:.3f}s "
+            f"(+{p50['render_url_selected'] - p50['render_url']:.3f}s, "
+            f"{requests['render_url']:g} -> "
+            f"{requests['render_url_selected']:g} requests)"
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="seconds added to each video request",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    rows = run(repeat=args.repeat, latency=args.latency)
+    if args.json:
+        write_results(args.json, {"clip_select": rows})
+
+
+if __name__ == "__main__":
+    main()
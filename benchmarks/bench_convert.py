@@ -0,0 +1,72 @@
+"""Benchmark convert_to_gif across clip lengths and resolutions.
+
+    python -m benchmarks.bench_convert --repeat 5 --json convert.json
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+from benchmarks.common import peak_rss_mb, percentiles, write_results
+from benchmarks.fakes import configure_env, make_clip
+
+RESOLUTIONS = [(480, 854), (720, 1280), (1080, 1920)]
+LENGTHS = [3, 15, 60]
+
+
+def run(
+    repeat: int = 5, engine: str = "", resolutions=RESOLUTIONS, lengths=LENGTHS
+) -> List[dict]:
+    configure_env("http://127.0.0.1:9")
+    from core.config import settings
+    from utils.video_utils import convert_to_gif
+
+    engine = engine or settings.GIF_ENGINE
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for height, width in resolutions:
+            for seconds in lengths:
+                label = f"{height}p-{seconds}s"
+                video_path = os.path.join(workdir, f"{label}.mp4")
+                gif_path = os.path.join(workdir, f"{label}.gif")
+                make_clip(video_path, width, height, seconds)
+                latencies = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    convert_to_gif(
+                        video_path,
+                        gif_path,
+                        max_duration=settings.MAX_VIDEO_DURATION,
+                        fps=settings.GIF_FPS,
+                        engine=engine,
+                    )
+                    latencies.append(time.perf_counter() - start)
+                row = {
+                    "name": f"convert/{engine}/{label}",
+                    "items_per_sec": round(repeat / sum(latencies), 3),
+                    "latency_s": percentiles(latencies),
+                    "output_bytes": os.path.getsize(gif_path),
+                    "peak_rss_mb": peak_rss_mb(),
+                }
+                rows.append(row)
+                print(
+                    f"{row['name']:<28} p50 {row['latency_s']['p50']:.3f}s  "
+                    f"p95 {row['latency_s']['p95']:.3f}s  {row['output_bytes']} B"
+                )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--engine", default="")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    rows = run(repeat=args.repeat, engine=args.engine)
+    if args.json:
+        write_results(args.json, {"convert": rows})
+
+
+if __name__ == "__main__":
+    main()
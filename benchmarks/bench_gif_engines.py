@@ -0,0 +1,108 @@
+"""Compare GIF engines on synthetic sample clips.
+
+Generates test clips with ffmpeg, converts each one with every engine in a
+fresh child process and reports wall time, peak RSS and output size.
+
+    python -m benchmarks.bench_gif_engines
+    python -m benchmarks.bench_gif_engines --engines ffmpeg --json results.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import make_clip
+from utils.gif_engines import ENGINES, get_engine
+
+# (label, width, height, seconds)
+CLIPS = [
+    ("480p-5s", 854, 480, 5),
+    ("720p-15s", 1280, 720, 15),
+    ("1080p-30s", 1920, 1080, 30),
+]
+
+
+def run_one(
+    engine: str, video_path: str, output_path: str, max_duration: float, fps: int
+) -> dict:
+    """Convert in this process and report timing and peak RSS (child mode)."""
+    start = time.perf_counter()
+    get_engine(engine).convert(video_path, output_path, max_duration, fps)
+    wall = time.perf_counter() - start
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "wall_s": round(wall, 3),
+        # ru_maxrss is in KiB on Linux; the ffmpeg engine's work is in a child
+        "peak_rss_mb": round(max(own, children) / 1024, 1),
+        "output_bytes": os.path.getsize(output_path),
+    }
+
+
+def measure(
+    engine: str, video_path: str, output_path: str, max_duration: float, fps: int
+) -> dict:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_gif_engines",
+        "--child",
+        engine,
+        video_path,
+        output_path,
+        str(max_duration),
+        str(fps),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", nargs="+", default=sorted(ENGINES))
+    parser.add_argument("--duration", type=float, default=2)
+    parser.add_argument("--fps", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        engine, video_path, output_path, max_duration, fps = args.child
+        print(
+            json.dumps(
+                run_one(engine, video_path, output_path, float(max_duration), int(fps))
+            )
+        )
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, width, height, seconds in CLIPS:
+            video_path = os.path.join(workdir, f"{label}.mp4")
+            make_clip(video_path, width, height, seconds)
+            for engine in args.engines:
+                output_path = os.path.join(workdir, f"{label}-{engine}.gif")
+                runs = [
+                    measure(engine, video_path, output_path, args.duration, args.fps)
+                    for _ in range(args.repeat)
+                ]
+                best = min(runs, key=lambda r: r["wall_s"])
+                best.update(clip=label, engine=engine)
+                results.append(best)
+                print(
+                    f"{label:<10} {engine:<8} {best['wall_s']:>7.3f}s "
+                    f"{best['peak_rss_mb']:>8.1f} MB {best['output_bytes']:>10} B"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""HTTP load test of POST /api/v1/process-batch against local fakes.
+
+Starts benchmarks.fakes in-process and the service itself under uvicorn in
+a subprocess pointed at them, then sends ``--requests`` batches with
+``--concurrency`` clients in parallel.
+
+    python -m benchmarks.bench_http --requests 50 --concurrency 10 --batch-size 5
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.bench_batch import PLATFORMS
+from benchmarks.common import percentiles, process_peak_rss_mb, write_results
+from benchmarks.fakes import FakeServices, configure_env, free_port, make_clip
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _wait_ready(client, url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Service at {url} did not become ready")
+
+
+def _payload(request_index: int, batch_size: int, services: FakeServices) -> dict:
+    urls = []
+    for i in range(batch_size):
+        platform = PLATFORMS[(request_index * batch_size + i) % len(PLATFORMS)]
+        video_id = f"{request_index:05d}{i:06d}"
+        if platform == "tiktok":
+            url = f"https://www.tiktok.com/@bench/video/{video_id}"
+        elif platform == "youtube":
+            url = f"https://youtube.com/shorts/{video_id}"
+        else:
+            url = f"{services.base_url}/videos/{video_id}.mp4"
+        urls.append({"url": url, "platform": platform})
+    return {"urls": urls, "sheet_name": "bench"}
+
+
+async def _load(
+    base_url: str,
+    requests: int,
+    concurrency: int,
+    batch_size: int,
+    services: FakeServices,
+    pid: int,
+):
+    import httpx
+
+    latencies: List[float] = []
+    statuses = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        await _wait_ready(client, f"{base_url}/")
+
+        async def worker():
+            while not queue.empty():
+                index = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post(
+                    f"{base_url}/api/v1/process-batch",
+                    json=_payload(index, batch_size, services),
+                )
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = (
+                    statuses.get(response.status_code, 0) + 1
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "name": f"http/c{concurrency}/b{batch_size}",
+        "requests": requests,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "wall_s": round(elapsed, 3),
+        "requests_per_sec": round(requests / elapsed, 3),
+        "items_per_sec": round(requests * batch_size / elapsed, 3),
+        "latency_s": percentiles(latencies),
+        "peak_rss_mb": {"server": process_peak_rss_mb(pid)},
+    }
+
+
+def run(requests: int = 50, concurrency: int = 10, batch_size: int = 5) -> List[dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        clip = os.path.join(workdir, "clip.mp4")
+        make_clip(clip, 720, 1280, 10)
+        services = FakeServices(clip).start()
+        port = free_port()
+        env = dict(os.environ, **configure_env(services.base_url))
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "warning",
+            ],
+            env=env,
+            cwd=REPO_ROOT,
+        )
+        try:
+            row = asyncio.run(
+                _load(
+                    f"http://127.0.0.1:{port}",
+                    requests,
+                    concurrency,
+                    batch_size,
+                    services,
+                    server.pid,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            services.stop()
+    print(
+        f"{row['name']:<16} {row['requests_per_sec']:.2f} req/s  "
+        f"{row['items_per_sec']:.2f} items/s  "
+        f"p50 {row['latency_s']['p50']:.2f}s  p95 {row['latency_s']['p95']:.2f}s  "
+        f"statuses {row['statuses']}"
+    )
+    return [row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    rows = run(args.requests, args.concurrency, args.batch_size)
+    if args.json:
+        write_results(args.json, {"http": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Cold-start benchmark: import time, time to first request and time to ready.
+
+Each run uses a fresh interpreter, so nothing is cached between runs:
+
+- ``startup/import``: ``import main`` on its own.
+- ``startup/first_request``: from launching uvicorn until ``GET /`` answers.
+- ``startup/ready``: from launching uvicorn until ``GET /ready`` returns 200.
+
+The service points at benchmarks.fakes, so GCS and Apify are local.
+
+    python -m benchmarks.bench_startup --runs 5 --json startup.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.common import percentiles, write_results
+from benchmarks.fakes import FakeServices, configure_env, free_port, make_clip
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _import_time(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        env=env,
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _slowest_imports(env: Dict[str, str], top: int = 10) -> List[dict]:
+    """Modules with the largest cumulative import time, from ``-X importtime``."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append(
+            {"module": name.strip(), "cumulative_s": round(int(cumulative) / 1e6, 4)}
+        )
+    rows.sort(key=lambda row: row["cumulative_s"], reverse=True)
+    return rows[:top]
+
+
+def _serve_times(env: Dict[str, str]) -> Dict[str, float]:
+    """Seconds from spawning uvicorn until ``/`` answers and until ``/ready`` is 200."""
+    import httpx
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        cwd=REPO_ROOT,
+    )
+    times = {}
+    try:
+        with httpx.Client(timeout=5) as client:
+            deadline = start + 120
+            while "ready" not in times:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    raise RuntimeError("Service did not become ready")
+                path = "/" if "first_request" not in times else "/ready"
+                try:
+                    if client.get(base_url + path).status_code == 200:
+                        times["first_request" if path == "/" else "ready"] = (
+                            time.perf_counter() - start
+                        )
+                        continue
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return times
+
+
+def run(runs: int = 5) -> List[dict]:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as workdir:
+        clip = os.path.join(workdir, "clip.mp4")
+        make_clip(clip, 320, 240, 1)
+        services = FakeServices(clip).start()
+        env = dict(os.environ, **configure_env(services.base_url))
+        try:
+            samples: Dict[str, List[float]] = {
+                "import": [],
+                "first_request": [],
+                "ready": [],
+            }
+            for _ in range(runs):
+                samples["import"].append(_import_time(env))
+                for name, seconds in _serve_times(env).items():
+                    samples[name].append(seconds)
+            slowest = _slowest_imports(env)
+        finally:
+            services.stop()
+
+    rows = [
+        {"name": f"startup/{name}", "runs": runs, "latency_s": percentiles(values)}
+        for name, values in samples.items()
+    ]
+    rows[0]["slowest_imports"] = slowest
+    for row in rows:
+        print(
+            f"{row['name']:<24} p50 {row['latency_s']['p50']:.3f}s  "
+            f"max {row['latency_s']['max']:.3f}s"
+        )
+    for entry in slowest[:5]:
+        print(f"  {entry['module']:<40} {entry['cumulative_s']:.3f}s")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    rows = run(args.runs)
+    if args.json:
+        write_results(args.json, {"startup": rows})
+
+
+if __name__ == "__main__":
+    main()
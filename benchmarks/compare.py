@@ -0,0 +1,72 @@
+"""Compare two benchmark result files and flag regressions.
+
+Exits with status 1 when any shared benchmark got slower (latency up or
+throughput down) by more than ``--threshold`` percent.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# (metric path, True if higher is better)
+METRICS = [
+    (("items_per_sec",), True),
+    (("requests_per_sec",), True),
+    (("latency_s", "p50"), False),
+    (("latency_s", "p95"), False),
+    (("latency_s", "p99"), False),
+]
+
+
+def _rows(path: str):
+    with open(path) as f:
+        payload = json.load(f)
+    rows = {}
+    for group in payload["benchmarks"].values():
+        for row in group:
+            rows[row["name"]] = row
+    return payload.get("commit", path), rows
+
+
+def _lookup(row: dict, path):
+    value = row
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="allowed regression in percent"
+    )
+    args = parser.parse_args()
+
+    base_commit, baseline = _rows(args.baseline)
+    new_commit, candidate = _rows(args.candidate)
+    print(f"{base_commit} -> {new_commit}")
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(candidate)):
+        for path, higher_is_better in METRICS:
+            old, new = _lookup(baseline[name], path), _lookup(candidate[name], path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(
+                f"{name:<28} {'.'.join(path):<16} "
+                f"{old:>10.3f} -> {new:>10.3f} {change:+7.1f}% {flag}"
+            )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
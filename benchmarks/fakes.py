@@ -0,0 +1,353 @@
+"""Local stand-ins for Apify, GCS and video hosts used by the benchmarks.
+
+A single FastAPI app, served by uvicorn on a background thread, provides:
+
+- ``/v2/...``: the subset of the Apify API the clients use (actor-task runs,
+  ``waitForFinish`` long-polling, datasets). Runs finish after ``run_latency``
+  seconds and return one item per submitted URL.
+- ``/videos/<name>``: any name serves the configured sample clip, with Range
+  support.
+- ``/storage/v1``, ``/upload/storage/v1`` and ``/<bucket>/<object>``: an
+  in-memory GCS JSON API (multipart and resumable uploads, object metadata,
+  public downloads), enough for GCSClient through ``GCS_EMULATOR_HOST``.
+
+Call ``configure_env(base_url)`` before importing any application module so
+that ``core.config.settings`` points at the fakes.
+"""
+import asyncio
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+
+BUCKET = "bench-bucket"
+TIKTOK_TASK = "bench-tiktok"
+YOUTUBE_TASK = "bench-youtube"
+
+
+def make_clip(
+    path: str, width: int, height: int, seconds: float, fps: int = 30, gop: int = 0
+):
+    """Write a synthetic H.264 clip with ffmpeg; ``gop`` is the keyframe interval."""
+    gop_options = ["-g", str(gop)] if gop else []
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+            "-c:v",
+            "libx264",
+            *gop_options,
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            path,
+        ],
+        check=True,
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def configure_env(base_url: str, **overrides: str):
+    """Point application settings at the fake services."""
+    env = {
+        "API_PREFIX": "/api/v1",
+        "ALLOWED_HOSTS": "*",
+        "API_KEY": "bench",
+        "TIKTOK_SCRAPER_TASK_ID": TIKTOK_TASK,
+        "YOUTUBE_SCRAPER_TASK_ID": YOUTUBE_TASK,
+        "APIFY_API_TOKEN": "bench",
+        "APIFY_API_URL": f"{base_url}/v2",
+        "TIKTOK_BUCKET": BUCKET,
+        "IMAGE_EXTRACTED_FOLDER_PATH": "gifs",
+        "GCS_EMULATOR_HOST": base_url,
+        "GCS_PUBLIC_URL": base_url,
+        "PLAYWRIGHT_AUTO_INSTALL": "false",
+    }
+    env.update(overrides)
+    os.environ.update(env)
+    return env
+
+
+def _range_response(data: bytes, range_header: Optional[str], media_type: str):
+    from fastapi import Response
+
+    headers = {"Accept-Ranges": "bytes"}
+    match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+    if not match:
+        return Response(data, media_type=media_type, headers=headers)
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else len(data) - 1
+    end = min(end, len(data) - 1)
+    if start >= len(data):
+        return Response(
+            status_code=416, headers={"Content-Range": f"bytes */{len(data)}"}
+        )
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(
+        data[start : end + 1], status_code=206, media_type=media_type, headers=headers
+    )
+
+
+def _parse_multipart_related(body: bytes, content_type: str):
+    boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode()
+    parts = [p for p in body.split(b"--" + boundary) if p.strip() not in (b"", b"--")]
+    payloads = []
+    for part in parts[:2]:
+        headers, _, payload = part.partition(b"\r\n\r\n")
+        payloads.append(payload[:-2] if payload.endswith(b"\r\n") else payload)
+    metadata = json.loads(payloads[0])
+    # The media part's own header carries the content type
+    match = re.search(rb"content-type:\s*([^\r\n]+)", headers, re.IGNORECASE)
+    if match and "contentType" not in metadata:
+        metadata["contentType"] = match.group(1).decode().strip()
+    return metadata, payloads[1]
+
+
+def _crc32c(data: bytes) -> str:
+    """Base64 big-endian CRC32C, which the client checks after resumable uploads."""
+    import base64
+
+    import google_crc32c
+
+    return base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode()
+
+
+def _video_id(url: str) -> str:
+    match = re.search(r"(\d{5,})|([A-Za-z0-9_-]{11})$", url.rstrip("/"))
+    return match.group(0) if match else str(abs(hash(url)))
+
+
+class FakeServices:
+    """In-process fake Apify, GCS and video host on one local port."""
+
+    def __init__(
+        self, clip_path: str, run_latency: float = 0.5, download_delay: float = 0.0
+    ):
+        self.clip = open(clip_path, "rb").read()
+        self.run_latency = run_latency
+        self.download_delay = download_delay
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.objects: Dict[str, tuple] = {}
+        self.runs: Dict[str, dict] = {}
+        self.datasets: Dict[str, list] = {}
+        self.uploads: Dict[str, dict] = {}
+        self.stats = {
+            "actor_runs": 0,
+            "video_requests": 0,
+            "uploads": 0,
+            "resumable_uploads": 0,
+        }
+        self._ids = itertools.count(1)
+        self._server = None
+        self._thread = None
+
+    def _object_resource(self, name: str) -> dict:
+        data, content_type, metadata = self.objects[name]
+        return {
+            "kind": "storage#object",
+            "bucket": BUCKET,
+            "name": name,
+            "id": f"{BUCKET}/{name}",
+            "size": str(len(data)),
+            "contentType": content_type,
+            "metadata": metadata,
+            "generation": "1",
+            "crc32c": _crc32c(data),
+        }
+
+    def app(self):
+        from fastapi import FastAPI, Request, Response
+        from fastapi.responses import JSONResponse
+
+        app = FastAPI()
+
+        # Apify
+        @app.post("/v2/actor-tasks/{task_id}/runs")
+        async def start_run(task_id: str, request: Request):
+            body = await request.json()
+            run_id = f"run{next(self._ids)}"
+            dataset_id = f"ds-{run_id}"
+            if task_id == TIKTOK_TASK:
+                items = [
+                    {
+                        "id": _video_id(u),
+                        "webVideoUrl": u,
+                        "gcsMediaUrls": [f"{self.base_url}/videos/{_video_id(u)}.mp4"],
+                    }
+                    for u in body.get("postURLs", [])
+                ]
+            else:
+                items = [
+                    {
+                        "input": u,
+                        "downloadUrl": f"{self.base_url}/videos/{_video_id(u)}.mp4",
+                    }
+                    for u in body.get("startUrls", [])
+                ]
+            self.datasets[dataset_id] = items
+            self.runs[run_id] = {
+                "id": run_id,
+                "status": "RUNNING",
+                "defaultDatasetId": dataset_id,
+                "finishedAt": time.monotonic() + self.run_latency,
+            }
+            self.stats["actor_runs"] += 1
+            return {"data": self._run_view(run_id)}
+
+        @app.get("/v2/actor-runs/{run_id}")
+        async def get_run(run_id: str, waitForFinish: int = 0):
+            run = self.runs.get(run_id)
+            if run is None:
+                return JSONResponse({"error": "not found"}, status_code=404)
+            remaining = run["finishedAt"] - time.monotonic()
+            if remaining > 0 and waitForFinish > 0:
+                await asyncio.sleep(min(remaining, waitForFinish))
+            return {"data": self._run_view(run_id)}
+
+        @app.post("/v2/actor-runs/{run_id}/abort")
+        async def abort_run(run_id: str):
+            if run_id in self.runs:
+                self.runs[run_id]["aborted"] = True
+            return {"data": self._run_view(run_id)}
+
+        @app.get("/v2/datasets/{dataset_id}/items")
+        async def dataset_items(dataset_id: str):
+            return self.datasets.get(dataset_id, [])
+
+        # Video host
+        @app.get("/videos/{name}")
+        async def video(name: str, request: Request):
+            self.stats["video_requests"] += 1
+            if self.download_delay:
+                await asyncio.sleep(self.download_delay)
+            return _range_response(self.clip, request.headers.get("range"), "video/mp4")
+
+        # GCS JSON API
+        @app.post("/upload/storage/v1/b/{bucket}/o")
+        async def upload(
+            bucket: str, request: Request, uploadType: str = "multipart", name: str = ""
+        ):
+            body = await request.body()
+            if uploadType == "resumable":
+                metadata = json.loads(body or b"{}")
+                upload_id = f"up{next(self._ids)}"
+                self.stats["resumable_uploads"] += 1
+                self.uploads[upload_id] = {
+                    "name": metadata.get("name") or name,
+                    "metadata": metadata,
+                    "content_type": request.headers.get(
+                        "x-upload-content-type", "application/octet-stream"
+                    ),
+                    "data": bytearray(),
+                }
+                location = (
+                    f"{self.base_url}/upload/storage/v1/b/{bucket}/o"
+                    f"?uploadType=resumable&upload_id={upload_id}"
+                )
+                return Response(status_code=200, headers={"Location": location})
+            metadata, data = _parse_multipart_related(
+                body, request.headers["content-type"]
+            )
+            return self._store(metadata["name"], data, metadata)
+
+        @app.put("/upload/storage/v1/b/{bucket}/o")
+        async def upload_chunk(bucket: str, request: Request, upload_id: str):
+            state = self.uploads[upload_id]
+            state["data"].extend(await request.body())
+            match = re.match(
+                r"bytes (?:\d+-\d+|\*)/(\d+|\*)",
+                request.headers.get("content-range", ""),
+            )
+            total = match.group(1) if match else str(len(state["data"]))
+            if total != "*" and len(state["data"]) >= int(total):
+                del self.uploads[upload_id]
+                metadata = dict(
+                    state["metadata"],
+                    contentType=state["metadata"].get(
+                        "contentType", state["content_type"]
+                    ),
+                )
+                return self._store(state["name"], bytes(state["data"]), metadata)
+            return Response(
+                status_code=308, headers={"Range": f"bytes=0-{len(state['data']) - 1}"}
+            )
+
+        @app.get("/storage/v1/b/{bucket}/o/{name:path}")
+        async def object_metadata(bucket: str, name: str):
+            if name not in self.objects:
+                return JSONResponse(
+                    {"error": {"code": 404, "message": "Not Found"}}, status_code=404
+                )
+            return self._object_resource(name)
+
+        @app.get(f"/{BUCKET}/{{name:path}}")
+        async def public_object(name: str, request: Request):
+            if name not in self.objects:
+                return Response(status_code=404)
+            data, content_type, _ = self.objects[name]
+            return _range_response(data, request.headers.get("range"), content_type)
+
+        return app
+
+    def _run_view(self, run_id: str) -> dict:
+        run = self.runs[run_id]
+        status = run["status"]
+        if run.get("aborted"):
+            status = "ABORTED"
+        elif time.monotonic() >= run["finishedAt"]:
+            status = "SUCCEEDED"
+        return {
+            "id": run_id,
+            "status": status,
+            "defaultDatasetId": run["defaultDatasetId"],
+        }
+
+    def _store(self, name: str, data: bytes, metadata: dict):
+        self.objects[name] = (
+            data,
+            metadata.get("contentType", "application/octet-stream"),
+            metadata.get("metadata") or {},
+        )
+        self.stats["uploads"] += 1
+        return self._object_resource(name)
+
+    def start(self) -> "FakeServices":
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.app(),
+            host="127.0.0.1",
+            port=self.port,
+            log_level="warning",
+            access_log=False,
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
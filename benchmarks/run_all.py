@@ -0,0 +1,71 @@
+"""Run the whole benchmark suite and write one result file per commit.
+
+    python -m benchmarks.run_all                    # full suite
+    python -m benchmarks.run_all --quick            # smaller sizes for a smoke run
+    python -m benchmarks.compare benchmarks/results/<old>.json \
+        benchmarks/results/<new>.json
+"""
+import argparse
+import os
+
+from benchmarks import (
+    bench_batch,
+    bench_clip_select,
+    bench_convert,
+    bench_http,
+    bench_startup,
+)
+from benchmarks.common import git_commit, write_results
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument(
+        "--skip",
+        nargs="*",
+        default=[],
+        choices=["convert", "clip_select", "batch", "http", "startup"],
+    )
+    parser.add_argument(
+        "--output", help="result file (default: benchmarks/results/<commit>.json)"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    if "convert" not in args.skip:
+        if args.quick:
+            results["convert"] = bench_convert.run(
+                repeat=2, resolutions=[(480, 854)], lengths=[3, 15]
+            )
+        else:
+            results["convert"] = bench_convert.run()
+    if "clip_select" not in args.skip:
+        if args.quick:
+            results["clip_select"] = bench_clip_select.run(
+                repeat=2, resolutions=[(480, 854)]
+            )
+        else:
+            results["clip_select"] = bench_clip_select.run()
+    if "batch" not in args.skip:
+        results["batch"] = bench_batch.run(
+            sizes=(10, 100) if args.quick else (10, 100, 1000)
+        )
+    if "http" not in args.skip:
+        if args.quick:
+            results["http"] = bench_http.run(requests=10, concurrency=5, batch_size=2)
+        else:
+            results["http"] = bench_http.run()
+
+    if "startup" not in args.skip:
+        results["startup"] = bench_startup.run(runs=2 if args.quick else 5)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{git_commit()}.json")
+    write_results(output, results)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from pydantic import Field
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict
 
 class Settings(BaseSettings): 
     # Logging Settings
@@ -13,19 +14,130 @@ class Settings(BaseSettings):
     API_PREFIX: str = Field(..., env="API_PREFIX")
     ALLOWED_HOSTS: str = Field(..., env="ALLOWED_HOSTS")
     API_KEY: str = Field(..., env="API_KEY")
-    
+
     # Apify Settings
     TIKTOK_SCRAPER_TASK_ID: str = Field(..., validation_alias="TIKTOK_SCRAPER_TASK_ID")
     YOUTUBE_SCRAPER_TASK_ID: str = Field(..., validation_alias="YOUTUBE_SCRAPER_TASK_ID")
     APIFY_API_TOKEN: str = Field(..., env="APIFY_API_TOKEN")
-    
+    APIFY_API_URL: str = "https://api.apify.com/v2"
+    APIFY_RUN_TIMEOUT: float = 15 * 60  # seconds to wait for an actor run
+    APIFY_WAIT_FOR_FINISH: int = 60  # long-poll seconds per status request (max 60)
+    APIFY_POLL_MIN: float = 1  # backoff bounds when long-polling is unavailable
+    APIFY_POLL_MAX: float = 30
+    # Public URL of /api/v1/apify/webhook; empty disables webhooks
+    APIFY_WEBHOOK_URL: str = ""
+    APIFY_WEBHOOK_SECRET: str = ""  # required for the webhook endpoint to accept calls
+
     # GCP Settings
     bucket_name: str = Field(..., validation_alias="TIKTOK_BUCKET")
     image_extracted_folder_name: str = Field(..., validation_alias="IMAGE_EXTRACTED_FOLDER_PATH")
-    
+    GCS_UPLOAD_WORKERS: int = 8  # threads running blocking GCS calls
+    GCS_RESUMABLE_THRESHOLD: int = 8 * 1024 * 1024  # bytes; larger files are resumable
+    GCS_CHUNK_SIZE: int = 8 * 1024 * 1024  # resumable chunk size, a multiple of 256 KiB
+    GCS_CACHE_CONTROL: str = "public, max-age=31536000"
+    GCS_PUBLIC_URL: str = "https://storage.googleapis.com"
+    GCS_EMULATOR_HOST: str = ""  # e.g. http://localhost:4443 for fake-gcs-server
+
     # Video Processing Settings
     MAX_VIDEO_DURATION: int = 2  # seconds
     GIF_FPS: int = 3
+    GIF_ENGINE: str = "ffmpeg"  # "ffmpeg" or "moviepy"
+    GIF_START: float = 0  # seconds into the video
+    GIF_MAX_WIDTH: int = 0  # pixels, 0 keeps the source width
+    GIF_MAX_COLORS: int = 256  # palette size
+    # "bayer", "floyd_steinberg", "sierra2", "sierra2_4a" or "none"
+    GIF_DITHER: str = "bayer"
+    GIF_DEDUPE: bool = False  # drop near-identical consecutive frames
+    GIF_MAX_BYTES: int = 0  # target GIF size, 0 for no target
+    GIF_OPTIMIZE_PASSES: int = 3  # extra encodes allowed to meet GIF_MAX_BYTES
+    GIF_MIN_WIDTH: int = 64  # the optimizer never downscales below this
+    GIF_SELECT_CLIP: bool = False  # start at the most active segment, not GIF_START
+    CLIP_SELECT_WINDOW: float = 6  # seconds after the start searched for that segment
+    CLIP_SELECT_FPS: float = 3  # frames sampled per second of the window
+    CLIP_SELECT_SIZE: int = 64  # sampled frames are scaled to this many pixels square
+
+    # HTTP Client Settings
+    HTTP2_ENABLED: bool = True  # used when the optional h2 package is installed
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30  # seconds
+    HTTP_PER_HOST_CONCURRENCY: int = 16
+    HTTP_TIMEOUT: float = 30  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 10  # seconds
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_BASE: float = 0.5  # seconds
+    HTTP_BACKOFF_MAX: float = 10  # seconds
+
+    # Download Settings
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes held in memory per download
+    DOWNLOAD_TIMEOUT: float = 60  # seconds
+    STREAM_FROM_URL: bool = True  # let URL-capable engines read only the head they need
+    # Bytes; larger videos spool to disk, 0 always uses disk
+    SPOOL_MAX_MEMORY: int = 64 * 1024 * 1024
+
+    # Batch Concurrency Settings
+    BATCH_CONCURRENCY: int = 16  # items in flight per batch
+    APIFY_CONCURRENCY: int = 4  # concurrent Apify actor runs
+    APIFY_BATCH_SIZE: int = 25  # URLs scraped per actor run
+    DOWNLOAD_CONCURRENCY: int = 8  # concurrent HTTP downloads
+    UPLOAD_CONCURRENCY: int = 8  # concurrent GCS uploads
+
+    # Browser Settings
+    BROWSER_MAX_PAGES: int = 4  # concurrent Douyin extraction pages
+    DOUYIN_EXTRACT_TIMEOUT: float = 30  # seconds to wait for the video request
+    # Run 'playwright install chromium' when the pool starts
+    PLAYWRIGHT_AUTO_INSTALL: bool = True
+
+    # Encoder Settings
+    ENCODER_WORKERS: int = 2  # GIF encoder processes
+    ENCODER_MAX_QUEUE: int = 32  # encodes allowed to wait for a free worker
+    ENCODER_JOB_TIMEOUT: float = 120  # seconds before a worker is killed
+    ENCODER_START_METHOD: str = "spawn"
+    # Bytes of estimated memory all running encodes may use, 0 for no limit
+    ENCODER_MEMORY_BUDGET: int = 2 * 1024**3
+    ENCODER_JOB_MAX_MEMORY: int = 1024**3  # bytes; larger jobs downscale, then fail
+    # Per-job memory limit as a multiple of its estimate, 0 for no limit
+    ENCODER_MEMORY_HEADROOM: float = 2.0
+    ENCODER_JOB_CPU_SECONDS: float = 300  # CPU time per encode process, 0 for no limit
+
+    # Startup Settings
+    WARM_UP_BACKOFF_BASE: float = 1  # seconds before retrying, doubled per failure
+    WARM_UP_BACKOFF_MAX: float = 60  # seconds
+
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_SIZE: int = 10000  # entries kept in the local LRU tier
+    RESULT_CACHE_TTL: float = 24 * 60 * 60  # seconds
+    RESULT_CACHE_CHECK_GCS: bool = True  # fall back to existing GIFs in the bucket
+
+    # Job Settings
+    JOB_STORE: str = "memory"  # "memory" or "sqlite"
+    JOB_STORE_PATH: str = "jobs.db"
+    JOB_RETENTION: float = 24 * 60 * 60  # seconds completed jobs and results are kept
+    JOB_MAX_COMPLETED: int = 10000  # completed jobs kept by the in-memory store
+    # Sheets kept by the in-memory ledger, least recently submitted dropped first
+    LEDGER_MAX_SHEETS: int = 1000
+    # Seconds a synchronous batch waits before unfinished items are reported failed
+    JOB_WAIT_TIMEOUT: float = 3600
+
+    # Resilience Settings
+    # Items/second per upstream, JSON in env
+    UPSTREAM_RATE_LIMITS: Dict[str, float] = {"apify": 20, "douyin": 2, "gcs": 100}
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive upstream failures that open it
+    CIRCUIT_RESET_TIMEOUT: float = 30  # seconds open before a trial item is let through
+    ADMISSION_MAX_ITEMS: int = 2000  # unfinished items before new batches get 429
+    ADMISSION_RETRY_AFTER: int = 30  # Retry-After seconds before throughput is known
+
+    # Execution Settings
+    # "inline" processes in the API, "queue" hands items to worker.py
+    EXECUTION_MODE: str = "inline"
+    QUEUE_PATH: str = "queue.db"  # SQLite file shared by the API and workers
+    QUEUE_VISIBILITY_TIMEOUT: float = 300  # seconds a lease hides an item from others
+    QUEUE_MAX_ATTEMPTS: int = 3  # failed attempts before an item is dead-lettered
+    QUEUE_RETRY_DELAY: float = 10  # seconds before the first retry, doubled per attempt
+    QUEUE_POLL_INTERVAL: float = 1  # seconds between polls of an empty queue
+    WORKER_CONCURRENCY: int = 16  # items in flight per worker process
+    WORKER_LEASE_SIZE: int = 25  # items claimed per lease, processed as one batch
 
     class Config:
         env_file = ".env"
@@ -36,5 +148,3 @@ def get_settings():
     return Settings()
 
 settings = get_settings() 
-
-
@@ -0,0 +1,229 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(
+        self, key: Tuple[str, ...], extra: Optional[Dict[str, str]] = None
+    ) -> str:
+        pairs = list(zip(self.labelnames, key, strict=True)) + list(
+            (extra or {}).items()
+        )
+        if not pairs:
+            return ""
+        escaped = (
+            v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            for _, v in pairs
+        )
+        return (
+            "{"
+            + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped, strict=True))
+            + "}"
+        )
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+    DEFAULT_BUCKETS = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+        30,
+        60,
+        120,
+        300,
+    )
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts, strict=True):
+                labels = self._format_labels(key, {"le": repr(float(bound))})
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            lines.append(
+                f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {count}"
+            )
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+REGISTRY: list = []
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "gif_stage_duration_seconds",
+    "Time spent in each pipeline stage.",
+    ["stage", "platform"],
+)
+STAGE_IN_FLIGHT = Gauge(
+    "gif_stage_in_flight",
+    "Operations currently running in each pipeline stage.",
+    ["stage", "platform"],
+)
+STAGE_ERRORS = Counter(
+    "gif_stage_errors_total", "Pipeline stage failures.", ["stage", "platform"]
+)
+BYTES_TRANSFERRED = Counter(
+    "gif_bytes_transferred_total",
+    "Bytes downloaded from sources and uploaded to GCS.",
+    ["direction", "platform"],
+)
+ITEMS = Counter(
+    "gif_items_total",
+    "Processed batch items by outcome.",
+    ["platform", "status", "cache"],
+)
+QUEUE_ITEMS = Gauge(
+    "gif_queue_items", "Work queue items by state, in EXECUTION_MODE=queue.", ["state"]
+)
+ENCODE_PEAK_RSS = Histogram(
+    "gif_encode_peak_rss_bytes",
+    "Peak RSS of each encode job: its ffmpeg process plus the worker's own growth.",
+    ["platform"],
+    buckets=[2**n * 1024**2 for n in range(4, 13)],
+)
+ENCODE_MEMORY_RESERVED = Gauge(
+    "gif_encode_memory_reserved_bytes",
+    "Estimated memory reserved by admitted encode jobs.",
+)
+
+
+class ItemTimings:
+    """Per-item context: platform metric label, stage timings and peak encode RSS."""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.timings: Dict[str, float] = {}
+        self.peak_rss = 0
+
+
+_current_item: ContextVar[Optional[ItemTimings]] = ContextVar(
+    "current_item", default=None
+)
+
+
+def bind_item(item: ItemTimings) -> None:
+    """Attribute stages in the current task (and tasks it starts) to ``item``."""
+    _current_item.set(item)
+
+
+def current_platform() -> str:
+    item = _current_item.get()
+    return item.platform if item is not None else ""
+
+
+def record_peak_rss(peak: int) -> None:
+    """Observe an encode job's peak RSS in bytes for the current item."""
+    item = _current_item.get()
+    ENCODE_PEAK_RSS.observe(peak, platform=item.platform if item is not None else "")
+    if item is not None:
+        item.peak_rss = max(item.peak_rss, peak)
+
+
+@contextmanager
+def stage(name: str, platform: Optional[str] = None) -> Iterator[None]:
+    """Time a pipeline stage, tracking in-flight count, errors and per-item timing."""
+    item = _current_item.get()
+    if platform is None:
+        platform = item.platform if item is not None else ""
+    STAGE_IN_FLIGHT.inc(stage=name, platform=platform)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name, platform=platform)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_IN_FLIGHT.dec(stage=name, platform=platform)
+        STAGE_SECONDS.observe(elapsed, stage=name, platform=platform)
+        if item is not None:
+            item.timings[name] = round(item.timings.get(name, 0) + elapsed, 4)
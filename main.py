@@ -1,12 +1,69 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import router as api_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from api.routes import router as api_router, job_manager, video_processor
+from core import metrics
 from core.config import settings
+from services.encoder import encoder_pool
+from utils.apify_runs import run_watcher
+from utils.browser_pool import browser_pool
+from utils.http_client import http_client
+
+
+async def _keep_trying(name: str, load):
+    """Await ``load()`` until it succeeds, backing off between failures."""
+    delay = settings.WARM_UP_BACKOFF_BASE
+    while True:
+        try:
+            await load()
+            return
+        except Exception as e:
+            print(f"Warm-up of {name} failed, retrying in {delay:g}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.WARM_UP_BACKOFF_MAX)
+
+
+async def warm_up():
+    """Load the slow dependencies once the server is already accepting connections.
+
+    Each one is retried until it loads, so a dependency that is down at
+    startup does not leave /ready failing for the life of the process.
+    """
+    await asyncio.gather(
+        _keep_trying(
+            "GCS client", lambda: asyncio.to_thread(video_processor.gcs_client.connect)
+        ),
+        _keep_trying("encoder", encoder_pool.warm_up),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start()
+    # Warm in the background so the process answers (and /ready reports) right away
+    warm = asyncio.create_task(warm_up())
+    # Launch Chromium in the background so startup is not held up by it
+    warm_browser = asyncio.create_task(browser_pool.warm_up())
+    # Pick up jobs interrupted by a previous shutdown or crash
+    await job_manager.resume_unfinished()
+    yield
+    await job_manager.shutdown()
+    warm.cancel()
+    warm_browser.cancel()
+    await browser_pool.close()
+    await run_watcher.close()
+    await encoder_pool.close()
+    await http_client.close()
+    video_processor.close()
+
 
 app = FastAPI(
     title="GIF Conversion Microservice",
     description="A microservice for converting videos from various platforms to GIFs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -24,4 +81,33 @@ app.include_router(api_router, prefix="/api/v1")
 @app.get("/", tags=["Root"])
 async def read_root():
     """Root endpoint."""
-    return {"message": "GIF Conversion Microservice works!"}
\ No newline at end of file
+    return {"message": "GIF Conversion Microservice works!"}
+
+
+@app.get("/ready", tags=["Root"])
+async def read_ready():
+    """Readiness: 200 once the GCS client and encoder workers are warm, 503 before.
+
+    ``/`` answers as soon as the process is up; use it for liveness.
+    """
+    components = {
+        "gcs": video_processor.gcs_client.connected,
+        "encoder": encoder_pool.warm,
+        # Only Douyin needs the browser, so it does not gate readiness
+        "browser": browser_pool.started,
+    }
+    ready = components["gcs"] and components["encoder"]
+    return JSONResponse(
+        {"status": "ready" if ready else "warming", "components": components},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse)
+async def read_metrics():
+    """Prometheus metrics for every pipeline stage."""
+    if job_manager.queue is not None:
+        counts = await asyncio.to_thread(job_manager.queue.counts)
+        for state, count in counts.items():
+            metrics.QUEUE_ITEMS.set(count, state=state)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,94 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Literal, Optional
+
+
+class Rendition(BaseModel):
+    """An extra output produced from the same decode as the GIF."""
+
+    format: Literal["gif", "webp", "mp4", "jpg"]  # "jpg" is a poster frame
+    max_width: Optional[int] = Field(None, gt=0)  # defaults to the profile's max_width
+    fps: Optional[int] = Field(None, gt=0)  # defaults to the profile's fps
+    # Key in GIFResponse.renditions
+    name: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]+$")
+
+    @property
+    def key(self) -> str:
+        if self.name:
+            return self.name
+        return f"{self.format}_{self.max_width}" if self.max_width else self.format
+
+
+class EncodingProfile(BaseModel):
+    """GIF encoding options.
+
+    Unset fields fall back to the batch profile, then to settings.
+    """
+
+    max_width: Optional[int] = Field(None, gt=0)  # pixels; smaller sources keep theirs
+    fps: Optional[int] = Field(None, gt=0)
+    duration: Optional[float] = Field(None, gt=0)  # seconds
+    start: Optional[float] = Field(None, ge=0)  # seconds into the video
+    max_colors: Optional[int] = Field(None, ge=2, le=256)  # palette size
+    dither: Optional[
+        Literal["bayer", "floyd_steinberg", "sierra2", "sierra2_4a", "none"]
+    ] = None
+    # Target file size; the optimizer downscales to meet it
+    max_bytes: Optional[int] = Field(None, gt=0)
+    dedupe: Optional[bool] = None  # drop near-identical consecutive frames
+    # Start at the most active segment after ``start``
+    select_clip: Optional[bool] = None
+    # Extra formats/sizes alongside the GIF
+    renditions: Optional[List[Rendition]] = None
+
+    @field_validator("renditions")
+    @classmethod
+    def _unique_rendition_keys(
+        cls, renditions: Optional[List[Rendition]]
+    ) -> Optional[List[Rendition]]:
+        # Renditions sharing a key would overwrite each other's upload and result
+        keys = [r.key for r in renditions or []]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            raise ValueError(
+                f"Duplicate rendition keys {duplicates}; give them distinct names"
+            )
+        return renditions
+
+    def merged_over(self, base: Optional["EncodingProfile"]) -> "EncodingProfile":
+        """Return ``base`` with this profile's set fields taking precedence."""
+        if base is None:
+            return self
+        # Validate the merged fields again so nested renditions stay models
+        return EncodingProfile.model_validate(
+            {**base.model_dump(exclude_none=True), **self.model_dump(exclude_none=True)}
+        )
+
 
 class VideoURL(BaseModel):
     url: str
     platform: str  # "tiktok", "youtube", "douyin", "gcs" 
+    profile: Optional[EncodingProfile] = None
 
 class BatchProcessRequest(BaseModel):
     urls: List[VideoURL]
     sheet_name: str
+    profile: Optional[EncodingProfile] = None  # default for items without their own
+
+    def resolved_urls(self) -> List[VideoURL]:
+        """Items with the batch profile applied beneath their own."""
+        if self.profile is None:
+            return self.urls
+        return [
+            u.model_copy(
+                update={
+                    "profile": u.profile.merged_over(self.profile)
+                    if u.profile
+                    else self.profile
+                }
+            )
+            for u in self.urls
+        ]
+
 
 class GIFResponse(BaseModel):
     original_url: str
@@ -15,9 +96,34 @@ class GIFResponse(BaseModel):
     gif_url: Optional[str] = None
     status: str
     error: Optional[str] = None
+    renditions: Optional[Dict[str, str]] = None  # rendition key -> URL
+    # "hit", "miss", "duplicate" (repeated in the same batch) or "ledger" (done in an
+    # earlier run of the sheet)
+    cache: Optional[str] = None
+    # Seconds per stage, when debug_timing is on
+    timings: Optional[Dict[str, float]] = None
+    # Peak RSS of the encode, when debug_timing is on
+    peak_rss_mb: Optional[float] = None
 
 class BatchProcessResponse(BaseModel):
     results: List[GIFResponse]
     total_processed: int
     successful: int
-    failed: int 
\ No newline at end of file
+    failed: int
+
+
+class TaskSubmitResponse(BaseModel):
+    task_id: str
+    status: str
+    total: int
+
+
+class TaskStatusResponse(BaseModel):
+    task_id: str
+    sheet_name: str
+    status: str  # "pending", "running", "completed"
+    total: int
+    completed: int
+    successful: int
+    failed: int
+    results: List[Optional[GIFResponse]]
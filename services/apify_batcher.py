@@ -0,0 +1,72 @@
+import asyncio
+from typing import Dict, List
+
+from core import metrics
+from services.resilience import ItemError, upstreams
+
+
+class ApifyBatcher:
+    """Resolves many URLs through chunked Apify actor runs.
+
+    ``client`` must provide ``fetch_items(urls)``, ``match_key(url)`` and
+    ``item_keys(item)``; dataset items are paired back to the URL they were
+    scraped for through those keys. Each chunk of up to ``batch_size`` URLs
+    costs one actor run, bounded by the shared ``limit`` semaphore and by the
+    ``apify`` rate limit and circuit breaker, which charge every URL.
+    """
+
+    def __init__(
+        self, client, batch_size: int, limit: asyncio.Semaphore, platform: str = ""
+    ):
+        self.client = client
+        self.platform = platform
+        self.batch_size = batch_size
+        self.limit = limit
+        self._tasks = set()
+
+    def submit(self, urls: List[str]) -> Dict[str, asyncio.Future]:
+        """Start actor runs for ``urls``; return a future of its item per URL."""
+        loop = asyncio.get_running_loop()
+        futures = {url: loop.create_future() for url in dict.fromkeys(urls)}
+        unique = list(futures)
+        for start in range(0, len(unique), self.batch_size):
+            chunk = unique[start : start + self.batch_size]
+            task = asyncio.create_task(self._run({url: futures[url] for url in chunk}))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return futures
+
+    async def resolve(self, url: str) -> dict:
+        return await self.submit([url])[url]
+
+    async def _run(self, futures: Dict[str, asyncio.Future]):
+        try:
+            async with self.limit:
+                with metrics.stage("apify_run", self.platform):
+                    items = await upstreams.call(
+                        "apify",
+                        lambda: self.client.fetch_items(list(futures)),
+                        count=len(futures),
+                    )
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_key = {}
+        for item in items:
+            for key in self.client.item_keys(item):
+                by_key.setdefault(key, item)
+
+        for url, future in futures.items():
+            item = by_key.get(self.client.match_key(url))
+            if item is None and len(futures) == 1 and items:
+                # A single-URL run needs no matching
+                item = items[0]
+            if future.done():
+                continue
+            if item is None:
+                future.set_exception(ItemError("No items returned from Apify"))
+            else:
+                future.set_result(item)
@@ -0,0 +1,307 @@
+import asyncio
+import multiprocessing
+import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from core import metrics
+from core.config import settings
+from utils.resources import MiB, job_limits
+
+
+class EncoderError(Exception):
+    """Raised when an encode job fails inside a worker process."""
+
+
+class EncoderBusyError(EncoderError):
+    """Raised when the encoder queue is full and a job cannot be accepted."""
+
+
+class EncoderTimeoutError(EncoderError):
+    """Raised when an encode job exceeds its timeout and its worker is killed."""
+
+
+def _worker_main(conn) -> None:
+    """Run jobs received over ``conn`` until the pool closes it."""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args, kwargs, (memory, cpu) = job
+        usage = None
+        try:
+            with job_limits(memory, cpu) as usage:
+                value = fn(*args, **kwargs)
+            conn.send((True, value, usage.peak_rss))
+        except MemoryError:
+            conn.send(
+                (
+                    False,
+                    "ResourceLimitError: encode job exceeded its memory limit "
+                    f"of {memory // MiB} MiB",
+                    usage.peak_rss if usage else 0,
+                )
+            )
+        except Exception as e:
+            conn.send(
+                (False, f"{type(e).__name__}: {e}", usage.peak_rss if usage else 0)
+            )
+    conn.close()
+
+
+def _ping() -> bool:
+    return True
+
+
+class _Worker:
+    """A long-lived encoder process that can be killed and replaced on its own."""
+
+    def __init__(self, ctx):
+        self._ctx = ctx
+        self._spawn()
+
+    def _spawn(self):
+        self.conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def _respawn(self):
+        self.kill()
+        self._spawn()
+
+    def call(
+        self,
+        fn: Callable,
+        args: tuple,
+        kwargs: dict,
+        limits: Tuple[int, float],
+        timeout: float,
+    ) -> Tuple[Any, int]:
+        """Run one job in the worker process; return its result and peak RSS. Blocks."""
+        if not self.process.is_alive():
+            self._respawn()
+        self.conn.send((fn, args, kwargs, limits))
+        if not self.conn.poll(timeout):
+            self._respawn()
+            raise EncoderTimeoutError(f"Encode job timed out after {timeout}s")
+        try:
+            ok, value, peak = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(1)
+            exitcode = self.process.exitcode
+            self._respawn()
+            if exitcode == -signal.SIGXCPU:
+                raise EncoderError(
+                    f"Encoder worker exceeded the CPU-time limit of {limits[1]:g}s"
+                ) from None
+            if exitcode == -signal.SIGKILL:
+                raise EncoderError(
+                    "Encoder worker was killed, likely out of memory"
+                ) from None
+            raise EncoderError("Encoder worker exited unexpectedly") from None
+        if not ok:
+            raise EncoderError(value)
+        return value, peak
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self, timeout: float = 5):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class MemoryBudget:
+    """Estimated memory, in bytes, shared by the encode jobs running or about to run.
+
+    Jobs are admitted in order, so a large job is not starved by smaller
+    ones behind it. A job larger than the whole budget waits for it all.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.available = total
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    async def acquire(self, amount: int) -> int:
+        """Take ``amount`` bytes once they are free; return the amount taken."""
+        amount = min(amount, self.total)
+        if not self._waiters and amount <= self.available:
+            self._take(amount)
+            return amount
+        entry = (amount, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        try:
+            await entry[1]
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._wake()
+            elif not entry[1].cancelled():
+                self.release(amount)
+            raise
+        return amount
+
+    def release(self, amount: int) -> None:
+        self._take(-amount)
+        self._wake()
+
+    def _take(self, amount: int) -> None:
+        self.available -= amount
+        metrics.ENCODE_MEMORY_RESERVED.set(self.total - self.available)
+
+    def _wake(self) -> None:
+        while self._waiters and self._waiters[0][0] <= self.available:
+            amount, future = self._waiters.popleft()
+            if not future.done():
+                self._take(amount)
+                future.set_result(None)
+
+
+class EncoderPool:
+    """Runs CPU-bound encode jobs in a fixed set of worker processes.
+
+    At most ``workers`` jobs run at once and at most ``max_queue`` more wait
+    for a free worker; further submissions fail fast with EncoderBusyError.
+    A job that runs past ``job_timeout`` seconds has its worker killed and
+    replaced without affecting jobs on other workers.
+
+    Jobs submitted with a memory estimate also wait for room in a
+    ``memory_budget`` bytes budget, and run with a memory limit of
+    ``memory_headroom`` times their estimate and a ``cpu_limit`` seconds
+    CPU-time limit. Each job's peak RSS is recorded.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        job_timeout: float,
+        start_method: str = "spawn",
+        memory_budget: int = 0,
+        memory_headroom: float = 0,
+        cpu_limit: float = 0,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.memory_budget = MemoryBudget(memory_budget) if memory_budget else None
+        self.memory_headroom = memory_headroom
+        self.cpu_limit = cpu_limit
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers: List[_Worker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._waiting = 0
+        self.warm = False
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def warm_up(self) -> None:
+        """Start the pool and wait until every worker process answers a no-op job."""
+        self.start()
+        # Each ping holds its worker until it returns, so every worker gets one
+        await asyncio.gather(*(self.submit(_ping) for _ in range(self.workers)))
+        self.warm = True
+
+    def start(self) -> None:
+        if self.started:
+            return
+        self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="encoder")
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            worker = _Worker(self._ctx)
+            self._workers.append(worker)
+            self._idle.put_nowait(worker)
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in a worker process and return its result.
+
+        ``fn`` and its arguments must be picklable.
+        """
+        return await self.submit_job(fn, args, kwargs)
+
+    async def submit_job(
+        self,
+        fn: Callable,
+        args: tuple = (),
+        kwargs: Optional[dict] = None,
+        memory: int = 0,
+    ) -> Any:
+        """Like ``submit``, for a job estimated to need ``memory`` bytes."""
+        self.start()
+        if self._idle.empty() and self._waiting >= self.max_queue:
+            raise EncoderBusyError(
+                f"Encoder queue is full ({self.max_queue} jobs waiting)"
+            )
+        budget = self.memory_budget
+        reserved = 0
+        self._waiting += 1
+        try:
+            if budget is not None and memory:
+                reserved = await budget.acquire(memory)
+            worker = await self._idle.get()
+        except BaseException:
+            if reserved:
+                budget.release(reserved)
+            raise
+        finally:
+            self._waiting -= 1
+
+        loop = asyncio.get_running_loop()
+        idle = self._idle
+        limits = (int(memory * self.memory_headroom), self.cpu_limit)
+        job = self._threads.submit(
+            worker.call, fn, args, kwargs or {}, limits, self.job_timeout
+        )
+
+        # Only hand the worker and its memory back once the job has really
+        # finished, even if the caller is cancelled while it is still running.
+        def finished(_):
+            loop.call_soon_threadsafe(idle.put_nowait, worker)
+            if reserved:
+                loop.call_soon_threadsafe(budget.release, reserved)
+
+        job.add_done_callback(finished)
+        value, peak = await asyncio.wrap_future(job)
+        metrics.record_peak_rss(peak)
+        return value
+
+    async def close(self) -> None:
+        if not self.started:
+            return
+        workers, self._workers = self._workers, []
+        threads, self._threads = self._threads, None
+        self._idle = None
+        self.warm = False
+        await asyncio.to_thread(lambda: [worker.stop() for worker in workers])
+        threads.shutdown(wait=False, cancel_futures=True)
+
+
+encoder_pool = EncoderPool(
+    workers=settings.ENCODER_WORKERS,
+    max_queue=settings.ENCODER_MAX_QUEUE,
+    job_timeout=settings.ENCODER_JOB_TIMEOUT,
+    start_method=settings.ENCODER_START_METHOD,
+    memory_budget=settings.ENCODER_MEMORY_BUDGET,
+    memory_headroom=settings.ENCODER_MEMORY_HEADROOM,
+    cpu_limit=settings.ENCODER_JOB_CPU_SECONDS,
+)
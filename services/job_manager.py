@@ -0,0 +1,350 @@
+import asyncio
+import traceback
+import uuid
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from model.schemas import BatchProcessRequest, GIFResponse, TaskStatusResponse, VideoURL
+from services.job_store import JobStore
+from services.resilience import (
+    BatchTooLargeError,
+    OverloadedError,
+    Ticket,
+    admission,
+)
+from services.sheet_ledger import InMemorySheetLedger, SheetLedger
+from services.video_processor import VideoProcessor
+from services.work_queue import WorkQueue
+
+
+class JobManager:
+    """Runs batches in the background and tracks their progress in a JobStore.
+
+    With a ``queue`` the manager only enqueues: worker processes
+    (``worker.py``) do the processing and write results to the shared store.
+    Rows of a named sheet that the ``ledger`` holds as completed are
+    answered from it and not processed again.
+    """
+
+    def __init__(
+        self,
+        processor: VideoProcessor,
+        store: JobStore,
+        queue: Optional[WorkQueue] = None,
+        ledger: Optional[SheetLedger] = None,
+    ):
+        self.processor = processor
+        self.store = store
+        self.queue = queue
+        self.ledger = ledger or InMemorySheetLedger()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def submit(self, request: BatchProcessRequest) -> str:
+        """Record a new job and start processing it; return its task ID.
+
+        Raises OverloadedError when the service has no room for the batch,
+        and BatchTooLargeError when the batch is larger than it could ever admit.
+        """
+        urls = request.resolved_urls()
+        keys = [self.processor.cache_key(video_url) for video_url in urls]
+        # Admit before checkpointing, so a refused batch leaves the ledger as it was
+        completed = await asyncio.to_thread(
+            self.ledger.completed, request.sheet_name, keys, urls
+        )
+        count = len(urls) - len(completed)
+        if self.queue is not None:
+            await asyncio.to_thread(self._check_backlog, count)
+            ticket = None
+        else:
+            ticket = admission.admit(count)
+        try:
+            task_id, todo = await asyncio.to_thread(
+                self._create, request.sheet_name, urls, keys
+            )
+        except BaseException:
+            if ticket is not None:
+                ticket.close()
+            raise
+        if ticket is not None and todo:
+            self._start(task_id, todo, request.sheet_name, ticket)
+        elif ticket is not None:
+            ticket.close()
+        return task_id
+
+    def _create(
+        self, sheet_name: str, urls: List[VideoURL], keys: List[str]
+    ) -> Tuple[str, List[Tuple[int, VideoURL]]]:
+        """Checkpoint the sheet and store the job; return its ID and the items to run.
+
+        Blocking; in queue mode the items are enqueued here too.
+        """
+        completed = self.ledger.checkpoint(sheet_name, keys, urls)
+        todo = [
+            (index, video_url)
+            for index, video_url in enumerate(urls)
+            if index not in completed
+        ]
+        task_id = uuid.uuid4().hex
+        self.store.create(task_id, sheet_name, urls)
+        for index, result in completed.items():
+            self.store.set_result(task_id, index, result)
+        if not todo:
+            self.store.set_status(task_id, "completed")
+        elif self.queue is not None:
+            self.queue.enqueue(task_id, sheet_name, todo)
+        return task_id, todo
+
+    async def process_now(self, request: BatchProcessRequest) -> List[GIFResponse]:
+        """Process a batch here, without a job, and return results in input order.
+
+        Raises like ``submit`` when the batch cannot be admitted.
+        """
+        urls = request.resolved_urls()
+        keys = [self.processor.cache_key(video_url) for video_url in urls]
+        completed = await asyncio.to_thread(
+            self.ledger.completed, request.sheet_name, keys, urls
+        )
+
+        async with admission.hold(len(urls) - len(completed)) as ticket:
+            completed = await asyncio.to_thread(
+                self.ledger.checkpoint, request.sheet_name, keys, urls
+            )
+            results: List[Optional[GIFResponse]] = [
+                completed.get(index) for index in range(len(urls))
+            ]
+            todo = [index for index in range(len(urls)) if index not in completed]
+
+            async def on_result(position: int, result: GIFResponse):
+                index = todo[position]
+                results[index] = result
+                await asyncio.to_thread(
+                    self.ledger.record, request.sheet_name, index, keys[index], result
+                )
+                ticket.done()
+
+            await self.processor.process_batch(
+                [urls[index] for index in todo], request.sheet_name, on_result=on_result
+            )
+        return results
+
+    def _check_backlog(self, count: int):
+        """Admission for queue mode, where the backlog lives in the shared queue."""
+        if count > admission.max_items:
+            raise BatchTooLargeError(count, admission.max_items)
+        counts = self.queue.counts()
+        backlog = counts.get("ready", 0) + counts.get("leased", 0)
+        if backlog + count > admission.max_items:
+            raise OverloadedError(
+                f"Service is at capacity ({backlog} items queued)",
+                settings.ADMISSION_RETRY_AFTER,
+            )
+
+    def _start(
+        self,
+        task_id: str,
+        items: List[Tuple[int, VideoURL]],
+        sheet_name: str,
+        ticket: Ticket,
+    ):
+        task = asyncio.create_task(self._run(task_id, items, sheet_name, ticket))
+        self._tasks[task_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(task_id, None))
+
+    async def _run(
+        self,
+        task_id: str,
+        items: List[Tuple[int, VideoURL]],
+        sheet_name: str,
+        ticket: Ticket,
+    ):
+        await asyncio.to_thread(self.store.set_status, task_id, "running")
+        indexes = [index for index, _ in items]
+        pending = dict(items)
+
+        async def finish(index: int, result: GIFResponse):
+            video_url = pending.pop(index, None)
+            if video_url is None:
+                return
+            await asyncio.to_thread(
+                self._record, task_id, sheet_name, index, video_url, result
+            )
+            ticket.done()
+            for queue in self._listeners.get(task_id, ()):
+                queue.put_nowait((index, result))
+
+        async def on_result(position: int, result: GIFResponse):
+            await finish(indexes[position], result)
+
+        try:
+            await self.processor.process_batch(
+                [video_url for _, video_url in items], sheet_name, on_result=on_result
+            )
+        except Exception as e:
+            # Otherwise the job would stay "running" with items that never finish
+            print(f"Job {task_id} failed: {e!r}")
+            traceback.print_exc()
+            for index, video_url in list(pending.items()):
+                await finish(
+                    index,
+                    GIFResponse(
+                        original_url=video_url.url,
+                        status="failed",
+                        error=f"Job failed: {e}",
+                    ),
+                )
+        finally:
+            ticket.close()
+        await asyncio.to_thread(self.store.set_status, task_id, "completed")
+
+    def _record(
+        self,
+        task_id: str,
+        sheet_name: str,
+        index: int,
+        video_url: VideoURL,
+        result: GIFResponse,
+    ):
+        """Store an item's result in the job and the sheet's ledger; blocking."""
+        self.store.set_result(task_id, index, result)
+        self.ledger.record(
+            sheet_name, index, self.processor.cache_key(video_url), result
+        )
+
+    async def resume_unfinished(self) -> None:
+        """Restart jobs left pending or running by a previous process."""
+        if self.queue is not None:
+            # Queued items survive restarts; workers pick them up
+            return
+        for task_id in await asyncio.to_thread(self.store.unfinished):
+            if task_id in self._tasks:
+                continue
+            job = await asyncio.to_thread(self.store.get, task_id)
+            remaining = [
+                (
+                    index,
+                    VideoURL(
+                        url=item["url"],
+                        platform=item["platform"],
+                        profile=item.get("profile"),
+                    ),
+                )
+                for index, item in enumerate(job["items"])
+                if item["result"] is None
+            ]
+            if remaining:
+                # Already accepted once, so admitted even past the limit
+                self._start(
+                    task_id,
+                    remaining,
+                    job["sheet_name"],
+                    admission.admit(len(remaining), force=True),
+                )
+            else:
+                await asyncio.to_thread(self.store.set_status, task_id, "completed")
+
+    async def shutdown(self) -> None:
+        """Cancel in-flight jobs; persistent stores resume them on next start."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self, task_id: str) -> Optional[TaskStatusResponse]:
+        job = self.store.get(task_id)
+        if job is None:
+            return None
+        results = [item["result"] for item in job["items"]]
+        done = [r for r in results if r is not None]
+        return TaskStatusResponse(
+            task_id=task_id,
+            sheet_name=job["sheet_name"],
+            status=job["status"],
+            total=len(results),
+            completed=len(done),
+            successful=sum(1 for r in done if r.status == "success"),
+            failed=sum(1 for r in done if r.status == "failed"),
+            results=results,
+        )
+
+    async def wait(
+        self, task_id: str, timeout: Optional[float] = None
+    ) -> List[GIFResponse]:
+        """Wait for a job to complete and return its results in input order.
+
+        Items without a result after ``timeout`` seconds (``JOB_WAIT_TIMEOUT``
+        by default) are reported as failed; the job itself carries on.
+        """
+        items = (await asyncio.to_thread(self.store.get, task_id))["items"]
+        results: List[Optional[GIFResponse]] = [None] * len(items)
+
+        async def collect():
+            async with aclosing(self.stream(task_id)) as stream:
+                async for index, result in stream:
+                    results[index] = result
+            task = self._tasks.get(task_id)
+            if task is not None:
+                # The job is marked completed only after its last result
+                await asyncio.shield(task)
+
+        try:
+            await asyncio.wait_for(
+                collect(), settings.JOB_WAIT_TIMEOUT if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            pass
+        return [
+            result
+            or GIFResponse(
+                original_url=item["url"],
+                status="failed",
+                error="Timed out waiting for the item",
+            )
+            for result, item in zip(results, items, strict=True)
+        ]
+
+    async def stream(self, task_id: str) -> AsyncIterator[Tuple[int, GIFResponse]]:
+        """Yield (index, result) pairs as items finish, including earlier ones."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(task_id, set()).add(queue)
+        try:
+            job = await asyncio.to_thread(self.store.get, task_id)
+            total = len(job["items"])
+            seen = set()
+            for index, item in enumerate(job["items"]):
+                if item["result"] is not None:
+                    seen.add(index)
+                    yield index, item["result"]
+            while len(seen) < total:
+                if self.queue is not None:
+                    # Workers write to the shared store; poll it
+                    job = await asyncio.to_thread(self.store.get, task_id)
+                    for index, item in enumerate(job["items"]):
+                        if index not in seen and item["result"] is not None:
+                            seen.add(index)
+                            yield index, item["result"]
+                    if len(seen) < total:
+                        await asyncio.sleep(1)
+                    continue
+                if task_id not in self._tasks:
+                    # The job is not running here; report whatever was stored
+                    job = await asyncio.to_thread(self.store.get, task_id)
+                    for index, item in enumerate(job["items"]):
+                        if index not in seen and item["result"] is not None:
+                            seen.add(index)
+                            yield index, item["result"]
+                    break
+                try:
+                    index, result = await asyncio.wait_for(queue.get(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                if index not in seen:
+                    seen.add(index)
+                    yield index, result
+        finally:
+            listeners = self._listeners.get(task_id)
+            if listeners is not None:
+                listeners.discard(queue)
+                if not listeners:
+                    del self._listeners[task_id]
@@ -0,0 +1,307 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from core.config import settings
+from model.schemas import EncodingProfile, GIFResponse, VideoURL
+
+
+class JobStore(ABC):
+    """Persists batch jobs and their per-item results.
+
+    Completed jobs are kept for ``JOB_RETENTION`` seconds, then pruned.
+    """
+
+    @abstractmethod
+    def create(self, task_id: str, sheet_name: str, urls: List[VideoURL]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_status(self, task_id: str, status: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_result(self, task_id: str, index: int, result: GIFResponse) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[dict]:
+        """Return the job as a dict with an ``items`` list, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def unfinished(self) -> List[str]:
+        """Return the IDs of jobs that have not completed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def result(self, task_id: str, index: int) -> Optional[GIFResponse]:
+        """Return one item's stored result, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remaining(self, task_id: str) -> int:
+        """Return how many items of the job have no result yet."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def prune(self) -> int:
+        """Delete completed jobs past their retention; return how many were deleted."""
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs in a dict. Besides the retention, at most ``max_completed``
+    completed jobs are kept; the oldest go first."""
+
+    def __init__(
+        self, retention: Optional[float] = None, max_completed: Optional[int] = None
+    ):
+        self.retention = settings.JOB_RETENTION if retention is None else retention
+        self.max_completed = (
+            settings.JOB_MAX_COMPLETED if max_completed is None else max_completed
+        )
+        # Callers run on worker threads; reentrant because writes also prune
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, dict] = {}
+        # Completed task IDs in completion order, for pruning without a scan
+        self._completed: "OrderedDict[str, float]" = OrderedDict()
+
+    def create(self, task_id: str, sheet_name: str, urls: List[VideoURL]) -> None:
+        with self._lock:
+            self.prune()
+            now = time.time()
+            self._jobs[task_id] = {
+                "task_id": task_id,
+                "sheet_name": sheet_name,
+                "status": "pending",
+                "created_at": now,
+                "updated_at": now,
+                "items": [
+                    {
+                        "url": u.url,
+                        "platform": u.platform,
+                        "profile": u.profile,
+                        "result": None,
+                    }
+                    for u in urls
+                ],
+            }
+
+    def set_status(self, task_id: str, status: str) -> None:
+        with self._lock:
+            job = self._jobs[task_id]
+            job["status"] = status
+            job["updated_at"] = time.time()
+            self._completed.pop(task_id, None)
+            if status == "completed":
+                self._completed[task_id] = job["updated_at"]
+                self.prune()
+
+    def set_result(self, task_id: str, index: int, result: GIFResponse) -> None:
+        with self._lock:
+            job = self._jobs[task_id]
+            job["items"][index]["result"] = result
+            job["updated_at"] = time.time()
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._jobs.get(task_id)
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            return [t for t, job in self._jobs.items() if job["status"] != "completed"]
+
+    def result(self, task_id: str, index: int) -> Optional[GIFResponse]:
+        with self._lock:
+            return self._jobs[task_id]["items"][index]["result"]
+
+    def remaining(self, task_id: str) -> int:
+        with self._lock:
+            return sum(
+                1 for item in self._jobs[task_id]["items"] if item["result"] is None
+            )
+
+    def prune(self) -> int:
+        cutoff = time.time() - self.retention
+        pruned = 0
+        with self._lock:
+            while self._completed:
+                task_id, completed_at = next(iter(self._completed.items()))
+                if (
+                    completed_at >= cutoff
+                    and len(self._completed) <= self.max_completed
+                ):
+                    break
+                del self._completed[task_id]
+                del self._jobs[task_id]
+                pruned += 1
+        return pruned
+
+
+class SQLiteJobStore(JobStore):
+    # Seconds between the prunes that ``create`` runs
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path: str, retention: Optional[float] = None):
+        self.retention = settings.JOB_RETENTION if retention is None else retention
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                task_id TEXT PRIMARY KEY,
+                sheet_name TEXT,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                profile TEXT,
+                result TEXT,
+                PRIMARY KEY (task_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(job_items)")}
+        if "profile" not in columns:
+            # Databases created before encoding profiles existed
+            self._conn.execute("ALTER TABLE job_items ADD COLUMN profile TEXT")
+        self._conn.commit()
+
+    def create(self, task_id: str, sheet_name: str, urls: List[VideoURL]) -> None:
+        now = time.time()
+        if now - self._pruned_at >= self.PRUNE_INTERVAL:
+            self.prune()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, 'pending', ?, ?)",
+                (task_id, sheet_name, now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (task_id, idx, url, platform, profile) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        task_id,
+                        i,
+                        u.url,
+                        u.platform,
+                        u.profile.model_dump_json() if u.profile else None,
+                    )
+                    for i, u in enumerate(urls)
+                ],
+            )
+
+    def set_status(self, task_id: str, status: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE task_id = ?",
+                (status, time.time(), task_id),
+            )
+
+    def set_result(self, task_id: str, index: int, result: GIFResponse) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_items SET result = ? WHERE task_id = ? AND idx = ?",
+                (result.model_dump_json(), task_id, index),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE task_id = ?",
+                (time.time(), task_id),
+            )
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task_id, sheet_name, status, created_at, updated_at "
+                "FROM jobs WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            items = self._conn.execute(
+                "SELECT url, platform, profile, result FROM job_items "
+                "WHERE task_id = ? ORDER BY idx",
+                (task_id,),
+            ).fetchall()
+        return {
+            "task_id": row[0],
+            "sheet_name": row[1],
+            "status": row[2],
+            "created_at": row[3],
+            "updated_at": row[4],
+            "items": [
+                {
+                    "url": url,
+                    "platform": platform,
+                    "profile": EncodingProfile(**json.loads(profile))
+                    if profile
+                    else None,
+                    "result": GIFResponse(**json.loads(result)) if result else None,
+                }
+                for url, platform, profile, result in items
+            ],
+        }
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id FROM jobs WHERE status != 'completed' "
+                "ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def result(self, task_id: str, index: int) -> Optional[GIFResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM job_items WHERE task_id = ? AND idx = ?",
+                (task_id, index),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return GIFResponse(**json.loads(row[0]))
+
+    def remaining(self, task_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE task_id = ? AND result IS NULL",
+                (task_id,),
+            ).fetchone()
+        return row[0]
+
+    def prune(self) -> int:
+        self._pruned_at = time.time()
+        cutoff = self._pruned_at - self.retention
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM job_items WHERE task_id IN "
+                "(SELECT task_id FROM jobs "
+                "WHERE status = 'completed' AND updated_at < ?)",
+                (cutoff,),
+            )
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status = 'completed' AND updated_at < ?",
+                (cutoff,),
+            )
+        return cursor.rowcount
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by ``settings.JOB_STORE``."""
+    if settings.JOB_STORE == "memory":
+        return InMemoryJobStore()
+    elif settings.JOB_STORE == "sqlite":
+        return SQLiteJobStore(settings.JOB_STORE_PATH)
+    raise ValueError(f"Unsupported job store: {settings.JOB_STORE}")
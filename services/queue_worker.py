@@ -0,0 +1,194 @@
+import asyncio
+import os
+import socket
+from typing import Dict, List, Optional, Set
+
+from core.config import settings
+from model.schemas import GIFResponse
+from services.job_store import JobStore
+from services.sheet_ledger import SheetLedger
+from services.video_processor import VideoProcessor
+from services.work_queue import WorkQueue
+
+
+class QueueWorker:
+    """Leases items from a WorkQueue and runs them through a VideoProcessor.
+
+    Each lease is processed as one batch, so Apify runs are still shared
+    between its items. Results go to the shared JobStore. Successful items
+    are acked. Failed ones are retried with backoff until the queue
+    dead-letters them, and only the final failure is recorded; that includes
+    items whose last lease expired because a worker died. An item whose
+    success is already stored (its earlier ack was lost) is acked without
+    being processed again. Final results also go to the sheet ``ledger``.
+    """
+
+    def __init__(
+        self,
+        processor: VideoProcessor,
+        store: JobStore,
+        queue: WorkQueue,
+        worker_id: str = "",
+        ledger: Optional[SheetLedger] = None,
+    ):
+        self.processor = processor
+        self.store = store
+        self.queue = queue
+        self.ledger = ledger
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._leases: Dict[int, str] = {}
+        self._batches: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._capacity = asyncio.Event()
+
+    def stop(self):
+        """Stop leasing; ``run`` returns once in-flight items finish or are released."""
+        self._stopping.set()
+        self._capacity.set()
+
+    async def run(self) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping.is_set():
+                await self._expire()
+                free = settings.WORKER_CONCURRENCY - len(self._leases)
+                items = []
+                if free > 0:
+                    items = await asyncio.to_thread(
+                        self.queue.lease,
+                        self.worker_id,
+                        min(free, settings.WORKER_LEASE_SIZE),
+                        settings.QUEUE_VISIBILITY_TIMEOUT,
+                    )
+                if not items:
+                    # Sleep until the poll interval passes or a batch frees capacity
+                    self._capacity.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._capacity.wait(), settings.QUEUE_POLL_INTERVAL
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for item in items:
+                    self._leases[item["id"]] = item["token"]
+                batch = asyncio.create_task(self._process(items))
+                self._batches.add(batch)
+                batch.add_done_callback(self._batches.discard)
+            await self._drain()
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _drain(self):
+        if not self._batches:
+            return
+        _, pending = await asyncio.wait(
+            self._batches, timeout=settings.QUEUE_VISIBILITY_TIMEOUT / 2
+        )
+        for batch in pending:
+            batch.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # Hand unfinished items straight back instead of waiting out their leases
+        for item_id, token in list(self._leases.items()):
+            await asyncio.to_thread(self.queue.release, item_id, token)
+        self._leases.clear()
+
+    async def _heartbeat(self):
+        """Keep leases of in-flight items from expiring while they are processed."""
+        while True:
+            await asyncio.sleep(settings.QUEUE_VISIBILITY_TIMEOUT / 3)
+            for item_id, token in list(self._leases.items()):
+                if not await asyncio.to_thread(
+                    self.queue.extend, item_id, token, settings.QUEUE_VISIBILITY_TIMEOUT
+                ):
+                    # Another worker has taken it over; its ack counts, ours is ignored
+                    self._leases.pop(item_id, None)
+
+    async def _record(self, item: dict, result: GIFResponse):
+        await asyncio.to_thread(
+            self.store.set_result, item["task_id"], item["index"], result
+        )
+        if self.ledger is not None:
+            await asyncio.to_thread(
+                self.ledger.record,
+                item["sheet_name"],
+                item["index"],
+                self.processor.cache_key(item["video_url"]),
+                result,
+            )
+
+    async def _complete_if_done(self, task_id: str):
+        if await asyncio.to_thread(self.store.remaining, task_id) == 0:
+            await asyncio.to_thread(self.store.set_status, task_id, "completed")
+
+    async def _expire(self):
+        """Record the failure of items whose last attempt's lease expired."""
+        for item in await asyncio.to_thread(self.queue.expire):
+            stored = await asyncio.to_thread(
+                self.store.result, item["task_id"], item["index"]
+            )
+            if stored is None:
+                await self._record(
+                    item,
+                    GIFResponse(
+                        original_url=item["video_url"].url,
+                        status="failed",
+                        error=item["error"],
+                    ),
+                )
+            await self._complete_if_done(item["task_id"])
+
+    async def _finish(self, item: dict, result: GIFResponse):
+        if result.status == "success":
+            await self._record(item, result)
+            await asyncio.to_thread(self.queue.ack, item["id"], item["token"])
+        elif await asyncio.to_thread(
+            self.queue.nack, item["id"], item["token"], result.error or "failed"
+        ):
+            # Out of attempts: the failure becomes the item's final result
+            await self._record(item, result)
+        self._leases.pop(item["id"], None)
+        self._capacity.set()
+        await self._complete_if_done(item["task_id"])
+
+    async def _process(self, items: List[dict]):
+        todo = []
+        for item in items:
+            done = await asyncio.to_thread(
+                self.store.result, item["task_id"], item["index"]
+            )
+            if done is not None and done.status == "success":
+                await asyncio.to_thread(self.queue.ack, item["id"], item["token"])
+                self._leases.pop(item["id"], None)
+            else:
+                todo.append(item)
+        for task_id in {item["task_id"] for item in todo}:
+            await asyncio.to_thread(self.store.set_status, task_id, "running")
+
+        finished: Set[int] = set()
+
+        async def on_result(position: int, result: GIFResponse):
+            finished.add(position)
+            await self._finish(todo[position], result)
+
+        try:
+            await self.processor.process_batch(
+                [item["video_url"] for item in todo],
+                todo[0]["sheet_name"] if todo else "",
+                on_result=on_result,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            for position, item in enumerate(todo):
+                if position not in finished:
+                    await self._finish(
+                        item,
+                        GIFResponse(
+                            original_url=item["video_url"].url,
+                            status="failed",
+                            error=str(e),
+                        ),
+                    )
+        self._capacity.set()
@@ -0,0 +1,274 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from core.config import settings
+
+T = TypeVar("T")
+
+# Host each platform's videos are fetched from; circuits and rate limits are per
+# upstream. TikTok and YouTube are resolved through "apify" first, and every platform
+# uploads to "gcs".
+SOURCE_UPSTREAMS = {
+    "tiktok": "gcs",
+    "youtube": "youtube",
+    "douyin": "douyin",
+    "gcs": "gcs",
+}
+
+
+class ItemError(Exception):
+    """A problem with the item (bad URL, missing from a dataset), not its upstream."""
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(
+            f"{upstream} is unavailable (circuit open); "
+            f"retry in {math.ceil(retry_after)}s"
+        )
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class OverloadedError(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BatchTooLargeError(Exception):
+    """A batch larger than the service could ever admit at once."""
+
+    def __init__(self, count: int, max_items: int):
+        super().__init__(
+            f"Batch of {count} items exceeds the limit of {max_items}; split it"
+        )
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error says something about upstream health; item errors do not."""
+    if isinstance(error, (ItemError, ValueError)):
+        return False
+    # A missing or forbidden object is the item's problem; 429 and 5xx are the host's
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+class TokenBucket:
+    """Allows ``rate`` operations per second on average, with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, count: int = 1):
+        # The lock queues waiters, so tokens are handed out in FIFO order.
+        # A count above the burst leaves a debt that later callers wait out.
+        async with self._lock:
+            self._refill()
+            if self._tokens < count:
+                await asyncio.sleep((min(count, self.burst) - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= count
+
+
+class CircuitBreaker:
+    """Fails fast after ``failure_threshold`` consecutive failures.
+
+    Closed: calls pass. Open: calls are rejected until ``reset_timeout``
+    has passed. Half-open: one trial call passes; its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "open" and self.retry_after <= 0:
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_running:
+                return False
+            self._trial_running = True
+        return self.state != "open"
+
+    def cancel_trial(self):
+        """The trial call was cancelled without an outcome; let another one through."""
+        self._trial_running = False
+
+    def record_success(self):
+        self._failures = 0
+        self._trial_running = False
+        self.state = "closed"
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"Circuit for {self.name} opened after {self._failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class Upstreams:
+    """Rate limits and circuit breakers for each upstream, created on first use."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def bucket(self, upstream: str) -> Optional[TokenBucket]:
+        if upstream not in self._buckets:
+            rate = settings.UPSTREAM_RATE_LIMITS.get(upstream)
+            self._buckets[upstream] = (
+                TokenBucket(rate, max(1.0, rate)) if rate else None
+            )
+        return self._buckets[upstream]
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        if upstream not in self._breakers:
+            self._breakers[upstream] = CircuitBreaker(
+                upstream,
+                settings.CIRCUIT_FAILURE_THRESHOLD,
+                settings.CIRCUIT_RESET_TIMEOUT,
+            )
+        return self._breakers[upstream]
+
+    def is_open(self, upstream: str) -> bool:
+        breaker = self._breakers.get(upstream)
+        return (
+            breaker is not None and breaker.state == "open" and breaker.retry_after > 0
+        )
+
+    async def call(
+        self, upstream: str, fn: Callable[[], Awaitable[T]], count: int = 1
+    ) -> T:
+        """Run ``fn`` under the upstream's circuit breaker and rate limit.
+
+        ``count`` items are charged to the rate limit; pass 0 for calls made
+        for items already charged, so only the circuit breaker applies.
+        """
+        breaker = self.breaker(upstream)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                upstream, breaker.retry_after or breaker.reset_timeout
+            )
+        try:
+            bucket = self.bucket(upstream)
+            if bucket is not None and count:
+                await bucket.acquire(count)
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.cancel_trial()
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+
+class Ticket:
+    """Admitted items; release them as they finish, and the rest on ``close``."""
+
+    def __init__(self, controller: "AdmissionController", count: int):
+        self._controller = controller
+        self._remaining = count
+
+    def done(self, count: int = 1):
+        count = min(count, self._remaining)
+        self._remaining -= count
+        self._controller._release(count)
+
+    def close(self):
+        self._controller._release(self._remaining, finished=False)
+        self._remaining = 0
+
+
+class AdmissionController:
+    """Caps the number of accepted but unfinished items across all batches."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.in_flight = 0
+        self._finished: Deque[float] = deque()
+
+    def _release(self, count: int, finished: bool = True):
+        self.in_flight -= count
+        if finished:
+            now = time.monotonic()
+            self._finished.extend([now] * count)
+
+    def _throughput(self) -> float:
+        """Items finished per second over the last minute."""
+        cutoff = time.monotonic() - 60
+        while self._finished and self._finished[0] < cutoff:
+            self._finished.popleft()
+        return len(self._finished) / 60
+
+    def retry_after(self, count: int) -> int:
+        """Seconds until ``count`` more items likely fit, from recent throughput."""
+        excess = self.in_flight + count - self.max_items
+        rate = self._throughput()
+        if excess <= 0:
+            return 1
+        if rate == 0:
+            return settings.ADMISSION_RETRY_AFTER
+        return min(300, max(1, math.ceil(excess / rate)))
+
+    def admit(self, count: int, force: bool = False) -> Ticket:
+        """Reserve room for ``count`` items or raise OverloadedError.
+
+        A batch that could never fit raises BatchTooLargeError. ``force`` admits
+        regardless, for work that was already accepted (resumed jobs).
+        """
+        if force:
+            self.in_flight += count
+            return Ticket(self, count)
+        if count > self.max_items:
+            raise BatchTooLargeError(count, self.max_items)
+        if self.in_flight + count > self.max_items:
+            raise OverloadedError(
+                f"Service is at capacity ({self.in_flight} items in progress)",
+                self.retry_after(count),
+            )
+        self.in_flight += count
+        return Ticket(self, count)
+
+    @asynccontextmanager
+    async def hold(self, count: int) -> AsyncIterator[Ticket]:
+        ticket = self.admit(count)
+        try:
+            yield ticket
+        finally:
+            ticket.close()
+
+
+upstreams = Upstreams()
+admission = AdmissionController(settings.ADMISSION_MAX_ITEMS)
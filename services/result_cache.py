@@ -0,0 +1,79 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from core.config import settings
+from utils.gcs_client import GCSClient
+from utils.url_utils import normalize_url
+
+
+class ResultCache:
+    """Two-tier cache of finished conversions.
+
+    GIFs are uploaded under a content-addressed name derived from the
+    normalised source URL and the encoding parameters, so the GCS bucket
+    itself is the durable tier. A local LRU with a TTL sits in front of it.
+    """
+
+    def __init__(self, gcs_client: GCSClient, max_entries: int, ttl: float):
+        self.gcs_client = gcs_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def key(self, platform: str, url: str, params: dict) -> str:
+        payload = json.dumps(
+            {"platform": platform, "url": normalize_url(url), "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def blob_name(self, key: str) -> str:
+        return f"{settings.image_extracted_folder_name}/{key}.gif"
+
+    def rendition_blob_name(self, key: str, rendition: str, fmt: str) -> str:
+        return f"{settings.image_extracted_folder_name}/{key}/{rendition}.{fmt}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        """``{"gif_url", "gcs_url", "renditions"}`` of a cached result, or None."""
+        if not settings.RESULT_CACHE_ENABLED:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if time.monotonic() - stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        if not settings.RESULT_CACHE_CHECK_GCS:
+            return None
+        try:
+            blob = await self.gcs_client.get_gif(self.blob_name(key))
+        except Exception:
+            # A failed lookup is a miss; the item is simply processed again
+            return None
+        if blob is None:
+            return None
+        metadata = blob["metadata"]
+        renditions = (
+            json.loads(metadata["renditions"]) if metadata.get("renditions") else None
+        )
+        value = {
+            "gif_url": blob["gif_url"],
+            "gcs_url": metadata.get("gcs_url"),
+            "renditions": renditions,
+        }
+        self.put(key, value)
+        return value
+
+    def put(self, key: str, value: dict) -> None:
+        if not settings.RESULT_CACHE_ENABLED:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,309 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from core.config import settings
+from model.schemas import GIFResponse, VideoURL
+
+
+class SheetLedger(ABC):
+    """Per-sheet checkpoint of every row's latest result.
+
+    Rows are identified by their item key (platform, normalised URL and
+    encoding parameters), so a resubmitted sheet reuses the successes of
+    rows that are unchanged, even if they moved, and processes only rows
+    that are new, changed or previously failed. Batches without a
+    ``sheet_name`` are not tracked.
+    """
+
+    @abstractmethod
+    def checkpoint(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        """Record the sheet's current rows; return those already completed, by index."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def completed(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        """Like ``checkpoint``, but without recording the rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(
+        self, sheet_name: str, index: int, key: str, result: GIFResponse
+    ) -> None:
+        """Store a row's result, unless a resubmitted sheet has another row there."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def rows(self, sheet_name: str) -> Optional[List[dict]]:
+        """The sheet's rows in order, each with its ``result`` (or None), or None."""
+        raise NotImplementedError
+
+
+def _reused(result: GIFResponse, video_url: VideoURL) -> GIFResponse:
+    return result.model_copy(
+        update={
+            "original_url": video_url.url,
+            "cache": "ledger",
+            "timings": None,
+            "peak_rss_mb": None,
+        }
+    )
+
+
+class InMemorySheetLedger(SheetLedger):
+    """Ledger in a dict of at most ``max_sheets`` sheets.
+
+    Over the limit, the least recently submitted sheet is dropped first.
+    """
+
+    def __init__(self, max_sheets: Optional[int] = None):
+        self.max_sheets = (
+            settings.LEDGER_MAX_SHEETS if max_sheets is None else max_sheets
+        )
+        # Callers run on worker threads
+        self._lock = threading.Lock()
+        self._sheets: "OrderedDict[str, List[dict]]" = OrderedDict()
+
+    def _succeeded(self, sheet_name: str) -> Dict[str, GIFResponse]:
+        return {
+            row["key"]: row["result"]
+            for row in self._sheets.get(sheet_name, [])
+            if row["result"] is not None and row["result"].status == "success"
+        }
+
+    def completed(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        if not sheet_name:
+            return {}
+        with self._lock:
+            succeeded = self._succeeded(sheet_name)
+        return {
+            index: _reused(succeeded[key], video_url)
+            for index, (key, video_url) in enumerate(zip(keys, urls, strict=True))
+            if key in succeeded
+        }
+
+    def checkpoint(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        if not sheet_name:
+            return {}
+        now = time.time()
+        completed = {}
+        rows = []
+        with self._lock:
+            succeeded = self._succeeded(sheet_name)
+            for index, (key, video_url) in enumerate(zip(keys, urls, strict=True)):
+                result = succeeded.get(key)
+                if result is not None:
+                    completed[index] = _reused(result, video_url)
+                rows.append(
+                    {
+                        "key": key,
+                        "url": video_url.url,
+                        "platform": video_url.platform,
+                        "result": result,
+                        "updated_at": now,
+                    }
+                )
+            self._sheets[sheet_name] = rows
+            self._sheets.move_to_end(sheet_name)
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last=False)
+        return completed
+
+    def record(
+        self, sheet_name: str, index: int, key: str, result: GIFResponse
+    ) -> None:
+        if not sheet_name:
+            return
+        with self._lock:
+            rows = self._sheets.get(sheet_name)
+            if rows is None or index >= len(rows) or rows[index]["key"] != key:
+                return
+            rows[index].update(result=result, updated_at=time.time())
+
+    def rows(self, sheet_name: str) -> Optional[List[dict]]:
+        with self._lock:
+            rows = self._sheets.get(sheet_name)
+            return [dict(row) for row in rows] if rows is not None else None
+
+
+class SQLiteSheetLedger(SheetLedger):
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sheet_rows (
+                sheet_name TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                item_key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                result TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (sheet_name, idx)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _succeeded(self, sheet_name: str) -> Dict[str, tuple]:
+        """Stored and parsed result of each successful row, by key; needs the lock."""
+        succeeded = {}
+        for key, result in self._conn.execute(
+            "SELECT item_key, result FROM sheet_rows "
+            "WHERE sheet_name = ? AND result IS NOT NULL",
+            (sheet_name,),
+        ):
+            response = GIFResponse(**json.loads(result))
+            if response.status == "success":
+                succeeded[key] = (result, response)
+        return succeeded
+
+    def completed(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        if not sheet_name:
+            return {}
+        with self._lock:
+            succeeded = self._succeeded(sheet_name)
+        return {
+            index: _reused(succeeded[key][1], video_url)
+            for index, (key, video_url) in enumerate(zip(keys, urls, strict=True))
+            if key in succeeded
+        }
+
+    def checkpoint(
+        self, sheet_name: str, keys: List[str], urls: List[VideoURL]
+    ) -> Dict[int, GIFResponse]:
+        if not sheet_name:
+            return {}
+        now = time.time()
+        completed = {}
+        with self._lock, self._conn:
+            succeeded = self._succeeded(sheet_name)
+            rows = []
+            for index, (key, video_url) in enumerate(zip(keys, urls, strict=True)):
+                stored, response = succeeded.get(key, (None, None))
+                if response is not None:
+                    completed[index] = _reused(response, video_url)
+                rows.append(
+                    (
+                        sheet_name,
+                        index,
+                        key,
+                        video_url.url,
+                        video_url.platform,
+                        stored,
+                        now,
+                    )
+                )
+            # The new layout replaces the old one; results travel with their keys
+            self._conn.execute(
+                "DELETE FROM sheet_rows WHERE sheet_name = ?", (sheet_name,)
+            )
+            self._conn.executemany(
+                "INSERT INTO sheet_rows VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return completed
+
+    def record(
+        self, sheet_name: str, index: int, key: str, result: GIFResponse
+    ) -> None:
+        if not sheet_name:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sheet_rows SET result = ?, updated_at = ? "
+                "WHERE sheet_name = ? AND idx = ? AND item_key = ?",
+                (result.model_dump_json(), time.time(), sheet_name, index, key),
+            )
+
+    def rows(self, sheet_name: str) -> Optional[List[dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_key, url, platform, result, updated_at FROM sheet_rows "
+                "WHERE sheet_name = ? ORDER BY idx",
+                (sheet_name,),
+            ).fetchall()
+        if not rows:
+            return None
+        return [
+            {
+                "key": key,
+                "url": url,
+                "platform": platform,
+                "result": GIFResponse(**json.loads(result)) if result else None,
+                "updated_at": updated_at,
+            }
+            for key, url, platform, result, updated_at in rows
+        ]
+
+
+EXPORT_COLUMNS = [
+    "row",
+    "url",
+    "platform",
+    "status",
+    "gif_url",
+    "gcs_url",
+    "renditions",
+    "error",
+    "updated_at",
+]
+
+
+def export_rows(rows: List[dict], fmt: str) -> bytes:
+    """Render ledger rows as CSV or Parquet bytes with pandas.
+
+    Parquet needs pyarrow or fastparquet; without either, ImportError is raised.
+    """
+    import io
+
+    import pandas as pd
+
+    records = []
+    for index, row in enumerate(rows):
+        result = row["result"]
+        records.append(
+            {
+                "row": index,
+                "url": row["url"],
+                "platform": row["platform"],
+                "status": result.status if result else "pending",
+                "gif_url": result.gif_url if result else None,
+                "gcs_url": result.gcs_url if result else None,
+                "renditions": json.dumps(result.renditions)
+                if result and result.renditions
+                else None,
+                "error": result.error if result else None,
+                "updated_at": pd.to_datetime(row["updated_at"], unit="s", utc=True),
+            }
+        )
+    frame = pd.DataFrame.from_records(records, columns=EXPORT_COLUMNS)
+    if fmt == "parquet":
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    return frame.to_csv(index=False).encode()
+
+
+def create_sheet_ledger() -> SheetLedger:
+    """Ledger for ``settings.JOB_STORE``; SQLite shares the job store's file."""
+    if settings.JOB_STORE == "memory":
+        return InMemorySheetLedger()
+    elif settings.JOB_STORE == "sqlite":
+        return SQLiteSheetLedger(settings.JOB_STORE_PATH)
+    raise ValueError(f"Unsupported job store: {settings.JOB_STORE}")
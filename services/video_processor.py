@@ -1,214 +1,540 @@
 import asyncio
-import httpx
-import os
-import tempfile
-import subprocess
-from typing import List
-from model.schemas import VideoURL, GIFResponse
+import inspect
+import json
+import uuid
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from model.schemas import EncodingProfile, VideoURL, GIFResponse
+from core import metrics
 from core.config import settings
+from services.apify_batcher import ApifyBatcher
+from services.encoder import EncoderBusyError, encoder_pool
+from services.resilience import SOURCE_UPSTREAMS, ItemError, upstreams
+from services.result_cache import ResultCache
 from utils.gcs_client import GCSClient
-from utils.video_utils import convert_to_gif, download_douyin_video
+from utils.download import stream_to_spool
+from utils.gif_engines import CONTENT_TYPES, get_engine
+from utils.resources import (
+    MiB,
+    ProbeError,
+    ResourceLimitError,
+    fit_to_memory,
+    probe_video,
+)
+from utils.video_utils import DOUYIN_HEADERS, render_clip, resolve_douyin_video
 from utils.apify_client import ApifyClient
 from utils.youtube_client import YouTubeClient
 
+# ffmpeg errors meaning a streamed source could not be fetched, not that it is bad
+FETCH_ERRORS = (
+    "Connection refused",
+    "Connection reset",
+    "Connection timed out",
+    "ffprobe timed out",
+    "Failed to resolve hostname",
+    "Network is unreachable",
+    "Server returned 5",
+    "Input/output error",
+)
+
+
+def _source_error(error: Exception, streamed: bool, what: str) -> Exception:
+    """A broken streamed fetch is the host's failure; anything else is the item's."""
+    if streamed and any(marker in str(error) for marker in FETCH_ERRORS):
+        return Exception(f"Fetching the video failed: {error}")
+    return ItemError(f"{what}: {error}")
+
+
 class VideoProcessor:
     def __init__(self):
         self.gcs_client = GCSClient()
         self.apify_client = ApifyClient()
         self.youtube_client = YouTubeClient()
-        self._tasks = {}
-        self._ensure_playwright_installed()
+        self.result_cache = ResultCache(
+            self.gcs_client,
+            max_entries=settings.RESULT_CACHE_SIZE,
+            ttl=settings.RESULT_CACHE_TTL,
+        )
+        # Per-stage limits shared by every batch running on this processor
+        self._apify_limit = asyncio.Semaphore(settings.APIFY_CONCURRENCY)
+        self._download_limit = asyncio.Semaphore(settings.DOWNLOAD_CONCURRENCY)
+        self._upload_limit = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+        # Encodes beyond what the pool can run or queue wait here, not refused
+        self._encode_limit = asyncio.Semaphore(
+            settings.ENCODER_WORKERS + settings.ENCODER_MAX_QUEUE
+        )
+        self.tiktok_batcher = ApifyBatcher(
+            self.apify_client, settings.APIFY_BATCH_SIZE, self._apify_limit, "tiktok"
+        )
+        self.youtube_batcher = ApifyBatcher(
+            self.youtube_client, settings.APIFY_BATCH_SIZE, self._apify_limit, "youtube"
+        )
 
-    def _ensure_playwright_installed(self):
-        """Ensure Playwright browsers are installed."""
-        try:
-            subprocess.run(["playwright", "install", "chromium"], check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing Playwright browsers: {e.stderr.decode()}")
-            raise Exception("Failed to install Playwright browsers. Please run 'playwright install chromium' manually.")
-
-    async def process_batch(self, urls: List[VideoURL], sheet_name: str) -> List[GIFResponse]:
-        results = []
-        
-        for video_url in urls:
-            try:
-                # Process based on platform
-                if video_url.platform == "tiktok":
-                    result = await self._process_tiktok(video_url.url)
-                elif video_url.platform == "youtube":
-                    result = await self._process_youtube(video_url.url)
-                elif video_url.platform == "douyin":
-                    result = await self._process_douyin(video_url.url)
-                elif video_url.platform == "gcs":
-                    result = await self._process_gcs(video_url.url)
-                else:
-                    result = GIFResponse(
-                        original_url=video_url.url,
-                        status="failed",
-                        error=f"Unsupported platform: {video_url.platform}"
-                    )
-                
-                results.append(result)
-                
-            except Exception as e:
-                results.append(GIFResponse(
-                    original_url=video_url.url,
-                    status="failed",
-                    error=str(e)
-                ))
-        
-        return results
+    def close(self):
+        self.gcs_client.close()
 
-    async def _process_tiktok(self, url: str) -> GIFResponse:
-        try:
-            # Run Apify actor task
-            run_id = await self.apify_client.run_actor_task(url)
-            
-            # Wait for completion and get results
-            dataset_id = await self.apify_client.wait_for_completion(run_id)
-            items = await self.apify_client.get_items(dataset_id)
-            
-            if not items:
-                return GIFResponse(
-                    original_url=url,
-                    status="failed",
-                    error="No items returned from Apify"
+    async def process_batch(
+        self,
+        urls: List[VideoURL],
+        sheet_name: str,
+        on_result: Optional[
+            Callable[[int, GIFResponse], Optional[Awaitable[None]]]
+        ] = None,
+    ) -> List[GIFResponse]:
+        """Process all items concurrently and return results in input order.
+
+        Items with the same normalised URL are processed once; the copies
+        are reported with ``cache="duplicate"``. TikTok and YouTube items
+        that miss the cache are resolved together in chunked Apify runs
+        before conversion starts. ``on_result`` is called with
+        the item index and its result as soon as each item finishes, in
+        completion order, and awaited if it returns an awaitable. With
+        ``settings.debug_timing`` each result carries its per-stage timings
+        and the peak RSS of its encode.
+        """
+        batch_limit = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+        results: List[Optional[GIFResponse]] = [None] * len(urls)
+
+        groups: Dict[str, List[int]] = {}
+        for index, video_url in enumerate(urls):
+            groups.setdefault(self.cache_key(video_url), []).append(index)
+
+        keys = list(groups)
+        trackers = {k: metrics.ItemTimings(urls[groups[k][0]].platform) for k in keys}
+
+        async def lookup_cached(cache_key: str) -> Optional[dict]:
+            metrics.bind_item(trackers[cache_key])
+            with metrics.stage("cache_lookup"):
+                return await self.result_cache.get(cache_key)
+
+        cached = dict(
+            zip(
+                keys,
+                await asyncio.gather(*(lookup_cached(k) for k in keys)),
+                strict=True,
+            )
+        )
+        lookups = self._start_lookups(
+            [urls[groups[k][0]] for k in keys if cached[k] is None]
+        )
+
+        async def run(cache_key: str, indexes: List[int]):
+            video_url = urls[indexes[0]]
+            tracker = trackers[cache_key]
+            metrics.bind_item(tracker)
+            async with batch_limit:
+                result = await self._process_item(
+                    video_url, cache_key, cached[cache_key], lookups.get(video_url.url)
                 )
-            
-            # Process the first item
-            item = items[0]
-            gcs_url = item.get("gcsMediaUrls", [None])[0]
-            
-            if not gcs_url:
-                return GIFResponse(
-                    original_url=url,
-                    status="failed",
-                    error="No GCS URL returned from Apify"
+            if settings.debug_timing:
+                result.timings = dict(tracker.timings)
+                if tracker.peak_rss:
+                    result.peak_rss_mb = round(tracker.peak_rss / MiB, 1)
+            for position, index in enumerate(indexes):
+                if position > 0:
+                    result = result.model_copy(
+                        update={"original_url": urls[index].url, "cache": "duplicate"}
+                    )
+                results[index] = result
+                metrics.ITEMS.inc(
+                    platform=video_url.platform,
+                    status=result.status,
+                    cache=result.cache,
                 )
-            
-            # Convert to GIF
-            gif_url = await self._convert_and_upload_gif(gcs_url)
-            
+                if on_result is not None:
+                    outcome = on_result(index, result)
+                    if inspect.isawaitable(outcome):
+                        await outcome
+
+        await asyncio.gather(*(run(key, indexes) for key, indexes in groups.items()))
+        return results
+
+    def _encoding_params(self, profile: Optional[EncodingProfile] = None) -> dict:
+        """``render_clip`` arguments for a profile, with settings filling unset fields.
+
+        They change the output GIF and so form part of the cache key.
+        """
+        profile = profile or EncodingProfile()
+
+        def pick(value, default):
+            return default if value is None else value
+
+        return {
+            "engine": settings.GIF_ENGINE,
+            "max_duration": pick(profile.duration, settings.MAX_VIDEO_DURATION),
+            "fps": pick(profile.fps, settings.GIF_FPS),
+            "start": pick(profile.start, settings.GIF_START),
+            "max_width": pick(profile.max_width, settings.GIF_MAX_WIDTH),
+            "max_colors": pick(profile.max_colors, settings.GIF_MAX_COLORS),
+            "dither": pick(profile.dither, settings.GIF_DITHER),
+            "dedupe": pick(profile.dedupe, settings.GIF_DEDUPE),
+            "max_bytes": pick(profile.max_bytes, settings.GIF_MAX_BYTES),
+            "select_clip": pick(profile.select_clip, settings.GIF_SELECT_CLIP),
+            "renditions": [
+                {
+                    "key": r.key,
+                    "format": r.format,
+                    "max_width": pick(
+                        r.max_width, pick(profile.max_width, settings.GIF_MAX_WIDTH)
+                    ),
+                    "fps": pick(r.fps, pick(profile.fps, settings.GIF_FPS)),
+                }
+                for r in profile.renditions or []
+            ],
+        }
+
+    def cache_key(self, video_url: VideoURL) -> str:
+        """Identity of an item's output: platform, normalised URL and encoding."""
+        return self.result_cache.key(
+            video_url.platform, video_url.url, self._encoding_params(video_url.profile)
+        )
+
+    def _start_lookups(self, video_urls: List[VideoURL]) -> Dict[str, asyncio.Future]:
+        """Start batched Apify runs for TikTok and YouTube items, keyed by URL.
+
+        Nothing is started while the Apify circuit is open; those items fail fast.
+        """
+        lookups = {}
+        if upstreams.is_open("apify"):
+            return lookups
+        tiktok = [v.url for v in video_urls if v.platform == "tiktok"]
+        youtube = [v.url for v in video_urls if v.platform == "youtube"]
+        if tiktok:
+            lookups.update(self.tiktok_batcher.submit(tiktok))
+        if youtube:
+            lookups.update(self.youtube_batcher.submit(youtube))
+        return lookups
+
+    async def _process_item(
+        self,
+        video_url: VideoURL,
+        cache_key: str,
+        cached: Optional[dict] = None,
+        lookup: Optional[asyncio.Future] = None,
+    ) -> GIFResponse:
+        if cached is not None:
             return GIFResponse(
-                original_url=url,
-                gcs_url=gcs_url,
-                gif_url=gif_url,
-                status="success"
+                original_url=video_url.url,
+                gcs_url=cached["gcs_url"],
+                gif_url=cached["gif_url"],
+                renditions=cached.get("renditions"),
+                status="success",
+                cache="hit",
             )
-        except Exception as e:
+
+        result = await self._dispatch(video_url, cache_key, lookup)
+        result.cache = "miss"
+        if result.status == "success":
+            self.result_cache.put(
+                cache_key,
+                {
+                    "gif_url": result.gif_url,
+                    "gcs_url": result.gcs_url,
+                    "renditions": result.renditions,
+                },
+            )
+        return result
+
+    async def _dispatch(
+        self,
+        video_url: VideoURL,
+        cache_key: str,
+        lookup: Optional[asyncio.Future] = None,
+    ) -> GIFResponse:
+        params = self._encoding_params(video_url.profile)
+        url = video_url.url
+        # Process based on platform
+        if video_url.platform == "tiktok":
+            handler = partial(self._process_tiktok, url, cache_key, lookup, params)
+        elif video_url.platform == "youtube":
+            handler = partial(self._process_youtube, url, cache_key, lookup, params)
+        elif video_url.platform == "douyin":
+            handler = partial(self._process_douyin, url, cache_key, params)
+        elif video_url.platform == "gcs":
+            handler = partial(self._process_gcs, url, cache_key, params)
+        else:
             return GIFResponse(
                 original_url=url,
                 status="failed",
-                error=str(e)
+                error=f"Unsupported platform: {video_url.platform}",
             )
-
-    async def _process_youtube(self, url: str) -> GIFResponse:
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            video_path = temp_file.name
-        
         try:
-            # Download video using YouTube client
-            video_path = await self.youtube_client.download_video(url, video_path)
-            
-            # Upload to GCS
-            gcs_url = await self.gcs_client.upload_video(video_path)
-            
-            # Convert to GIF
-            gif_url = await self._convert_and_upload_gif(gcs_url)
-            
+            # Upstream calls inside are rate limited and fail fast while a host is down
+            return await handler()
+        except Exception as e:
             return GIFResponse(
-                original_url=url,
-                gcs_url=gcs_url,
-                gif_url=gif_url,
-                status="success"
+                original_url=video_url.url, status="failed", error=str(e)
             )
-        except Exception as e:
+
+    async def _process_tiktok(
+        self,
+        url: str,
+        cache_key: Optional[str] = None,
+        lookup: Optional[asyncio.Future] = None,
+        params: Optional[dict] = None,
+    ) -> GIFResponse:
+        # Dataset item from a batched Apify run
+        with metrics.stage("resolve"):
+            item = await (
+                lookup if lookup is not None else self.tiktok_batcher.resolve(url)
+            )
+        gcs_url = item.get("gcsMediaUrls", [None])[0]
+
+        if not gcs_url:
             return GIFResponse(
                 original_url=url,
                 status="failed",
-                error=str(e)
+                error="No GCS URL returned from Apify",
             )
-        finally:
-            if os.path.exists(video_path):
-                os.unlink(video_path)
 
-    async def _process_douyin(self, url: str) -> GIFResponse:
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            video_path = temp_file.name
-        
+        # Convert to GIF and any extra renditions
+        gif_url, renditions = await self._render_and_upload(
+            gcs_url, cache_key, params=params, upstream=SOURCE_UPSTREAMS["tiktok"]
+        )
+
+        return GIFResponse(
+            original_url=url,
+            gcs_url=gcs_url,
+            gif_url=gif_url,
+            renditions=renditions,
+            status="success",
+        )
+
+    async def _process_youtube(
+        self,
+        url: str,
+        cache_key: Optional[str] = None,
+        lookup: Optional[asyncio.Future] = None,
+        params: Optional[dict] = None,
+    ) -> GIFResponse:
+        spool = None
         try:
-            # Download video
-            video_path = await download_douyin_video(url, video_path)
-            
+            # Dataset item from a batched Apify run
+            with metrics.stage("resolve"):
+                item = await (
+                    lookup if lookup is not None else self.youtube_batcher.resolve(url)
+                )
+            download_url = item.get("downloadUrl")
+            if not download_url:
+                raise ItemError("No download URL returned from Apify")
+
+            # Download video into memory (or disk above SPOOL_MAX_MEMORY)
+            async with self._download_limit:
+                with metrics.stage("download"):
+                    spool = await upstreams.call(
+                        SOURCE_UPSTREAMS["youtube"],
+                        lambda: stream_to_spool(download_url),
+                    )
+
             # Upload to GCS
-            gcs_url = await self.gcs_client.upload_video(video_path)
-            
-            # Convert to GIF
-            gif_url = await self._convert_and_upload_gif(gcs_url)
-            
+            gcs_url = await self._upload_video(spool)
+
+            # Convert from the local copy rather than re-reading GCS
+            gif_url, renditions = await self._render_and_upload(
+                gcs_url, cache_key, source=spool.path, params=params
+            )
+
             return GIFResponse(
                 original_url=url,
                 gcs_url=gcs_url,
                 gif_url=gif_url,
-                status="success"
-            )
-        except Exception as e:
-            return GIFResponse(
-                original_url=url,
-                status="failed",
-                error=str(e)
+                renditions=renditions,
+                status="success",
             )
         finally:
-            if os.path.exists(video_path):
-                os.unlink(video_path)
+            if spool is not None:
+                spool.close()
 
-    async def _process_gcs(self, url: str) -> GIFResponse:
+    async def _process_douyin(
+        self, url: str, cache_key: Optional[str] = None, params: Optional[dict] = None
+    ) -> GIFResponse:
+        spool = None
         try:
-            # Convert to GIF
-            gif_url = await self._convert_and_upload_gif(url)
-            
-            return GIFResponse(
-                original_url=url,
-                gcs_url=url,
-                gif_url=gif_url,
-                status="success"
+            # Resolve outside the download limit; it can take DOUYIN_EXTRACT_TIMEOUT
+            video_url = await upstreams.call(
+                "douyin", lambda: resolve_douyin_video(url)
             )
-        except Exception as e:
+            async with self._download_limit:
+                with metrics.stage("download"):
+                    spool = await upstreams.call(
+                        "douyin",
+                        lambda: stream_to_spool(video_url, headers=DOUYIN_HEADERS),
+                        count=0,
+                    )
+
+            # Upload to GCS
+            gcs_url = await self._upload_video(spool)
+
+            # Convert from the local copy rather than re-reading GCS
+            gif_url, renditions = await self._render_and_upload(
+                gcs_url, cache_key, source=spool.path, params=params
+            )
+
             return GIFResponse(
                 original_url=url,
-                status="failed",
-                error=str(e)
+                gcs_url=gcs_url,
+                gif_url=gif_url,
+                renditions=renditions,
+                status="success",
             )
+        finally:
+            if spool is not None:
+                spool.close()
+
+    async def _process_gcs(
+        self, url: str, cache_key: Optional[str] = None, params: Optional[dict] = None
+    ) -> GIFResponse:
+        # Convert to GIF and any extra renditions
+        gif_url, renditions = await self._render_and_upload(
+            url, cache_key, params=params, upstream=SOURCE_UPSTREAMS["gcs"]
+        )
 
-    async def _convert_and_upload_gif(self, video_url: str) -> str:
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
-            video_path = temp_video.name
-        
-        with tempfile.NamedTemporaryFile(suffix=".gif", delete=False) as temp_gif:
-            gif_path = temp_gif.name
-        
+        return GIFResponse(
+            original_url=url,
+            gcs_url=url,
+            gif_url=gif_url,
+            renditions=renditions,
+            status="success",
+        )
+
+    async def _upload_video(self, spool) -> str:
+        """Upload a spooled source video to GCS and return its URL."""
+        async with self._upload_limit:
+            with metrics.stage("upload"):
+                return await upstreams.call(
+                    "gcs",
+                    lambda: self.gcs_client.upload_video(
+                        spool.path, blob_name=spool.name
+                    ),
+                    count=0,
+                )
+
+    async def _render_and_upload(
+        self,
+        video_url: str,
+        cache_key: Optional[str] = None,
+        source: Optional[str] = None,
+        params: Optional[dict] = None,
+        upstream: str = "gcs",
+    ) -> Tuple[str, Optional[Dict[str, str]]]:
+        """Encode ``video_url`` (or a local ``source`` copy) and upload the results.
+
+        The GIF and every rendition in ``params`` come from one decode of the
+        clip. Video bytes are spooled in memory and outputs come back from the
+        encoder as bytes, so small clips never touch the filesystem.
+        ``params`` are ``render_clip`` arguments from ``_encoding_params``;
+        they are downscaled when the probed video would need more than
+        ``ENCODER_JOB_MAX_MEMORY`` to encode, and the item fails if even
+        that is not enough.
+        Without a ``source``, the video is fetched from ``upstream``, under
+        its rate limit and circuit breaker.
+        Returns the GIF URL and the rendition URLs by key.
+        """
+        params = params or self._encoding_params()
+        spool = None
+        streamed = False
         try:
-            # Download video
-            async with httpx.AsyncClient() as client:
-                response = await client.get(video_url)
-                with open(video_path, "wb") as f:
-                    f.write(response.content)
-            
-            # Convert to GIF
-            convert_to_gif(
-                video_path,
-                gif_path,
-                max_duration=settings.MAX_VIDEO_DURATION,
-                fps=settings.GIF_FPS
-            )
-            
-            # Upload GIF to GCS
-            gif_url = await self.gcs_client.upload_gif(gif_path)
-            
-            return gif_url
+            if source is None:
+                if (
+                    settings.STREAM_FROM_URL
+                    and get_engine(params["engine"]).accepts_urls
+                ):
+                    # The engine reads only the head of the video straight from the URL
+                    source = video_url
+                    streamed = True
+                else:
+                    async with self._download_limit:
+                        with metrics.stage("download"):
+                            spool = await upstreams.call(
+                                upstream, lambda: stream_to_spool(video_url)
+                            )
+                    source = spool.path
+
+            # Size the job before it is admitted, so it cannot take down a worker.
+            # A streamed source is first read here, so this is its fetch.
+            async def probe():
+                try:
+                    return await asyncio.to_thread(probe_video, source)
+                except ProbeError as e:
+                    raise _source_error(e, streamed, "Could not read the video") from e
+
+            with metrics.stage("probe"):
+                info = await (upstreams.call(upstream, probe) if streamed else probe())
+            try:
+                params, memory = fit_to_memory(
+                    info, params, settings.ENCODER_JOB_MAX_MEMORY
+                )
+            except ResourceLimitError as e:
+                raise ItemError(str(e)) from e
+
+            # Encode in the encoder pool so the event loop stays free
+            with metrics.stage("encode"):
+                encode = partial(self._encode, source, params, memory, streamed)
+                if streamed:
+                    # ffmpeg fetches the rest of the video while encoding
+                    gif_data, outputs = await upstreams.call(upstream, encode, count=0)
+                else:
+                    gif_data, outputs = await encode()
         finally:
-            if os.path.exists(video_path):
-                os.unlink(video_path)
-            if os.path.exists(gif_path):
-                os.unlink(gif_path)
+            if spool is not None:
+                spool.close()
 
+        # Content-addressed names when cached, so the bucket is the cache's durable tier
+        base = cache_key or uuid.uuid4().hex
+        renditions = params["renditions"]
+
+        async def upload(
+            data: bytes,
+            blob_name: str,
+            content_type: str,
+            metadata: Optional[Dict[str, str]] = None,
+        ) -> str:
+            async with self._upload_limit:
+                return await upstreams.call(
+                    "gcs",
+                    lambda: self.gcs_client.upload_data(
+                        data, blob_name, content_type, metadata
+                    ),
+                    count=0,
+                )
+
+        with metrics.stage("upload"):
+            urls = await asyncio.gather(
+                *(
+                    upload(
+                        data,
+                        self.result_cache.rendition_blob_name(
+                            base, r["key"], r["format"]
+                        ),
+                        CONTENT_TYPES[r["format"]],
+                    )
+                    for r, data in zip(renditions, outputs, strict=True)
+                )
+            )
+            rendition_urls = {
+                r["key"]: url for r, url in zip(renditions, urls, strict=True)
+            } or None
+            # The GIF goes last: once it exists, a cache hit may return every rendition
+            metadata = {"gcs_url": video_url}
+            if rendition_urls:
+                metadata["renditions"] = json.dumps(rendition_urls)
+            gif_url = await upload(
+                gif_data, self.result_cache.blob_name(base), "image/gif", metadata
+            )
+
+        return gif_url, rendition_urls
+
+    async def _encode(
+        self, source: str, params: dict, memory: int, streamed: bool
+    ) -> Tuple[bytes, List[bytes]]:
+        """Run ``render_clip`` in the encoder pool; bad clips raise ItemError."""
+        try:
+            async with self._encode_limit:
+                return await encoder_pool.submit_job(
+                    render_clip, (source,), params, memory=memory
+                )
+        except EncoderBusyError:
+            # A full pool, shared with other processors, is no fault of the clip
+            raise
+        except Exception as e:
+            raise _source_error(e, streamed, "Encoding failed") from e
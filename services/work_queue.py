@@ -0,0 +1,311 @@
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from model.schemas import VideoURL
+
+
+class WorkQueue(ABC):
+    """Durable queue of batch items shared by the API and worker processes.
+
+    Leased items stay invisible to other workers for a visibility timeout; an
+    item that is not acked in time becomes visible again and is retried.
+    Items that fail ``max_attempts`` times are dead-lettered.
+    """
+
+    @abstractmethod
+    def enqueue(
+        self, task_id: str, sheet_name: str, items: List[Tuple[int, VideoURL]]
+    ) -> None:
+        """Add items; re-enqueueing an existing ``(task_id, index)`` is a no-op."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def lease(
+        self, worker_id: str, limit: int, visibility_timeout: float
+    ) -> List[dict]:
+        """Claim up to ``limit`` visible items, each with a lease ``token``."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def expire(self) -> List[dict]:
+        """Dead-letter items whose lease expired on their last attempt and return them.
+
+        Nobody nacks such an item (its worker is gone), so the caller records
+        its final failure from the returned ``error``.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def extend(self, item_id: int, token: str, visibility_timeout: float) -> bool:
+        """Push back the lease deadline; False if the lease was lost."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, item_id: int, token: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def nack(self, item_id: int, token: str, error: str) -> bool:
+        """Release a failed item for retry; return True if it was dead-lettered."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, item_id: int, token: str) -> None:
+        """Give a leased item back untried, e.g. on shutdown, keeping its attempt."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue(self, item_id: int) -> Optional[str]:
+        """Requeue a dead item with attempts reset; return its task ID or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of items in each state."""
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue in a SQLite database; several processes may share the file.
+
+    The database runs in WAL mode, so those processes must be on one host and
+    the file on a local filesystem, not NFS or another network filesystem.
+    """
+
+    def __init__(self, path: str, max_attempts: int, retry_delay: float):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS queue_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                sheet_name TEXT,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL,
+                token TEXT,
+                worker_id TEXT,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (task_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS queue_items_visible
+                ON queue_items (state, visible_at);
+            """
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes
+        # never both see a row as visible and claim it
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(
+        self, task_id: str, sheet_name: str, items: List[Tuple[int, VideoURL]]
+    ) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO queue_items "
+                "(task_id, idx, sheet_name, payload, state, visible_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'ready', ?, ?)",
+                [
+                    (task_id, i, sheet_name, v.model_dump_json(), now, now)
+                    for i, v in items
+                ],
+            )
+
+    def lease(
+        self, worker_id: str, limit: int, visibility_timeout: float
+    ) -> List[dict]:
+        now = time.time()
+        items = []
+        with self._transaction() as conn:
+            # Leases that expired on their last attempt are left for ``expire``
+            rows = conn.execute(
+                "SELECT id, task_id, idx, sheet_name, payload, attempts "
+                "FROM queue_items "
+                "WHERE (state = 'ready' OR (state = 'leased' AND attempts < ?)) "
+                "AND visible_at <= ? "
+                "ORDER BY visible_at, id LIMIT ?",
+                (self.max_attempts, now, limit),
+            ).fetchall()
+            for item_id, task_id, idx, sheet_name, payload, attempts in rows:
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE queue_items SET state = 'leased', attempts = attempts + 1, "
+                    "visible_at = ?, token = ?, worker_id = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (now + visibility_timeout, token, worker_id, now, item_id),
+                )
+                items.append(
+                    {
+                        "id": item_id,
+                        "task_id": task_id,
+                        "index": idx,
+                        "sheet_name": sheet_name,
+                        "video_url": VideoURL.model_validate_json(payload),
+                        "attempt": attempts + 1,
+                        "token": token,
+                    }
+                )
+        return items
+
+    def expire(self) -> List[dict]:
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, task_id, idx, sheet_name, payload, last_error "
+                "FROM queue_items "
+                "WHERE state = 'leased' AND visible_at <= ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE queue_items SET state = 'dead', token = NULL, updated_at = ?, "
+                "last_error = COALESCE(last_error, 'visibility timeout expired') "
+                "WHERE id = ?",
+                [(now, row[0]) for row in rows],
+            )
+        return [
+            {
+                "id": item_id,
+                "task_id": task_id,
+                "index": idx,
+                "sheet_name": sheet_name,
+                "video_url": VideoURL.model_validate_json(payload),
+                "error": last_error or "visibility timeout expired",
+            }
+            for item_id, task_id, idx, sheet_name, payload, last_error in rows
+        ]
+
+    def extend(self, item_id: int, token: str, visibility_timeout: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE queue_items SET visible_at = ?, updated_at = ? "
+                "WHERE id = ? AND token = ? AND state = 'leased'",
+                (now + visibility_timeout, now, item_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def ack(self, item_id: int, token: str) -> None:
+        with self._lock:
+            # A stale token means another worker re-leased the item; its ack wins
+            self._conn.execute(
+                "UPDATE queue_items SET state = 'done', token = NULL, updated_at = ? "
+                "WHERE id = ? AND token = ?",
+                (time.time(), item_id, token),
+            )
+
+    def nack(self, item_id: int, token: str, error: str) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM queue_items WHERE id = ? AND token = ?",
+                (item_id, token),
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE queue_items SET state = 'dead', token = NULL, "
+                    "last_error = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (error, now, item_id),
+                )
+                return True
+            # Exponential backoff before the item becomes visible again
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            conn.execute(
+                "UPDATE queue_items SET state = 'ready', token = NULL, last_error = ?, "
+                "visible_at = ?, updated_at = ? WHERE id = ?",
+                (error, now + delay, now, item_id),
+            )
+        return False
+
+    def release(self, item_id: int, token: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queue_items SET state = 'ready', token = NULL, "
+                "attempts = attempts - 1, "
+                "visible_at = ?, updated_at = ? WHERE id = ? AND token = ?",
+                (now, now, item_id, token),
+            )
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, task_id, idx, payload, attempts, last_error, updated_at "
+                "FROM queue_items WHERE state = 'dead' "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "id": item_id,
+                "task_id": task_id,
+                "index": idx,
+                "video_url": VideoURL.model_validate_json(payload),
+                "attempts": attempts,
+                "error": last_error,
+                "failed_at": updated_at,
+            }
+            for item_id, task_id, idx, payload, attempts, last_error, updated_at in rows
+        ]
+
+    def requeue(self, item_id: int) -> Optional[str]:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT task_id FROM queue_items WHERE id = ? AND state = 'dead'",
+                (item_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE queue_items SET state = 'ready', attempts = 0, visible_at = ?, "
+                "last_error = NULL, updated_at = ? WHERE id = ?",
+                (now, now, item_id),
+            )
+        return row[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM queue_items GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+
+def create_work_queue() -> WorkQueue:
+    """Build the durable queue used in ``EXECUTION_MODE=queue``."""
+    return SQLiteWorkQueue(
+        settings.QUEUE_PATH, settings.QUEUE_MAX_ATTEMPTS, settings.QUEUE_RETRY_DELAY
+    )
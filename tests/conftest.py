@@ -0,0 +1,26 @@
+"""Point settings at the fakes from benchmarks.fakes before any application import."""
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.fakes import FakeServices, configure_env
+
+_clip = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+_clip.write(b"not really a video")
+_clip.close()
+_services = FakeServices(_clip.name)
+# Small resumable threshold and chunks, so tests exercise chunked uploads cheaply
+configure_env(
+    _services.base_url,
+    GCS_RESUMABLE_THRESHOLD=str(512 * 1024),
+    GCS_CHUNK_SIZE=str(256 * 1024),
+)
+
+
+@pytest.fixture(scope="session")
+def fake_services():
+    _services.start()
+    yield _services
+    _services.stop()
+    os.unlink(_clip.name)
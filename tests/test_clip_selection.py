@@ -0,0 +1,59 @@
+import pytest
+
+from utils.clip_selection import CUT_LEVEL, best_offset, motion_scores
+
+np = pytest.importorskip("numpy")
+
+
+def textured(count: int, shift: int = 0):
+    """``count`` frames of a checkerboard moved ``shift`` pixels per frame."""
+    y, x = np.mgrid[:16, :16]
+    return np.stack(
+        [((x + i * shift) // 2 + y // 2) % 2 * 200 for i in range(count)]
+    ).astype(np.uint8)
+
+
+def test_single_frame_has_no_scores_and_starts_at_zero():
+    scores = motion_scores(textured(1))
+
+    assert scores.shape == (0,)
+    assert best_offset(scores, fps=2, duration=2) == 0.0
+
+
+def test_all_black_frames_score_zero_and_keep_the_start():
+    scores = motion_scores(np.zeros((6, 16, 16), dtype=np.uint8))
+
+    assert scores.tolist() == [0.0] * 5
+    assert best_offset(scores, fps=1, duration=2) == 0.0
+
+
+def test_motion_into_a_blank_frame_does_not_count():
+    frames = np.concatenate([textured(1), np.zeros((1, 16, 16), dtype=np.uint8)])
+
+    assert motion_scores(frames).tolist() == [0.0]
+
+
+def test_hard_cuts_are_capped():
+    frames = np.stack([np.zeros((16, 16)), textured(1)[0]]).astype(np.uint8)
+
+    assert motion_scores(frames).tolist() == [CUT_LEVEL]
+
+
+def test_window_no_longer_than_the_clip_starts_at_zero():
+    scores = np.array([0.0, 0.0, 30.0])
+
+    assert best_offset(scores, fps=1, duration=4) == 0.0
+    assert best_offset(scores, fps=1, duration=5) == 0.0
+
+
+def test_most_active_segment_wins():
+    frames = np.concatenate([textured(5), textured(3, shift=1)])
+    scores = motion_scores(frames)
+
+    # Six identical frames score nothing; the last two moved
+    assert best_offset(scores, fps=2, duration=1) == 3.0
+
+
+def test_later_segment_must_clearly_beat_the_opening():
+    assert best_offset(np.array([10.0, 10.0, 10.5, 10.5]), fps=1, duration=2) == 0.0
+    assert best_offset(np.array([10.0, 10.0, 20.0, 20.0]), fps=1, duration=2) == 3.0
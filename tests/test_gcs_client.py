@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from benchmarks.fakes import BUCKET
+from utils.gcs_client import GCSClient
+
+
+@pytest.fixture
+def gcs(fake_services):
+    client = GCSClient()
+    yield client
+    client.close()
+
+
+async def test_upload_data_with_metadata(gcs, fake_services):
+    url = await gcs.upload_data(
+        b"GIF89a", "gifs/small.gif", "image/gif", {"gcs_url": "gs://source"}
+    )
+
+    assert url == f"{fake_services.base_url}/{BUCKET}/gifs/small.gif"
+    data, content_type, metadata = fake_services.objects["gifs/small.gif"]
+    assert data == b"GIF89a"
+    assert content_type == "image/gif"
+    assert metadata == {"gcs_url": "gs://source"}
+
+
+async def test_small_file_uses_a_single_request(gcs, fake_services, tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(os.urandom(64 * 1024))
+    before = fake_services.stats["resumable_uploads"]
+
+    url = await gcs.upload_video(str(path), blob_name="videos/clip.mp4")
+
+    assert url.endswith("/videos/clip.mp4")
+    assert fake_services.objects["videos/clip.mp4"][:2] == (
+        path.read_bytes(),
+        "video/mp4",
+    )
+    assert fake_services.stats["resumable_uploads"] == before
+
+
+async def test_large_file_uses_a_resumable_upload(gcs, fake_services, tmp_path):
+    path = tmp_path / "large.mp4"
+    path.write_bytes(os.urandom(1024 * 1024 + 123))
+    before = fake_services.stats["resumable_uploads"]
+
+    await gcs.upload_file(str(path), "videos/large.mp4", metadata={"source": "test"})
+
+    data, content_type, metadata = fake_services.objects["videos/large.mp4"]
+    assert data == path.read_bytes()
+    assert content_type == "video/mp4"
+    assert metadata == {"source": "test"}
+    assert fake_services.stats["resumable_uploads"] == before + 1
+
+
+async def test_get_gif_returns_url_and_metadata(gcs, fake_services):
+    await gcs.upload_data(
+        b"GIF89a", "gifs/cached.gif", "image/gif", {"renditions": "{}"}
+    )
+
+    found = await gcs.get_gif("gifs/cached.gif")
+
+    assert found == {
+        "gif_url": f"{fake_services.base_url}/{BUCKET}/gifs/cached.gif",
+        "metadata": {"renditions": "{}"},
+    }
+    assert await gcs.get_gif("gifs/missing.gif") is None
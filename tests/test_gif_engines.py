@@ -0,0 +1,67 @@
+import shutil
+import subprocess
+
+import pytest
+
+from utils.gif_engines import FFmpegEngine, gif_dimensions
+from utils.resources import estimate_memory, fit_to_memory
+
+INFO = {"width": 1280, "height": 720, "duration": 10.0, "fps": 30.0}
+
+
+def test_mp4_renditions_scale_to_an_even_width():
+    outputs = [
+        ({"format": "gif", "max_width": 321, "fps": 5}, "out.gif"),
+        ({"format": "mp4", "max_width": 321, "fps": 5}, "out.mp4"),
+    ]
+    command = FFmpegEngine().build_render_command("in.mp4", outputs, 2)
+    graph = command[command.index("-filter_complex") + 1]
+
+    # The GIF keeps the requested width; the MP4 rounds it down
+    assert "[s0]fps=5,scale=w=min(iw\\,321):h=-1:" in graph
+    assert "[s1]fps=5,scale=w=trunc(min(iw\\,321)/2)*2:h=-2:" in graph
+
+
+def test_fit_to_memory_keeps_widths_even():
+    params = {
+        "max_duration": 4,
+        "fps": 10,
+        "max_width": 641,
+        "renditions": [{"format": "mp4", "max_width": 321, "fps": 10}],
+    }
+    limit = estimate_memory(INFO, params) * 3 // 4
+
+    fitted, estimate = fit_to_memory(INFO, params, limit)
+
+    assert estimate <= limit
+    assert fitted["max_width"] < 641 and fitted["max_width"] % 2 == 0
+    assert fitted["renditions"][0]["max_width"] % 2 == 0
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_odd_max_width_renders_gif_and_mp4(tmp_path):
+    clip = str(tmp_path / "clip.mp4")
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc=size=640x360:rate=10:duration=1",
+            "-pix_fmt",
+            "yuv420p",
+            clip,
+        ],
+        check=True,
+    )
+    renditions = [
+        {"format": "gif", "max_width": 321, "fps": 5},
+        {"format": "mp4", "max_width": 321, "fps": 5},
+    ]
+
+    gif, mp4 = FFmpegEngine().render(clip, 1, renditions)
+
+    assert gif_dimensions(gif)[0] == 321
+    assert mp4[4:8] == b"ftyp"
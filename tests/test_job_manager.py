@@ -0,0 +1,114 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from model.schemas import BatchProcessRequest, GIFResponse, VideoURL
+from services.job_manager import JobManager
+from services.job_store import InMemoryJobStore
+from services.resilience import BatchTooLargeError, OverloadedError, admission
+from services.sheet_ledger import SQLiteSheetLedger, export_rows
+
+
+class StubProcessor:
+    """Succeeds at every item without touching the network."""
+
+    def cache_key(self, video_url: VideoURL) -> str:
+        return video_url.url
+
+    async def process_batch(self, urls, sheet_name, on_result=None):
+        results = []
+        for position, video_url in enumerate(urls):
+            result = GIFResponse(
+                original_url=video_url.url,
+                status="success",
+                gif_url=f"{video_url.url}.gif",
+            )
+            if on_result:
+                await on_result(position, result)
+            results.append(result)
+        return results
+
+
+class FailingProcessor(StubProcessor):
+    """Finishes the first item, then fails the way a locked database would."""
+
+    async def process_batch(self, urls, sheet_name, on_result=None):
+        await super().process_batch(urls[:1], sheet_name, on_result)
+        raise sqlite3.OperationalError("database is locked")
+
+
+def batch(*names: str) -> BatchProcessRequest:
+    return BatchProcessRequest(
+        urls=[
+            VideoURL(url=f"https://youtube.com/shorts/{name}", platform="youtube")
+            for name in names
+        ],
+        sheet_name="sheet",
+    )
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return JobManager(
+        StubProcessor(),
+        InMemoryJobStore(),
+        ledger=SQLiteSheetLedger(str(tmp_path / "ledger.db")),
+    )
+
+
+async def test_rejected_resubmission_leaves_the_export_unchanged(manager, monkeypatch):
+    await manager.process_now(batch("a", "b"))
+    export = export_rows(manager.ledger.rows("sheet"), "csv")
+
+    monkeypatch.setattr(admission, "in_flight", admission.max_items)
+    with pytest.raises(OverloadedError):
+        await manager.submit(batch("c", "a"))
+    with pytest.raises(OverloadedError):
+        await manager.process_now(batch("c", "a"))
+    monkeypatch.setattr(admission, "in_flight", 0)
+    monkeypatch.setattr(admission, "max_items", 1)
+    with pytest.raises(BatchTooLargeError):
+        await manager.submit(batch("c", "d", "a"))
+
+    assert export_rows(manager.ledger.rows("sheet"), "csv") == export
+
+
+async def test_resubmission_reprocesses_only_new_rows(manager):
+    await manager.process_now(batch("a", "b"))
+
+    results = await manager.process_now(batch("c", "a"))
+
+    assert [result.cache for result in results] == [None, "ledger"]
+    assert [row["url"][-1] for row in manager.ledger.rows("sheet")] == ["c", "a"]
+    assert admission.in_flight == 0
+
+
+async def test_failed_job_reports_unfinished_items():
+    manager = JobManager(FailingProcessor(), InMemoryJobStore())
+
+    task_id = await manager.submit(batch("a", "b", "c"))
+    results = await manager.wait(task_id, timeout=5)
+
+    assert manager.status(task_id).status == "completed"
+    assert [result.status for result in results] == ["success", "failed", "failed"]
+    assert "database is locked" in results[1].error
+    assert admission.in_flight == 0
+
+
+async def test_export_as_parquet(manager):
+    pytest.importorskip("pyarrow")
+    await manager.process_now(batch("a", "b"))
+
+    frame = pd.read_parquet(
+        io.BytesIO(export_rows(manager.ledger.rows("sheet"), "parquet"))
+    )
+
+    assert frame["row"].tolist() == [0, 1]
+    assert frame["url"].str[-1].tolist() == ["a", "b"]
+    assert frame["status"].tolist() == ["success", "success"]
+    assert frame["gif_url"].tolist() == [
+        "https://youtube.com/shorts/a.gif",
+        "https://youtube.com/shorts/b.gif",
+    ]
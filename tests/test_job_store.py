@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from model.schemas import EncodingProfile, GIFResponse, VideoURL
+from services.job_store import SQLiteJobStore
+
+URLS = [
+    VideoURL(url="https://youtube.com/shorts/a", platform="youtube"),
+    VideoURL(
+        url="https://www.tiktok.com/@user/video/1",
+        platform="tiktok",
+        profile=EncodingProfile(fps=5, max_width=240),
+    ),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), retention=60)
+
+
+def test_round_trip(store, tmp_path):
+    store.create("job", "sheet", URLS)
+    result = GIFResponse(
+        original_url=URLS[0].url, status="success", gif_url="https://gifs/a.gif"
+    )
+    store.set_result("job", 0, result)
+    store.set_status("job", "running")
+
+    # A second connection sees what the first one committed
+    job = SQLiteJobStore(str(tmp_path / "jobs.db")).get("job")
+
+    assert job["sheet_name"] == "sheet"
+    assert job["status"] == "running"
+    assert [item["url"] for item in job["items"]] == [u.url for u in URLS]
+    assert job["items"][1]["profile"] == URLS[1].profile
+    assert job["items"][0]["result"] == result
+    assert job["items"][1]["result"] is None
+    assert store.result("job", 0) == result
+    assert store.remaining("job") == 1
+    assert store.get("missing") is None
+
+
+def test_unfinished_lists_jobs_not_completed_in_creation_order(store):
+    for task_id in ("first", "second", "third"):
+        store.create(task_id, "sheet", URLS)
+    store.set_status("second", "completed")
+    store.set_status("third", "running")
+
+    assert store.unfinished() == ["first", "third"]
+
+
+def test_prune_deletes_only_completed_jobs_past_retention(store, monkeypatch):
+    store.create("old", "sheet", URLS)
+    store.create("running", "sheet", URLS)
+    store.set_status("old", "completed")
+    store.set_status("running", "running")
+    store.create("recent", "sheet", URLS)
+    store.set_status("recent", "completed")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert store.prune() == 0
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    store.set_status("recent", "completed")
+    assert store.prune() == 1
+
+    assert store.get("old") is None
+    assert store.result("old", 0) is None
+    assert store.get("running") is not None
+    assert store.get("recent") is not None
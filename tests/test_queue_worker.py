@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+
+from core.config import settings
+from model.schemas import GIFResponse, VideoURL
+from services.job_store import InMemoryJobStore
+from services.queue_worker import QueueWorker
+from services.work_queue import SQLiteWorkQueue
+
+URLS = [
+    VideoURL(url=f"https://youtube.com/shorts/{name}", platform="youtube")
+    for name in "ab"
+]
+
+
+class StubProcessor:
+    """Gives every item the same status, without touching the network."""
+
+    def __init__(self, status: str = "success"):
+        self.status = status
+        self.processed = []
+
+    def cache_key(self, video_url: VideoURL) -> str:
+        return video_url.url
+
+    async def process_batch(self, urls, sheet_name, on_result=None):
+        results = []
+        for position, video_url in enumerate(urls):
+            self.processed.append(video_url.url)
+            result = GIFResponse(
+                original_url=video_url.url,
+                status=self.status,
+                gif_url=f"{video_url.url}.gif" if self.status == "success" else None,
+                error=None if self.status == "success" else "boom",
+            )
+            if on_result:
+                await on_result(position, result)
+            results.append(result)
+        return results
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2, retry_delay=0)
+
+
+@pytest.fixture
+def store():
+    store = InMemoryJobStore()
+    store.create("job", "sheet", URLS)
+    return store
+
+
+def enqueue(queue):
+    queue.enqueue("job", "sheet", list(enumerate(URLS)))
+
+
+async def test_run_processes_and_acks_items(queue, store, monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_POLL_INTERVAL", 0.01)
+    enqueue(queue)
+    worker = QueueWorker(StubProcessor(), store, queue, worker_id="worker")
+
+    running = asyncio.create_task(worker.run())
+    for _ in range(200):
+        if store.get("job")["status"] == "completed":
+            break
+        await asyncio.sleep(0.01)
+    worker.stop()
+    await asyncio.wait_for(running, 5)
+
+    assert store.get("job")["status"] == "completed"
+    assert [store.result("job", i).status for i in range(2)] == ["success"] * 2
+    assert queue.counts() == {"done": 2}
+
+
+async def test_only_the_final_failure_is_recorded(queue, store):
+    enqueue(queue)
+    worker = QueueWorker(StubProcessor("failed"), store, queue, worker_id="worker")
+
+    await worker._process(queue.lease("worker", 10, 60))
+    assert store.remaining("job") == 2
+    assert store.get("job")["status"] == "running"
+
+    await worker._process(queue.lease("worker", 10, 60))
+    assert [store.result("job", i).error for i in range(2)] == ["boom"] * 2
+    assert store.get("job")["status"] == "completed"
+    assert queue.counts() == {"dead": 2}
+
+
+async def test_stored_success_is_acked_without_reprocessing(queue, store):
+    enqueue(queue)
+    done = GIFResponse(original_url=URLS[0].url, status="success", gif_url="x.gif")
+    store.set_result("job", 0, done)
+    processor = StubProcessor()
+    worker = QueueWorker(processor, store, queue, worker_id="worker")
+
+    await worker._process(queue.lease("worker", 10, 60))
+
+    assert processor.processed == [URLS[1].url]
+    assert store.result("job", 0) == done
+    assert queue.counts() == {"done": 2}
+
+
+async def test_worker_dying_on_the_last_attempt_records_the_failure(
+    queue, store, monkeypatch
+):
+    enqueue(queue)
+    worker = QueueWorker(StubProcessor("failed"), store, queue, worker_id="worker")
+    await worker._process(queue.lease("worker", 10, 60))
+    # The last attempt's worker dies without acking or nacking
+    queue.lease("dead-worker", 10, 60)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    await worker._expire()
+
+    assert [store.result("job", i).status for i in range(2)] == ["failed"] * 2
+    assert store.result("job", 0).error == "boom"
+    assert store.get("job")["status"] == "completed"
+    assert queue.counts() == {"dead": 2}
@@ -0,0 +1,159 @@
+import time
+
+import pytest
+
+from services import resilience
+from services.resilience import (
+    AdmissionController,
+    BatchTooLargeError,
+    CircuitBreaker,
+    CircuitOpenError,
+    ItemError,
+    OverloadedError,
+    TokenBucket,
+    Upstreams,
+)
+
+
+class FakeClock:
+    """Stands in for the ``time`` module in services.resilience."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+async def test_token_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    await bucket.acquire(2)
+    assert bucket._tokens == 0
+
+    clock.now += 0.1
+    await bucket.acquire()
+    assert bucket._tokens == pytest.approx(0)
+
+    clock.now += 60
+    bucket._refill()
+    assert bucket._tokens == 2
+
+
+async def test_token_bucket_makes_callers_wait_for_tokens():
+    bucket = TokenBucket(rate=50, burst=1)
+    await bucket.acquire()
+
+    started = time.monotonic()
+    await bucket.acquire()
+
+    assert time.monotonic() - started >= 0.015
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("apify", failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after == 10
+
+
+def test_half_open_circuit_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("apify", failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    # A failed trial re-opens the circuit for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.cancel_trial()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+async def test_only_upstream_failures_open_the_circuit(clock, monkeypatch):
+    monkeypatch.setattr(resilience.settings, "CIRCUIT_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(resilience.settings, "UPSTREAM_RATE_LIMITS", {})
+    upstreams = Upstreams()
+
+    async def bad_item():
+        raise ItemError("not in the dataset")
+
+    async def outage():
+        raise ConnectionError("refused")
+
+    async def ok():
+        return "ok"
+
+    with pytest.raises(ItemError):
+        await upstreams.call("apify", bad_item)
+    assert not upstreams.is_open("apify")
+
+    with pytest.raises(ConnectionError):
+        await upstreams.call("apify", outage)
+    assert upstreams.is_open("apify")
+    with pytest.raises(CircuitOpenError):
+        await upstreams.call("apify", ok)
+    assert await upstreams.call("youtube", ok) == "ok"
+
+
+def test_admission_rejects_batches_over_capacity(clock, monkeypatch):
+    monkeypatch.setattr(resilience.settings, "ADMISSION_RETRY_AFTER", 30)
+    admission = AdmissionController(max_items=3)
+
+    with pytest.raises(BatchTooLargeError):
+        admission.admit(4)
+
+    ticket = admission.admit(2)
+    with pytest.raises(OverloadedError) as overloaded:
+        admission.admit(2)
+    # Nothing has finished yet, so there is no throughput to estimate from
+    assert overloaded.value.retry_after == 30
+
+    ticket.done()
+    assert admission.in_flight == 1
+    admission.admit(2).close()
+    assert admission.in_flight == 1
+
+    # One item finished in the last minute: two more fit in about two minutes
+    admission.admit(2)
+    assert admission.retry_after(2) == 120
+    admission.admit(5, force=True)
+    assert admission.in_flight == 8
+
+    ticket.close()
+    assert admission.in_flight == 7
+
+
+def test_rejections_map_to_429_and_413():
+    from api.routes import _rejected
+
+    overloaded = _rejected(OverloadedError("Service is at capacity", 12))
+    too_large = _rejected(BatchTooLargeError(10, 5))
+
+    assert overloaded.status_code == 429
+    assert overloaded.headers == {"Retry-After": "12"}
+    assert too_large.status_code == 413
+    assert too_large.detail == "Batch of 10 items exceeds the limit of 5; split it"
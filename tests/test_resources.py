@@ -0,0 +1,74 @@
+import resource
+import signal
+import sys
+import time
+
+import pytest
+
+from utils.resources import MiB, ResourceLimitError, job_limits, run_process
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="reads /proc"
+)
+
+
+def python(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_threads_do_not_count_against_the_memory_limit():
+    # 32 threads reserve far more address space than they use; RLIMIT_DATA
+    # would have refused them at this limit
+    code = (
+        "import threading, time\n"
+        "threads = [threading.Thread(target=time.sleep, args=(0.3,)) "
+        "for _ in range(32)]\n"
+        "[t.start() for t in threads]\n"
+        "[t.join() for t in threads]\n"
+        "print('ok')"
+    )
+    with job_limits(memory=96 * MiB) as usage:
+        returncode, stdout, _ = run_process(python(code))
+
+    assert (returncode, stdout) == (0, b"ok\n")
+    assert 0 < usage.children_peak < 96 * MiB
+
+
+def test_child_over_the_memory_limit_is_killed():
+    code = "import time\nblock = bytearray(200 * 1024 * 1024)\ntime.sleep(5)"
+
+    with pytest.raises(ResourceLimitError, match="memory limit of 64 MiB"):
+        with job_limits(memory=64 * MiB):
+            run_process(python(code))
+
+
+def test_failures_near_the_limit_are_not_reported_as_memory():
+    code = "import sys\nblock = bytearray(40 * 1024 * 1024)\nsys.exit(3)"
+
+    # About 50 MiB of RSS: over three quarters of the limit, but not over it
+    with job_limits(memory=64 * MiB):
+        returncode, _, _ = run_process(python(code))
+
+    assert returncode == 3
+
+
+def test_job_growing_past_its_limit_raises_memory_error():
+    blocks = []
+    with pytest.raises(MemoryError):
+        with job_limits(memory=32 * MiB):
+            for _ in range(200):
+                blocks.append(bytearray(MiB))
+                # Give the RSS check a chance to run
+                time.sleep(0.005)
+    blocks.clear()
+
+    # The check is disarmed and the handler restored afterwards
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    assert signal.getsignal(signal.SIGALRM) is signal.SIG_DFL
+
+
+def test_cpu_limit_is_restored():
+    before = resource.getrlimit(resource.RLIMIT_CPU)
+    with job_limits(cpu=60):
+        assert resource.getrlimit(resource.RLIMIT_CPU)[0] != before[0]
+    assert resource.getrlimit(resource.RLIMIT_CPU) == before
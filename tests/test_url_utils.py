@@ -0,0 +1,56 @@
+from utils.url_utils import normalize_url, tiktok_video_id, youtube_video_id
+
+
+def test_youtube_links_collapse_to_one_watch_url():
+    expected = "https://youtube.com/watch?v=dQw4w9WgXcQ"
+    for url in (
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://youtube.com/embed/dQw4w9WgXcQ",
+    ):
+        assert normalize_url(url) == expected
+
+
+def test_tracking_parameters_are_dropped():
+    assert (
+        normalize_url(
+            "https://www.tiktok.com/@user/video/7300000000000000000/"
+            "?is_from_webapp=1&sender_device=pc&utm_source=x#top"
+        )
+        == "https://tiktok.com/@user/video/7300000000000000000"
+    )
+
+
+def test_identifying_parameters_are_kept_in_sorted_order():
+    assert normalize_url("https://example.com/video?id=1") != normalize_url(
+        "https://example.com/video?id=2"
+    )
+    assert (
+        normalize_url("https://example.com/video?b=2&a=1&utm_medium=s")
+        == "https://example.com/video?a=1&b=2"
+    )
+
+
+def test_gcs_object_generation_is_kept():
+    first = normalize_url("https://storage.googleapis.com/bucket/clip.mp4?generation=1")
+    second = normalize_url(
+        "https://storage.googleapis.com/bucket/clip.mp4?generation=2"
+    )
+    assert first != second
+    assert first == "https://storage.googleapis.com/bucket/clip.mp4?generation=1"
+
+
+def test_scheme_host_and_trailing_slash_are_canonical():
+    assert (
+        normalize_url(" HTTPS://WWW.Example.com/path/ ") == "https://example.com/path"
+    )
+
+
+def test_video_ids():
+    assert (
+        tiktok_video_id("https://www.douyin.com/video/7300000000000000001")
+        == "7300000000000000001"
+    )
+    assert tiktok_video_id("https://example.com/clip") is None
+    assert youtube_video_id("https://www.youtube.com/watch?v=short") is None
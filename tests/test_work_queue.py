@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from model.schemas import VideoURL
+from services.work_queue import SQLiteWorkQueue
+
+ITEMS = [
+    (i, VideoURL(url=f"https://youtube.com/shorts/{name}", platform="youtube"))
+    for i, name in enumerate("ab")
+]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2, retry_delay=10)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.time; advance it by assigning to ``clock.now``."""
+
+    class Clock:
+        now = time.time()
+
+    monkeypatch.setattr(time, "time", lambda: Clock.now)
+    return Clock
+
+
+def test_enqueue_and_ack_are_idempotent(queue, tmp_path):
+    queue.enqueue("job", "sheet", ITEMS)
+    queue.enqueue("job", "sheet", ITEMS)
+    assert queue.counts() == {"ready": 2}
+
+    items = queue.lease("worker", 10, 60)
+    for item in items:
+        queue.ack(item["id"], item["token"])
+        queue.ack(item["id"], item["token"])
+
+    # A second connection sees what the first one committed
+    other = SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2, retry_delay=10)
+    assert other.counts() == {"done": 2}
+    assert other.lease("worker", 10, 60) == []
+
+
+def test_leased_items_stay_hidden_until_the_lease_expires(queue, clock):
+    queue.enqueue("job", "sheet", ITEMS)
+
+    first = queue.lease("worker-1", 1, 60)
+    second = queue.lease("worker-2", 10, 60)
+    assert [item["index"] for item in first] == [0]
+    assert [item["index"] for item in second] == [1]
+    assert second[0]["video_url"] == ITEMS[1][1]
+    assert queue.lease("worker-3", 10, 60) == []
+
+    # Extending keeps the lease; letting it lapse hands the item to another worker
+    clock.now += 50
+    assert queue.extend(first[0]["id"], first[0]["token"], 60)
+    assert queue.extend(second[0]["id"], second[0]["token"], 120)
+    clock.now += 50
+    assert queue.lease("worker-3", 10, 60) == []
+    clock.now += 20
+    retried = queue.lease("worker-3", 10, 60)
+    assert [(item["index"], item["attempt"]) for item in retried] == [(0, 2)]
+
+    # The first worker lost its lease, so its ack and extend are ignored
+    assert not queue.extend(first[0]["id"], first[0]["token"], 60)
+    queue.ack(first[0]["id"], first[0]["token"])
+    assert queue.counts()["leased"] == 2
+    queue.ack(retried[0]["id"], retried[0]["token"])
+    assert queue.counts() == {"done": 1, "leased": 1}
+
+
+def test_nack_retries_with_backoff(tmp_path, clock):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=3, retry_delay=10)
+    queue.enqueue("job", "sheet", ITEMS[:1])
+
+    (item,) = queue.lease("worker", 1, 60)
+    assert not queue.nack(item["id"], item["token"], "boom")
+    clock.now += 9
+    assert queue.lease("worker", 1, 60) == []
+    clock.now += 1
+    (item,) = queue.lease("worker", 1, 60)
+    assert item["attempt"] == 2
+
+    # The delay doubles with each attempt
+    assert not queue.nack(item["id"], item["token"], "boom")
+    clock.now += 19
+    assert queue.lease("worker", 1, 60) == []
+    clock.now += 1
+    assert [item["attempt"] for item in queue.lease("worker", 1, 60)] == [3]
+
+
+def test_items_are_dead_lettered_after_max_attempts_and_can_be_requeued(queue, clock):
+    queue.enqueue("job", "sheet", ITEMS[:1])
+    (item,) = queue.lease("worker", 1, 60)
+    assert not queue.nack(item["id"], item["token"], "first")
+    clock.now += 10
+    (item,) = queue.lease("worker", 1, 60)
+    assert queue.nack(item["id"], item["token"], "second")
+
+    clock.now += 3600
+    assert queue.lease("worker", 1, 60) == []
+    (dead,) = queue.dead_letters()
+    assert (dead["task_id"], dead["index"]) == ("job", 0)
+    assert (dead["attempts"], dead["error"]) == (2, "second")
+    assert queue.counts() == {"dead": 1}
+
+    assert queue.requeue(dead["id"]) == "job"
+    assert queue.requeue(dead["id"]) is None
+    (item,) = queue.lease("worker", 1, 60)
+    assert item["attempt"] == 1
+
+
+def test_release_keeps_the_attempt(queue):
+    queue.enqueue("job", "sheet", ITEMS[:1])
+    (item,) = queue.lease("worker", 1, 60)
+    queue.release(item["id"], item["token"])
+
+    (item,) = queue.lease("worker", 1, 60)
+    assert item["attempt"] == 1
+
+
+def test_expire_dead_letters_items_whose_last_lease_lapsed(queue, clock):
+    queue.enqueue("job", "sheet", ITEMS[:1])
+    (item,) = queue.lease("worker", 1, 60)
+    assert not queue.nack(item["id"], item["token"], "boom")
+    clock.now += 10
+    queue.lease("worker", 1, 60)
+    assert queue.expire() == []
+
+    # The worker died during the last attempt: nobody leases the item again
+    clock.now += 60
+    assert queue.lease("worker", 1, 60) == []
+    (expired,) = queue.expire()
+    assert (expired["task_id"], expired["index"]) == ("job", 0)
+    assert expired["error"] == "boom"
+    assert queue.expire() == []
+    assert queue.counts() == {"dead": 1}
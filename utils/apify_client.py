@@ -1,17 +1,20 @@
-import httpx
-import asyncio
+from typing import List, Set
 from core.config import settings
+from utils.apify_runs import run_watcher, webhook_param
+from utils.http_client import http_client
+from utils.url_utils import normalize_url, tiktok_video_id
 
 class ApifyClient:
     def __init__(self):
         self.api_token = settings.APIFY_API_TOKEN
-        self.base_url = f"https://api.apify.com/v2/actor-tasks/{settings.TIKTOK_SCRAPER_TASK_ID}/runs"
+        task_id = settings.TIKTOK_SCRAPER_TASK_ID
+        self.base_url = f"{settings.APIFY_API_URL}/actor-tasks/{task_id}/runs"
 
-    async def run_actor_task(self, video_url: str) -> str:
-        """Run the Apify actor task and return the run ID."""
+    async def run_actor_task(self, video_urls: List[str]) -> str:
+        """Run the Apify actor task for one or more videos and return the run ID."""
         url = f"{self.base_url}?token={self.api_token}"
         headers = {"Content-Type": "application/json"}
-        
+
         data = {
             "disableCheerioBoost": False,
             "disableEnrichAuthorStats": False,
@@ -22,37 +25,50 @@ class ApifyClient:
             "shouldDownloadVideos": True,
             "maxProfilesPerQuery": 10,
             "tiktokMemoryMb": "default",
-            "postURLs": [video_url]
+            "postURLs": video_urls,
         }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data, headers=headers)
-            response.raise_for_status()
-            return response.json()["data"]["id"]
+
+        webhooks = webhook_param()
+        params = {"webhooks": webhooks} if webhooks else None
+        response = await http_client.post(
+            url, json=data, headers=headers, params=params
+        )
+        response.raise_for_status()
+        return response.json()["data"]["id"]
 
     async def wait_for_completion(self, run_id: str) -> str:
         """Wait for the Apify run to complete and return the dataset ID."""
-        url = f"https://api.apify.com/v2/actor-runs/{run_id}?token={self.api_token}"
-        
-        while True:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                
-                status = data["data"]["status"]
-                if status == "SUCCEEDED":
-                    return data["data"]["defaultDatasetId"]
-                elif status == "FAILED":
-                    raise Exception(f"Apify run failed: {data['data'].get('error', 'Unknown error')}")
-                
-                await asyncio.sleep(5)
+        run = await run_watcher.wait(run_id, timeout=settings.APIFY_RUN_TIMEOUT)
+        return run["defaultDatasetId"]
 
     async def get_items(self, dataset_id: str) -> list:
         """Get items from the Apify dataset."""
-        url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?clean=true&token={self.api_token}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json() 
\ No newline at end of file
+        url = (
+            f"{settings.APIFY_API_URL}/datasets/{dataset_id}/items"
+            f"?clean=true&token={self.api_token}"
+        )
+
+        response = await http_client.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_items(self, video_urls: List[str]) -> list:
+        """Scrape several videos in a single actor run and return the dataset items."""
+        run_id = await self.run_actor_task(video_urls)
+        dataset_id = await self.wait_for_completion(run_id)
+        return await self.get_items(dataset_id)
+
+    def match_key(self, video_url: str) -> str:
+        """Key used to pair a submitted URL with its dataset item."""
+        return tiktok_video_id(video_url) or normalize_url(video_url)
+
+    def item_keys(self, item: dict) -> Set[str]:
+        """Keys under which a dataset item can be matched to a submitted URL."""
+        keys = set()
+        if item.get("id"):
+            keys.add(str(item["id"]))
+        for field in ("submittedVideoUrl", "webVideoUrl", "input"):
+            value = item.get(field)
+            if isinstance(value, str) and value:
+                keys.add(self.match_key(value))
+        return keys
@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import json
+import random
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+from core.config import settings
+from utils.http_client import http_client
+
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+WEBHOOK_EVENT_TYPES = [
+    "ACTOR.RUN.SUCCEEDED",
+    "ACTOR.RUN.FAILED",
+    "ACTOR.RUN.ABORTED",
+    "ACTOR.RUN.TIMED_OUT",
+]
+
+
+class ApifyRunError(Exception):
+    """Raised when an Apify run ends unsuccessfully or misses its deadline."""
+
+
+def webhook_param() -> Optional[str]:
+    """The ``webhooks`` query parameter for new runs, if webhooks are configured."""
+    if not settings.APIFY_WEBHOOK_URL:
+        return None
+    request_url = settings.APIFY_WEBHOOK_URL
+    if settings.APIFY_WEBHOOK_SECRET:
+        parts = urlsplit(request_url)
+        secret = urlencode({"secret": settings.APIFY_WEBHOOK_SECRET})
+        query = f"{parts.query}&{secret}" if parts.query else secret
+        request_url = urlunsplit(parts._replace(query=query))
+    webhooks = [{"eventTypes": WEBHOOK_EVENT_TYPES, "requestUrl": request_url}]
+    return base64.b64encode(json.dumps(webhooks).encode()).decode()
+
+
+class _RunState:
+    def __init__(self, future: asyncio.Future, now: float):
+        self.future = future
+        self.next_poll = now
+        self.delay = settings.APIFY_POLL_MIN
+
+
+class ApifyRunWatcher:
+    """Waits for many Apify runs from a single background task.
+
+    Runs are long-polled with Apify's ``waitForFinish`` parameter, so a
+    finished run is noticed within one round trip rather than after a fixed
+    sleep. If the API answers early or errors, that run is polled again with
+    jittered exponential backoff. Webhook deliveries passed to ``notify``
+    resolve a run immediately.
+    """
+
+    def __init__(self):
+        self._runs: Dict[str, _RunState] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def wait(self, run_id: str, timeout: Optional[float] = None) -> dict:
+        """Return the run object once it SUCCEEDED; raise ApifyRunError otherwise."""
+        loop = asyncio.get_running_loop()
+        state = self._runs.get(run_id)
+        if state is None:
+            state = self._runs[run_id] = _RunState(loop.create_future(), loop.time())
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+        try:
+            run = await asyncio.wait_for(asyncio.shield(state.future), timeout)
+        except asyncio.TimeoutError:
+            await self._abort(run_id)
+            raise ApifyRunError(
+                f"Apify run {run_id} did not finish within {timeout}s"
+            ) from None
+        finally:
+            if self._runs.get(run_id) is state:
+                del self._runs[run_id]
+                state.future.cancel()
+
+        if run["status"] != "SUCCEEDED":
+            message = run.get("statusMessage") or run.get("error") or "Unknown error"
+            raise ApifyRunError(f"Apify run {run['status'].lower()}: {message}")
+        return run
+
+    def notify(self, run: dict) -> None:
+        """Resolve a waiting run from a webhook payload's ``resource`` object."""
+        state = self._runs.get(run.get("id"))
+        if (
+            state is not None
+            and run.get("status") in TERMINAL_STATUSES
+            and not state.future.done()
+        ):
+            state.future.set_result(run)
+            self._wakeup.set()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll(self, run_id: str) -> dict:
+        response = await http_client.get(
+            f"{settings.APIFY_API_URL}/actor-runs/{run_id}",
+            params={
+                "token": settings.APIFY_API_TOKEN,
+                "waitForFinish": settings.APIFY_WAIT_FOR_FINISH,
+            },
+            timeout=settings.APIFY_WAIT_FOR_FINISH + settings.HTTP_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()["data"]
+
+    async def _abort(self, run_id: str) -> None:
+        """Best-effort abort of a run nobody is waiting for any more."""
+        try:
+            await http_client.post(
+                f"{settings.APIFY_API_URL}/actor-runs/{run_id}/abort",
+                params={"token": settings.APIFY_API_TOKEN},
+            )
+        except Exception:
+            pass
+
+    def _back_off(self, state: _RunState, now: float) -> None:
+        state.next_poll = now + random.uniform(state.delay / 2, state.delay)
+        state.delay = min(state.delay * 2, settings.APIFY_POLL_MAX)
+
+    async def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        polls: Dict[str, asyncio.Task] = {}
+        started: Dict[str, float] = {}
+        try:
+            while self._runs:
+                now = loop.time()
+                for run_id, state in list(self._runs.items()):
+                    if state.future.done():
+                        if run_id in polls:
+                            polls.pop(run_id).cancel()
+                    elif run_id not in polls and state.next_poll <= now:
+                        polls[run_id] = asyncio.create_task(self._poll(run_id))
+                        started[run_id] = now
+
+                due = [
+                    s.next_poll
+                    for r, s in self._runs.items()
+                    if r not in polls and not s.future.done()
+                ]
+                timeout = max(0, min(due) - now) if due else None
+                self._wakeup.clear()
+                wakeup = asyncio.create_task(self._wakeup.wait())
+                await asyncio.wait(
+                    [*polls.values(), wakeup],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                wakeup.cancel()
+
+                now = loop.time()
+                for run_id, task in list(polls.items()):
+                    if not task.done():
+                        continue
+                    del polls[run_id]
+                    elapsed = now - started.pop(run_id)
+                    state = self._runs.get(run_id)
+                    if state is None or state.future.done():
+                        continue
+                    if task.exception() is not None:
+                        self._back_off(state, now)
+                        continue
+                    run = task.result()
+                    if run.get("status") in TERMINAL_STATUSES:
+                        state.future.set_result(run)
+                    elif elapsed >= settings.APIFY_WAIT_FOR_FINISH * 0.9:
+                        # The long poll ran its full course; start the next one now
+                        state.next_poll = now
+                        state.delay = settings.APIFY_POLL_MIN
+                    else:
+                        # Answered early without finishing; fall back to backoff
+                        self._back_off(state, now)
+        finally:
+            for task in polls.values():
+                task.cancel()
+
+
+run_watcher = ApifyRunWatcher()
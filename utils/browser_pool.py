@@ -0,0 +1,103 @@
+import asyncio
+import subprocess
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from core.config import settings
+
+# Resource types that never matter for finding a video URL
+BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet"}
+
+
+def ensure_playwright_installed():
+    """Ensure Playwright browsers are installed."""
+    try:
+        subprocess.run(
+            ["playwright", "install", "chromium"], check=True, capture_output=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error installing Playwright browsers: {e.stderr.decode()}")
+        raise Exception(
+            "Failed to install Playwright browsers. "
+            "Please run 'playwright install chromium' manually."
+        ) from e
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """A warm headless Chromium shared by all Douyin extractions.
+
+    Keeps ``max_pages`` browser contexts open and hands out one page per
+    extraction, so at most ``max_pages`` pages run at once. Contexts (and
+    their cookies) are reused between extractions; images, fonts and CSS are
+    blocked. The browser is relaunched on demand if it crashes.
+    """
+
+    def __init__(self, max_pages: int):
+        self.max_pages = max_pages
+        self._playwright = None
+        self._browser = None
+        self._contexts: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.started:
+                return
+            if settings.PLAYWRIGHT_AUTO_INSTALL:
+                await asyncio.to_thread(ensure_playwright_installed)
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._contexts = asyncio.Queue()
+            for _ in range(self.max_pages):
+                context = await self._browser.new_context()
+                await context.route("**/*", _block_heavy_resources)
+                self._contexts.put_nowait(context)
+
+    async def warm_up(self) -> None:
+        """Start the browser, logging instead of raising; used from the lifespan."""
+        try:
+            await self.start()
+        except Exception as e:
+            print(f"Browser pool warm-up failed, will retry on first use: {e}")
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+            self._contexts = None
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator:
+        """Yield a fresh page in a pooled context; the page is closed afterwards."""
+        await self.start()
+        contexts = self._contexts
+        context = await contexts.get()
+        try:
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+        finally:
+            contexts.put_nowait(context)
+
+
+browser_pool = BrowserPool(max_pages=settings.BROWSER_MAX_PAGES)
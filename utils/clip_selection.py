@@ -0,0 +1,127 @@
+"""Pick the most active segment of a video for the GIF.
+
+Openings are often a black frame, an intro card or a fade. Instead of
+always starting at ``start``, frames from the next ``window`` seconds are
+sampled small and greyscale by ffmpeg, scored for motion with NumPy and the
+``duration``-second stretch with the most motion wins.
+
+A remote video is read once: ``selected_clip`` copies the sampled window
+to a local spool while sampling it, and the clip is rendered from that copy.
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from core.config import settings
+from utils.gif_engines import FFmpegEngine
+from utils.spool import Spool
+
+# Mean absolute change (0-255) above which a step is treated as a hard cut;
+# capping it keeps a single cut from outscoring sustained motion
+CUT_LEVEL = 40.0
+# Frames whose pixel standard deviation is below this are blank (black,
+# white or a flat card); motion into them does not count
+MIN_DETAIL = 12.0
+# A later segment must beat the opening by this factor to be chosen
+MIN_GAIN = 1.1
+
+
+def motion_scores(frames):
+    """Score the change between consecutive frames of an ``(n, h, w)`` array.
+
+    Returns ``n - 1`` scores: the mean absolute pixel difference, capped at
+    ``CUT_LEVEL`` and weighted down when the frame changed to is blank.
+    """
+    import numpy as np
+
+    frames = frames.astype(np.float32)
+    diffs = np.abs(frames[1:] - frames[:-1]).mean(axis=(1, 2))
+    detail = frames[1:].std(axis=(1, 2))
+    return np.minimum(diffs, CUT_LEVEL) * np.minimum(1.0, detail / MIN_DETAIL)
+
+
+def best_offset(scores, fps: float, duration: float) -> float:
+    """Offset in seconds of the ``duration`` seconds of frames with the most motion.
+
+    Motion between two samples is credited to the later frame, where it
+    shows; the first frame gets the same credit as the second.
+    """
+    import numpy as np
+
+    frames = max(1, int(round(duration * fps)))
+    if len(scores) + 1 <= frames:
+        return 0.0
+    # Sliding-window sums from one cumulative sum
+    totals = np.cumsum(np.concatenate(([0.0, scores[0]], scores)))
+    sums = totals[frames:] - totals[:-frames]
+    best = int(np.argmax(sums))
+    if sums[best] <= sums[0] * MIN_GAIN:
+        return 0.0
+    return best / fps
+
+
+def _best_offset(
+    video_path: str,
+    duration: float,
+    start: float,
+    window: float,
+    copy_to: Optional[str] = None,
+) -> Optional[float]:
+    """Most active segment's offset from ``start``, or None if nothing was sampled."""
+    if window <= duration:
+        return None
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    fps = settings.CLIP_SELECT_FPS
+    size = settings.CLIP_SELECT_SIZE
+    try:
+        raw = FFmpegEngine().sample_frames(
+            video_path, window, fps, size, start, copy_to
+        )
+    except Exception as e:
+        print(f"Clip selection failed, using the start of the video: {e}")
+        return None
+    frames = np.frombuffer(raw, dtype=np.uint8)
+    count = len(frames) // (size * size)
+    if count < 2:
+        return 0.0
+    frames = frames[: count * size * size].reshape(count, size, size)
+    return best_offset(motion_scores(frames), fps, duration)
+
+
+def select_start(
+    video_path: str, duration: float, start: float = 0, window: Optional[float] = None
+) -> float:
+    """Start of the most active ``duration`` seconds within ``window`` of ``start``.
+
+    Falls back to ``start`` when NumPy is missing or the video cannot be sampled.
+    """
+    window = settings.CLIP_SELECT_WINDOW if window is None else window
+    return start + (_best_offset(video_path, duration, start, window) or 0.0)
+
+
+@contextmanager
+def selected_clip(
+    video_path: str, duration: float, start: float = 0
+) -> Iterator[Tuple[str, float]]:
+    """Yield the source and start to render the most active ``duration`` seconds from.
+
+    A URL is sampled and copied in one read, and the copy is yielded; a
+    local file is sampled in place. Falls back like ``select_start``.
+    """
+    if not video_path.startswith(("http://", "https://")):
+        yield video_path, select_start(video_path, duration, start)
+        return
+    spool = Spool(".mp4")
+    try:
+        offset = _best_offset(
+            video_path, duration, start, settings.CLIP_SELECT_WINDOW, spool.path
+        )
+        if offset is None:
+            yield video_path, start
+        else:
+            yield spool.path, offset
+    finally:
+        spool.close()
@@ -0,0 +1,36 @@
+from typing import Dict, Optional
+
+import httpx
+
+from core import metrics
+from core.config import settings
+from utils.http_client import http_client
+from utils.spool import Spool
+
+
+async def stream_to_spool(
+    url: str, headers: Optional[Dict[str, str]] = None, suffix: str = ".mp4"
+) -> Spool:
+    """Stream ``url`` into a ``Spool`` and return it; the caller closes it.
+
+    The body stays in memory unless its Content-Length, or the bytes actually
+    received, exceed ``settings.SPOOL_MAX_MEMORY``.
+    """
+    timeout = httpx.Timeout(settings.DOWNLOAD_TIMEOUT)
+    async with http_client.stream(
+        "GET", url, headers=headers, timeout=timeout
+    ) as response:
+        response.raise_for_status()
+        spool = Spool(
+            suffix, expected_size=int(response.headers.get("content-length") or 0)
+        )
+        try:
+            async for chunk in response.aiter_bytes(settings.DOWNLOAD_CHUNK_SIZE):
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+    metrics.BYTES_TRANSFERRED.inc(
+        spool.size, direction="download", platform=metrics.current_platform()
+    )
+    return spool
@@ -1,24 +1,183 @@
-from google.cloud import storage
+from core import metrics
 from core.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+import asyncio
+import io
+import mimetypes
 import os
+import threading
 
 class GCSClient:
+    """Uploads to the configured bucket without blocking the event loop.
+
+    The google-cloud-storage client is synchronous, so every call runs on a
+    bounded thread pool. Files above ``GCS_RESUMABLE_THRESHOLD`` are sent as
+    chunked resumable uploads, which retry per chunk instead of restarting.
+
+    The library and its credentials are loaded on first use (or by
+    ``connect`` during warm-up), so importing and constructing are cheap.
+    """
+
     def __init__(self):
-        self.client = storage.Client()
-        self.bucket = self.client.bucket(settings.bucket_name)
+        self._client = None
+        self._bucket = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            settings.GCS_UPLOAD_WORKERS, thread_name_prefix="gcs"
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._bucket is not None
+
+    def connect(self) -> None:
+        """Import google-cloud-storage and build the client; blocking, idempotent."""
+        with self._lock:
+            if self._bucket is not None:
+                return
+            from google.cloud import storage
+
+            if settings.GCS_EMULATOR_HOST:
+                # Local fake GCS server (e.g. fake-gcs-server) for development and tests
+                from google.auth.credentials import AnonymousCredentials
+
+                self._client = storage.Client(
+                    project="local",
+                    credentials=AnonymousCredentials(),
+                    client_options={"api_endpoint": settings.GCS_EMULATOR_HOST},
+                )
+            else:
+                self._client = storage.Client()
+            self._bucket = self._client.bucket(settings.bucket_name)
+
+    @property
+    def client(self):
+        self.connect()
+        return self._client
+
+    @property
+    def bucket(self):
+        self.connect()
+        return self._bucket
+
+    def public_url(self, blob_name: str) -> str:
+        return f"{settings.GCS_PUBLIC_URL}/{settings.bucket_name}/{blob_name}"
 
-    async def upload_video(self, file_path: str) -> str:
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def _blob(self, blob_name: str, size: int, metadata: Optional[Dict[str, str]]):
+        # chunk_size switches the library to a chunked resumable upload
+        chunk_size = (
+            settings.GCS_CHUNK_SIZE if size > settings.GCS_RESUMABLE_THRESHOLD else None
+        )
+        blob = self.bucket.blob(blob_name, chunk_size=chunk_size)
+        blob.cache_control = settings.GCS_CACHE_CONTROL
+        if metadata:
+            blob.metadata = metadata
+        return blob
+
+    def _get_blob(self, blob_name: str):
+        return self.bucket.get_blob(blob_name)
+
+    def _send(self, blob, stream, size: int, content_type: str):
+        # Given a size, the library sends anything up to 8 MiB as one request;
+        # leaving it out makes uploads above our threshold resumable
+        blob.upload_from_file(
+            stream, content_type=content_type, size=None if blob.chunk_size else size
+        )
+
+    def _upload_file(
+        self,
+        file_path: str,
+        blob_name: str,
+        content_type: Optional[str],
+        metadata: Optional[Dict[str, str]],
+    ):
+        size = os.path.getsize(file_path)
+        content_type = (
+            content_type
+            or mimetypes.guess_type(file_path)[0]
+            or "application/octet-stream"
+        )
+        with open(file_path, "rb") as f:
+            self._send(self._blob(blob_name, size, metadata), f, size, content_type)
+
+    def _upload_data(
+        self,
+        data: bytes,
+        blob_name: str,
+        content_type: str,
+        metadata: Optional[Dict[str, str]],
+    ):
+        self._send(
+            self._blob(blob_name, len(data), metadata),
+            io.BytesIO(data),
+            len(data),
+            content_type,
+        )
+
+    async def upload_file(
+        self,
+        file_path: str,
+        blob_name: str,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Upload any file to ``blob_name`` and return its URL."""
+        await self._run(self._upload_file, file_path, blob_name, content_type, metadata)
+        metrics.BYTES_TRANSFERRED.inc(
+            os.path.getsize(file_path),
+            direction="upload",
+            platform=metrics.current_platform(),
+        )
+        return self.public_url(blob_name)
+
+    async def upload_data(
+        self,
+        data: bytes,
+        blob_name: str,
+        content_type: str,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Upload in-memory bytes to ``blob_name`` and return its URL."""
+        await self._run(self._upload_data, data, blob_name, content_type, metadata)
+        metrics.BYTES_TRANSFERRED.inc(
+            len(data), direction="upload", platform=metrics.current_platform()
+        )
+        return self.public_url(blob_name)
+
+    async def upload_video(
+        self, file_path: str, blob_name: Optional[str] = None
+    ) -> str:
         """Upload a video file to GCS and return its URL."""
-        blob_name = os.path.basename(file_path)
-        blob = self.bucket.blob(blob_name)
-        
-        blob.upload_from_filename(file_path)
-        return f"https://storage.googleapis.com/{settings.bucket_name}/{blob_name}"
+        blob_name = blob_name or os.path.basename(file_path)
+        return await self.upload_file(file_path, blob_name, content_type="video/mp4")
 
-    async def upload_gif(self, file_path: str) -> str:
+    async def upload_gif(
+        self,
+        file_path: str,
+        blob_name: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
         """Upload a GIF file to GCS and return its URL."""
-        blob_name = f"{settings.image_extracted_folder_name}/{os.path.basename(file_path)}"
-        blob = self.bucket.blob(blob_name)
-        
-        blob.upload_from_filename(file_path)
-        return f"https://storage.googleapis.com/{settings.bucket_name}/{blob_name}" 
\ No newline at end of file
+        if blob_name is None:
+            blob_name = (
+                f"{settings.image_extracted_folder_name}/{os.path.basename(file_path)}"
+            )
+        return await self.upload_file(
+            file_path, blob_name, content_type="image/gif", metadata=metadata
+        )
+
+    async def get_gif(self, blob_name: str) -> Optional[dict]:
+        """Return the URL and custom metadata of an existing GIF, or None."""
+        blob = await self._run(self._get_blob, blob_name)
+        if blob is None:
+            return None
+        return {"gif_url": self.public_url(blob_name), "metadata": blob.metadata or {}}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
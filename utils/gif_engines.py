@@ -0,0 +1,408 @@
+import os
+import struct
+import tempfile
+from typing import Dict, List, Optional, Tuple, Type
+
+# Content type of each rendition format
+CONTENT_TYPES = {
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "mp4": "video/mp4",
+    "jpg": "image/jpeg",
+}
+
+
+def gif_dimensions(data: bytes) -> Tuple[int, int]:
+    """Return ``(width, height)`` from a GIF's logical screen descriptor."""
+    if data[:3] != b"GIF" or len(data) < 10:
+        raise ValueError("Not a GIF")
+    return struct.unpack("<HH", data[6:10])
+
+
+class GIFEngine:
+    """Turns a slice of a video file into an animated GIF.
+
+    ``start`` and ``max_duration`` select the slice; ``max_width`` (0 keeps the
+    source width), ``max_colors``, ``dither`` and ``dedupe`` shape the output.
+    Engines ignore options they cannot honour.
+    """
+
+    name = ""
+    # Whether ``video_path`` may be an http(s) URL read directly by the engine
+    accepts_urls = False
+
+    def convert(
+        self,
+        video_path: str,
+        output_path: str,
+        max_duration: float,
+        fps: int,
+        start: float = 0,
+        max_width: int = 0,
+        max_colors: int = 256,
+        dither: str = "bayer",
+        dedupe: bool = False,
+    ):
+        raise NotImplementedError
+
+    def encode(
+        self, video_path: str, max_duration: float, fps: int, **options
+    ) -> bytes:
+        """Return the GIF as bytes; engines that can write to a pipe override this."""
+        fd, output_path = tempfile.mkstemp(suffix=".gif")
+        os.close(fd)
+        try:
+            self.convert(video_path, output_path, max_duration, fps, **options)
+            with open(output_path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(output_path)
+
+    def render(
+        self, video_path: str, max_duration: float, renditions: List[dict], **options
+    ) -> List[bytes]:
+        """One output per rendition (``format``, ``max_width``, ``fps``), in order.
+
+        The base implementation encodes each GIF separately; engines that can
+        decode once for several outputs override it.
+        """
+        unsupported = {r["format"] for r in renditions} - {"gif"}
+        if unsupported:
+            raise Exception(
+                f"The {self.name} engine cannot produce "
+                f"{', '.join(sorted(unsupported))}"
+            )
+        return [
+            self.encode(
+                video_path,
+                max_duration,
+                r["fps"],
+                **dict(options, max_width=r["max_width"]),
+            )
+            for r in renditions
+        ]
+
+
+class MoviePyEngine(GIFEngine):
+    """Decodes frames into numpy arrays with MoviePy and re-encodes them.
+
+    Honours ``start`` and ``max_width`` only.
+    """
+
+    name = "moviepy"
+
+    def convert(
+        self,
+        video_path: str,
+        output_path: str,
+        max_duration: float,
+        fps: int,
+        start: float = 0,
+        max_width: int = 0,
+        **options,
+    ):
+        from moviepy.editor import VideoFileClip
+
+        with VideoFileClip(video_path) as clip:
+            end = min(start + max_duration, clip.duration)
+            if start > 0 or clip.duration > end:
+                clip = clip.subclip(start, end)
+            if max_width and clip.w > max_width:
+                clip = clip.resize(width=max_width)
+            clip = clip.set_fps(fps)
+            clip.write_gif(output_path)
+
+
+class FFmpegEngine(GIFEngine):
+    """Trims, resamples and palette-encodes in a single ffmpeg subprocess.
+
+    Frames never enter Python: ffmpeg builds an optimal palette with
+    ``palettegen`` and applies it with ``paletteuse`` in one filter graph.
+    """
+
+    name = "ffmpeg"
+    accepts_urls = True
+
+    # Output options per rendition format
+    FORMAT_OPTIONS = {
+        "gif": ["-loop", "0", "-f", "gif"],
+        "webp": ["-c:v", "libwebp_anim", "-quality", "75", "-loop", "0", "-f", "webp"],
+        "mp4": [
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-crf",
+            "28",
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            "-f",
+            "mp4",
+        ],
+        "jpg": ["-frames:v", "1", "-q:v", "3", "-update", "1", "-f", "image2"],
+    }
+
+    def __init__(self, binary: str = "ffmpeg"):
+        self.binary = binary
+
+    def _steps(
+        self, fps: int, max_width: int = 0, dedupe: bool = False, even: bool = False
+    ) -> str:
+        steps = [f"fps={fps}"]
+        if dedupe:
+            # Drop frames that barely differ from the last kept one; the GIF
+            # muxer turns the gaps into longer frame delays
+            steps.append("mpdecimate")
+        if max_width and even:
+            # H.264 with yuv420p needs even dimensions
+            steps.append(f"scale=w=trunc(min(iw\\,{max_width})/2)*2:h=-2:flags=lanczos")
+        elif max_width:
+            steps.append(f"scale=w=min(iw\\,{max_width}):h=-1:flags=lanczos")
+        elif even:
+            steps.append("scale=w=trunc(iw/2)*2:h=trunc(ih/2)*2")
+        return ",".join(steps)
+
+    def _palette(self, source: str, output: str, max_colors: int, dither: str) -> str:
+        dithering = "bayer:bayer_scale=5" if dither == "bayer" else dither
+        return (
+            f"{source}split[{output}a][{output}b];"
+            f"[{output}a]palettegen=max_colors={max_colors}:stats_mode=diff[{output}p];"
+            f"[{output}b][{output}p]paletteuse=dither={dithering}:diff_mode=rectangle"
+        )
+
+    def build_filter(
+        self,
+        fps: int,
+        max_width: int = 0,
+        max_colors: int = 256,
+        dither: str = "bayer",
+        dedupe: bool = False,
+    ) -> str:
+        return self._palette(
+            f"[0:v]{self._steps(fps, max_width, dedupe)},", "", max_colors, dither
+        )
+
+    def build_command(
+        self,
+        video_path: str,
+        output_path: str,
+        max_duration: float,
+        fps: int,
+        start: float = 0,
+        max_width: int = 0,
+        max_colors: int = 256,
+        dither: str = "bayer",
+        dedupe: bool = False,
+    ) -> List[str]:
+        output_options = ["-fps_mode", "vfr"] if dedupe else []
+        return [
+            self.binary,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-y",
+            *self._input_options(video_path, start),
+            # -t before -i stops reading the input after max_duration seconds
+            "-t",
+            str(max_duration),
+            "-i",
+            video_path,
+            "-filter_complex",
+            self.build_filter(fps, max_width, max_colors, dither, dedupe),
+            "-an",
+            "-loop",
+            "0",
+            *output_options,
+            "-f",
+            "gif",
+            output_path,
+        ]
+
+    def _input_options(self, video_path: str, start: float) -> List[str]:
+        input_options = []
+        if video_path.startswith(("http://", "https://")):
+            # ffmpeg seeks with Range requests, so only the container index and
+            # the requested slice of media are fetched
+            input_options = [
+                "-reconnect",
+                "1",
+                "-reconnect_delay_max",
+                "2",
+                "-rw_timeout",
+                "30000000",
+            ]
+        if start:
+            # Input seeking jumps to the nearest keyframe without decoding up to it
+            input_options += ["-ss", str(start)]
+        return input_options
+
+    def build_render_command(
+        self,
+        video_path: str,
+        outputs: List[Tuple[dict, str]],
+        max_duration: float,
+        start: float = 0,
+        max_colors: int = 256,
+        dither: str = "bayer",
+        dedupe: bool = False,
+    ) -> List[str]:
+        """ffmpeg command decoding the slice once for every ``(rendition, path)``."""
+        labels = "".join(f"[s{i}]" for i in range(len(outputs)))
+        graph = [f"[0:v]split={len(outputs)}{labels}"]
+        output_args = []
+        for i, (rendition, path) in enumerate(outputs):
+            fmt = rendition["format"]
+            frame_dedupe = dedupe and fmt != "jpg"
+            steps = self._steps(
+                rendition["fps"],
+                rendition["max_width"],
+                frame_dedupe,
+                even=fmt == "mp4",
+            )
+            if fmt == "gif":
+                graph.append(
+                    self._palette(f"[s{i}]{steps},", f"g{i}", max_colors, dither)
+                    + f"[o{i}]"
+                )
+            else:
+                graph.append(f"[s{i}]{steps}[o{i}]")
+            vfr = ["-fps_mode", "vfr"] if frame_dedupe else []
+            output_args += [
+                "-map",
+                f"[o{i}]",
+                "-an",
+                *vfr,
+                *self.FORMAT_OPTIONS[fmt],
+                path,
+            ]
+        return [
+            self.binary,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-y",
+            *self._input_options(video_path, start),
+            "-t",
+            str(max_duration),
+            "-i",
+            video_path,
+            "-filter_complex",
+            ";".join(graph),
+            *output_args,
+        ]
+
+    def sample_frames(
+        self,
+        video_path: str,
+        window: float,
+        fps: float,
+        size: int,
+        start: float = 0,
+        copy_to: Optional[str] = None,
+    ) -> bytes:
+        """Greyscale ``size``x``size`` frames at ``fps`` over ``window`` seconds, raw.
+
+        With ``copy_to`` the same read also writes the window, without
+        re-encoding, to that MP4 file; its time 0 is ``start``.
+        """
+        copy = (
+            ["-map", "0:v", "-map", "0:a?", "-c", "copy", "-f", "mp4", copy_to]
+            if copy_to
+            else []
+        )
+        return self._run(
+            [
+                self.binary,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-nostdin",
+                "-y",
+                *self._input_options(video_path, start),
+                # Motion scores survive skipping B-frames and deblocking, which
+                # roughly halves decode time for typical H.264
+                "-skip_frame",
+                "noref",
+                "-skip_loop_filter",
+                "all",
+                "-t",
+                str(window),
+                "-i",
+                video_path,
+                "-an",
+                "-sn",
+                "-vf",
+                f"fps={fps},scale={size}:{size}:flags=fast_bilinear,format=gray",
+                "-f",
+                "rawvideo",
+                "pipe:1",
+                *copy,
+            ]
+        )
+
+    def render(
+        self, video_path: str, max_duration: float, renditions: List[dict], **options
+    ) -> List[bytes]:
+        from utils.spool import Spool
+
+        # Outputs go to memfd spools; MP4 needs a seekable target for faststart
+        spools = [Spool(f".{r['format']}") for r in renditions]
+        try:
+            outputs = list(
+                zip(renditions, (spool.path for spool in spools), strict=True)
+            )
+            self._run(
+                self.build_render_command(video_path, outputs, max_duration, **options)
+            )
+            return [spool.read() for spool in spools]
+        finally:
+            for spool in spools:
+                spool.close()
+
+    def _run(self, command: List[str]) -> bytes:
+        from utils.resources import run_process
+
+        # Under the encode job's memory and CPU limits, when there is one
+        returncode, stdout, stderr = run_process(command)
+        if returncode != 0:
+            stderr = stderr.decode(errors="replace").strip()
+            raise Exception(f"ffmpeg failed ({returncode}): {stderr[-500:]}")
+        return stdout
+
+    def convert(
+        self,
+        video_path: str,
+        output_path: str,
+        max_duration: float,
+        fps: int,
+        **options,
+    ):
+        self._run(
+            self.build_command(video_path, output_path, max_duration, fps, **options)
+        )
+
+    def encode(
+        self, video_path: str, max_duration: float, fps: int, **options
+    ) -> bytes:
+        # The GIF muxer never seeks, so ffmpeg can write straight to stdout
+        return self._run(
+            self.build_command(video_path, "pipe:1", max_duration, fps, **options)
+        )
+
+
+ENGINES: Dict[str, Type[GIFEngine]] = {
+    MoviePyEngine.name: MoviePyEngine,
+    FFmpegEngine.name: FFmpegEngine,
+}
+
+
+def get_engine(name: str) -> GIFEngine:
+    """Return an engine instance by name."""
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unsupported GIF engine: {name}") from None
@@ -0,0 +1,141 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HTTPClient:
+    """Application-wide pooled HTTP client with per-host caps and retries.
+
+    Opened and closed in the FastAPI lifespan; used lazily (and opened on
+    first use) everywhere else. Requests are retried with jittered
+    exponential backoff on 429, 5xx and transport errors. Non-idempotent
+    methods are only retried when the server cannot have acted on them
+    (429 or a failed connect).
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=settings.HTTP2_ENABLED and _http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+                ),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def start(self) -> None:
+        """Open the connection pool ahead of the first request."""
+        self.client  # noqa: B018
+
+    async def close(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(
+                settings.HTTP_PER_HOST_CONCURRENCY
+            )
+        return limit
+
+    def _backoff(
+        self, attempt: int, response: Optional[httpx.Response] = None
+    ) -> float:
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), settings.HTTP_BACKOFF_MAX)
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        ceiling = min(
+            settings.HTTP_BACKOFF_MAX, settings.HTTP_BACKOFF_BASE * 2**attempt
+        )
+        return random.uniform(0, ceiling)
+
+    def _should_retry(
+        self, method: str, attempt: int, response=None, error=None
+    ) -> bool:
+        if attempt >= settings.HTTP_MAX_RETRIES:
+            return False
+        if error is not None:
+            return method in IDEMPOTENT_METHODS or isinstance(error, httpx.ConnectError)
+        if response.status_code == 429:
+            return True
+        return response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures; the body is read."""
+        async with self.stream(method, url, **kwargs) as response:
+            await response.aread()
+            return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, url: str, **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        """Open a streaming response, retrying until headers are received.
+
+        The per-host slot is held until the body has been consumed.
+        """
+        method = method.upper()
+        async with self._host_limit(url):
+            attempt = 0
+            while True:
+                request = self.client.build_request(method, url, **kwargs)
+                try:
+                    response = await self.client.send(request, stream=True)
+                except httpx.TransportError as e:
+                    if not self._should_retry(method, attempt, error=e):
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+                if self._should_retry(method, attempt, response=response):
+                    await response.aclose()
+                    await asyncio.sleep(self._backoff(attempt, response))
+                    attempt += 1
+                    continue
+                try:
+                    yield response
+                finally:
+                    await response.aclose()
+                return
+
+
+http_client = HTTPClient()
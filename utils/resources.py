@@ -0,0 +1,369 @@
+"""Memory estimates and per-job resource limits for encode jobs.
+
+``job_limits`` runs inside an encoder worker around one job. It caps the
+worker's memory and CPU time (RLIMIT_CPU), and applies the same caps to
+every subprocess started through ``run_process``. It also measures the
+job's peak RSS.
+
+Memory is enforced on measured RSS, not RLIMIT_DATA: that limit counts
+address space such as thread stacks and malloc arenas, so a multithreaded
+ffmpeg hits it far below its resident size.
+"""
+import json
+import math
+import os
+import resource
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from core.config import settings
+
+MiB = 1024 * 1024
+# Seconds between RSS checks of a running job
+RSS_POLL_INTERVAL = 0.05
+# Assumed geometry of a video that cannot be probed
+DEFAULT_INFO = {"width": 1920, "height": 1080, "duration": 0.0, "fps": 30.0}
+# Reference frames a decoder keeps at source size (yuv420p, 1.5 bytes per pixel)
+DECODE_FRAMES = 16
+# Fixed overhead of each engine: binaries, codecs, interpreter state
+ENGINE_BASE = {"ffmpeg": 48 * MiB, "moviepy": 160 * MiB}
+
+
+class ResourceLimitError(Exception):
+    """A job needs, or used, more memory or CPU time than it is allowed."""
+
+
+class ProbeError(Exception):
+    """ffprobe could not read the video."""
+
+
+def probe_video(path: str) -> Optional[dict]:
+    """Width, height, duration and frame rate of the first video stream.
+
+    Returns None when ffprobe is not installed or finds no usable video
+    stream, and raises ProbeError when it cannot read ``path`` at all.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "stream=width,height,avg_frame_rate,duration:format=duration",
+                "-of",
+                "json",
+                path,
+            ],
+            capture_output=True,
+            timeout=30,
+        )
+    except OSError:
+        return None
+    except subprocess.TimeoutExpired:
+        raise ProbeError("ffprobe timed out") from None
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace").strip()
+        raise ProbeError(stderr[-500:] or f"ffprobe failed ({result.returncode})")
+    try:
+        data = json.loads(result.stdout)
+        stream = data["streams"][0]
+        numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+        fps = (
+            float(numerator) / float(denominator or 1)
+            if float(denominator or 1)
+            else 0.0
+        )
+        duration = float(
+            stream.get("duration") or data.get("format", {}).get("duration") or 0
+        )
+        return {
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "duration": duration,
+            "fps": fps,
+        }
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def _scaled(info: dict, max_width: int) -> Tuple[int, int]:
+    width, height = info["width"], info["height"]
+    if max_width and max_width < width:
+        return max_width, max(1, round(height * max_width / width))
+    return width, height
+
+
+def estimate_memory(info: Optional[dict], params: dict) -> int:
+    """Rough peak memory, in bytes, of ``render_clip(**params)`` on the video ``info``.
+
+    The decoder holds reference frames at source size. ffmpeg buffers every
+    output frame until the GIF palette is built; MoviePy keeps every frame
+    as RGB.
+    """
+    info = info or DEFAULT_INFO
+    duration = params["max_duration"]
+    if info["duration"] > params.get("start", 0):
+        duration = min(duration, info["duration"] - params.get("start", 0))
+    source = info["width"] * info["height"]
+
+    if (params.get("engine") or settings.GIF_ENGINE) == "moviepy":
+        width, height = _scaled(info, params.get("max_width", 0))
+        frames = math.ceil(duration * params["fps"]) + 1
+        return ENGINE_BASE["moviepy"] + source * 3 * 2 + frames * width * height * 3 * 2
+
+    total = ENGINE_BASE["ffmpeg"] + int(source * 1.5 * DECODE_FRAMES)
+    outputs = [
+        {
+            "format": "gif",
+            "max_width": params.get("max_width", 0),
+            "fps": params["fps"],
+        },
+        *params.get("renditions", []),
+    ]
+    for output in outputs:
+        width, height = _scaled(info, output["max_width"])
+        frames = (
+            1 if output["format"] == "jpg" else math.ceil(duration * output["fps"]) + 1
+        )
+        total += frames * width * height * 4
+    return total
+
+
+def _even(width: float) -> int:
+    return int(width) // 2 * 2
+
+
+def fit_to_memory(info: Optional[dict], params: dict, limit: int) -> Tuple[dict, int]:
+    """``params``, downscaled until the estimate fits ``limit``, and the estimate.
+
+    Every output shrinks by the same factor. Raises ResourceLimitError when
+    the GIF would have to go below ``GIF_MIN_WIDTH``.
+    """
+    estimate = estimate_memory(info, params)
+    if not limit or estimate <= limit:
+        return params, estimate
+    info = info or DEFAULT_INFO
+    requested = estimate
+    fitted = params
+    scale = 1.0
+    while estimate > limit:
+        scale *= 0.8
+        # Even widths, so downscaled MP4 renditions stay encodable
+        width = _even(_scaled(info, params.get("max_width", 0))[0] * scale)
+        if width < settings.GIF_MIN_WIDTH:
+            raise ResourceLimitError(
+                f"Video is too large to encode ({info['width']}x{info['height']}): "
+                f"needs about {requested // MiB} MiB, the limit is {limit // MiB} MiB"
+            )
+        fitted = dict(
+            params,
+            max_width=width,
+            renditions=[
+                dict(
+                    r, max_width=max(2, _even(_scaled(info, r["max_width"])[0] * scale))
+                )
+                for r in params.get("renditions", [])
+            ],
+        )
+        estimate = estimate_memory(info, fitted)
+    print(
+        f"Downscaling a {info['width']}x{info['height']} encode to "
+        f"{fitted['max_width']}px wide to fit {limit // MiB} MiB"
+    )
+    return fitted, estimate
+
+
+class JobUsage:
+    """Limits of the running job and, once it has finished, its peak RSS in bytes."""
+
+    def __init__(self, memory: int, cpu: float):
+        self.memory = memory
+        self.cpu = cpu
+        self.children_peak = 0
+        self.peak_rss = 0
+
+
+_job: Optional[JobUsage] = None
+
+
+def _status_kib(field: str, pid: str = "self") -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux 4.0+)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _bounded(limit: int, value: int) -> Tuple[int, int]:
+    """``value`` as a soft limit, never above the hard limit already in place."""
+    hard = resource.getrlimit(limit)[1]
+    return (value if hard == resource.RLIM_INFINITY else min(value, hard)), hard
+
+
+@contextmanager
+def job_limits(memory: int = 0, cpu: float = 0) -> Iterator[JobUsage]:
+    """Run one job here under ``memory`` bytes and ``cpu`` seconds; 0 means no limit.
+
+    The limits count from what the process already uses, so a long-lived
+    worker gets the same allowance for every job. Growing more than
+    ``memory`` past the starting RSS raises MemoryError in the job; this is
+    checked from a SIGALRM timer, so only on the main thread. The CPU limit
+    is a soft RLIMIT_CPU, restored afterwards. ``run_process`` children get
+    the limits from zero.
+    """
+    global _job
+    usage = JobUsage(memory, cpu)
+    saved = []
+    if cpu:
+        saved.append((resource.RLIMIT_CPU, resource.getrlimit(resource.RLIMIT_CPU)))
+        used = sum(os.times()[:2])
+        resource.setrlimit(
+            resource.RLIMIT_CPU, _bounded(resource.RLIMIT_CPU, math.ceil(used + cpu))
+        )
+    _reset_peak_rss()
+    start_rss = _status_kib("VmRSS")
+    previous_handler = None
+    if memory and threading.current_thread() is threading.main_thread():
+
+        def check_rss(signum, frame):
+            if (_status_kib("VmRSS") - start_rss) * 1024 > memory:
+                # Disarm first, so the job sees at most one MemoryError
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                raise MemoryError(f"job grew past {memory // MiB} MiB")
+
+        previous_handler = signal.signal(signal.SIGALRM, check_rss)
+        signal.setitimer(signal.ITIMER_REAL, RSS_POLL_INTERVAL, RSS_POLL_INTERVAL)
+    _job = usage
+    try:
+        try:
+            yield usage
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        # Separate from the timer's finally, which a last MemoryError may cut short
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if previous_handler is not None:
+            signal.signal(signal.SIGALRM, previous_handler)
+        _job = None
+        for limit, value in saved:
+            resource.setrlimit(limit, value)
+        # Subprocess peak plus what the worker itself grew by
+        usage.peak_rss = (
+            usage.children_peak + max(0, _status_kib("VmHWM") - start_rss) * 1024
+        )
+
+
+def _child_limits(cpu: float):
+    # SIGXCPU at the soft limit, SIGKILL a little later if it is ignored
+    cpu_time = _bounded(resource.RLIMIT_CPU, math.ceil(cpu))
+
+    def apply():
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (cpu_time[0], min(cpu_time[1], cpu_time[0] + 5))
+        )
+
+    return apply
+
+
+def _communicate(
+    process: subprocess.Popen, memory: int
+) -> Tuple[bytes, bytes, int, bool]:
+    """Read the child's stdout and stderr to the end.
+
+    Returns them, the child's peak RSS in bytes and whether it was killed for
+    going over ``memory`` bytes of RSS (0 for no limit).
+    """
+    output = {process.stdout: [], process.stderr: []}
+    pid = str(process.pid)
+    peak = 0
+    over_memory = False
+    next_check = 0.0
+    with selectors.DefaultSelector() as selector:
+        for pipe in output:
+            selector.register(pipe, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select(RSS_POLL_INTERVAL):
+                data = os.read(key.fd, 1024 * 1024)
+                if data:
+                    output[key.fileobj].append(data)
+                else:
+                    selector.unregister(key.fileobj)
+            now = time.monotonic()
+            if now < next_check:
+                continue
+            next_check = now + RSS_POLL_INTERVAL
+            # VmHWM counts from exec; the child's ru_maxrss also holds the
+            # worker's RSS at fork
+            peak = max(peak, _status_kib("VmHWM", pid) * 1024)
+            if memory and not over_memory and _status_kib("VmRSS", pid) * 1024 > memory:
+                over_memory = True
+                process.kill()
+    peak = max(peak, _status_kib("VmHWM", pid) * 1024)
+    return (
+        b"".join(output[process.stdout]),
+        b"".join(output[process.stderr]),
+        peak,
+        over_memory,
+    )
+
+
+def run_process(command: List[str]) -> Tuple[int, bytes, bytes]:
+    """Run ``command`` under the current job's limits; return (code, stdout, stderr).
+
+    The child's peak RSS counts towards the job, and the child is killed if
+    its RSS goes over the job's memory limit. A child stopped by one of its
+    limits raises ResourceLimitError.
+    """
+    job = _job
+    memory = job.memory if job is not None else 0
+    preexec = _child_limits(job.cpu) if job is not None and job.cpu else None
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=preexec
+    )
+    try:
+        stdout, stderr, peak, over_memory = _communicate(process, memory)
+        # wait4 reaps the child and reports its own resource usage
+        _, status, rusage = os.wait4(process.pid, 0)
+    except BaseException:
+        # E.g. the worker's own memory check fired; do not leave the child behind
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if job is not None:
+        job.children_peak = max(job.children_peak, peak)
+        # ffmpeg traps SIGXCPU and exits normally, so go by the CPU time used
+        cpu_time = rusage.ru_utime + rusage.ru_stime
+        if job.cpu and process.returncode != 0 and cpu_time >= math.ceil(job.cpu):
+            raise ResourceLimitError(
+                f"{command[0]} exceeded the CPU-time limit of {job.cpu:g}s"
+            )
+        if over_memory:
+            raise ResourceLimitError(
+                f"{command[0]} exceeded the memory limit of {job.memory // MiB} MiB"
+            )
+    return process.returncode, stdout, stderr
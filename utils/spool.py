@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Optional
+
+from core.config import settings
+
+
+def _memfd(name: str) -> Optional[int]:
+    """Anonymous RAM-backed file descriptor, or None where memfd is unavailable."""
+    memfd_create = getattr(os, "memfd_create", None)
+    if memfd_create is None:
+        return None
+    try:
+        return memfd_create(name)
+    except OSError:
+        return None
+
+
+class Spool:
+    """A temporary file that stays in memory until it outgrows ``max_memory``.
+
+    Small files live in a memfd and are reachable by other processes (ffmpeg,
+    the encoder workers, the GCS uploader) through ``/proc/<pid>/fd/<n>``, so
+    they never touch the container filesystem. Writes past ``max_memory``
+    move the contents to a regular temporary file and continue there.
+    """
+
+    def __init__(
+        self, suffix: str = "", expected_size: int = 0, max_memory: Optional[int] = None
+    ):
+        self.max_memory = (
+            settings.SPOOL_MAX_MEMORY if max_memory is None else max_memory
+        )
+        # Unique object name, for uploads of the spooled file
+        self.name = f"{uuid.uuid4().hex}{suffix}"
+        self.size = 0
+        self._suffix = suffix
+        self._fd = None
+        self._disk_path = None
+        if 0 < expected_size <= self.max_memory or (
+            expected_size == 0 and self.max_memory > 0
+        ):
+            self._fd = _memfd(self.name)
+        if self._fd is None:
+            self._to_disk()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._disk_path is None
+
+    @property
+    def path(self) -> str:
+        """A path other processes can open to read the spooled bytes."""
+        if self._disk_path is not None:
+            return self._disk_path
+        return f"/proc/{os.getpid()}/fd/{self._fd}"
+
+    def _to_disk(self):
+        fd, path = tempfile.mkstemp(suffix=self._suffix)
+        if self._fd is not None:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            with os.fdopen(os.dup(self._fd), "rb") as src, os.fdopen(
+                os.dup(fd), "wb"
+            ) as dst:
+                shutil.copyfileobj(src, dst)
+            os.close(self._fd)
+        self._fd = fd
+        self._disk_path = path
+
+    def write(self, data: bytes):
+        if self.in_memory and self.size + len(data) > self.max_memory:
+            self._to_disk()
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self.size += len(data)
+
+    def read(self) -> bytes:
+        """Everything in the spool, including bytes written by other processes."""
+        size = os.fstat(self._fd).st_size
+        return os.pread(self._fd, size, 0)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._disk_path is not None and os.path.exists(self._disk_path):
+            os.unlink(self._disk_path)
+
+    def __enter__(self) -> "Spool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,90 @@
+import re
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit, urlunsplit
+
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_TIKTOK_ID = re.compile(r"/(?:video|photo)/(\d+)")
+# Share and analytics parameters that never change which video a URL points at
+_TRACKING_PARAMS = {
+    "_d",
+    "_r",
+    "_t",
+    "checksum",
+    "enter_from",
+    "fbclid",
+    "feature",
+    "gclid",
+    "igshid",
+    "is_copy_url",
+    "is_from_webapp",
+    "mc_cid",
+    "mc_eid",
+    "pp",
+    "previous_page",
+    "refer",
+    "sec_uid",
+    "sender_device",
+    "sender_web_id",
+    "si",
+    "timestamp",
+    "tt_from",
+    "u_code",
+    "web_id",
+}
+_TRACKING_PREFIXES = ("utm_", "share_")
+
+
+def tiktok_video_id(url: str):
+    """Return the numeric video ID of a TikTok or Douyin URL, or None."""
+    match = _TIKTOK_ID.search(url)
+    return match.group(1) if match else None
+
+
+def youtube_video_id(url: str):
+    """Return the 11-character video ID of a YouTube URL, or None."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().split(":")[0]
+    segments = [s for s in parts.path.split("/") if s]
+    candidate = None
+    if host.endswith("youtu.be") and segments:
+        candidate = segments[0]
+    elif host.endswith("youtube.com"):
+        if (
+            segments[:1] in (["shorts"], ["embed"], ["live"], ["v"])
+            and len(segments) > 1
+        ):
+            candidate = segments[1]
+        else:
+            candidate = parse_qs(parts.query).get("v", [None])[0]
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+
+def normalize_url(url: str) -> str:
+    """Canonicalise a source URL so equivalent links compare equal.
+
+    Lowercases the scheme and host, drops ``www.``/``m.`` prefixes, the
+    fragment, tracking query parameters and trailing slashes. YouTube links
+    (watch, shorts, youtu.be, embed) collapse to one watch URL.
+    """
+    url = url.strip()
+    video_id = youtube_video_id(url)
+    if video_id:
+        return f"https://youtube.com/watch?v={video_id}"
+
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    path = parts.path.rstrip("/") or "/"
+    # Anything else in the query may identify the video (an ID, a GCS object
+    # generation), so it is kept, in a stable order
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key not in _TRACKING_PARAMS and not key.startswith(_TRACKING_PREFIXES)
+        )
+    )
+    return urlunsplit((parts.scheme.lower() or "https", host, path, query, ""))
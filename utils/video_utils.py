@@ -1,87 +1,192 @@
-from moviepy.editor import VideoFileClip
-import yt_dlp
+import math
 import re
-from playwright.async_api import async_playwright
-import nest_asyncio
 import asyncio
-import httpx
-
-nest_asyncio.apply()
-
-def convert_to_gif(video_path: str, output_path: str, max_duration: int = 2, fps: int = 3):
-    """Convert a video to GIF with specified duration and FPS."""
-    with VideoFileClip(video_path) as clip:
-        if clip.duration > max_duration:
-            clip = clip.subclip(0, max_duration)
-        clip = clip.set_fps(fps)
-        clip.write_gif(output_path)
-
-async def download_youtube_video(url: str, output_path: str) -> str:
-    """Download a YouTube video using yt-dlp."""
-    ydl_opts = {
-        'format': 'mp4',
-        'outtmpl': output_path,
-        'quiet': True,
-        'socket_timeout': 30,
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-        },
-        'nocheckcertificate': True,
-        'merge_output_format': 'mp4',
-        'postprocessors': [{
-            'key': 'FFmpegVideoConvertor',
-            'preferedformat': 'mp4',
-        }],
-    }
-    
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
-    return output_path
-
-async def download_douyin_video(url: str, output_path: str) -> str:
-    """Download a Douyin video using Playwright."""
-    match = re.search(r'/video/(\d+)', url)
-    if not match:
-        raise Exception("Unable to extract video ID from URL")
-    
-    video_id = match.group(1)
-    video_url = None
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        async def intercept_response(response):
-            nonlocal video_url
-            url = response.url
-            if "video" in url and (url.endswith(".mp4") or "mime_type=video_mp4" in url):
-                video_url = url
-        
-        page.on("response", intercept_response)
-        await page.goto(url, timeout=120000)
-        
+from typing import List, Optional, Tuple
+from core import metrics
+from core.config import settings
+from utils.browser_pool import browser_pool
+from utils.clip_selection import selected_clip
+from utils.gif_engines import GIFEngine, get_engine, gif_dimensions
+
+
+def convert_to_gif(
+    video_path: str,
+    output_path: str,
+    max_duration: int = 2,
+    fps: int = 3,
+    engine: Optional[str] = None,
+    **options,
+):
+    """Convert a video to GIF with specified duration and FPS.
+
+    ``engine`` selects a backend from ``utils.gif_engines``; it defaults to
+    ``settings.GIF_ENGINE``. ``options`` are passed to the engine (``start``,
+    ``max_width``, ``max_colors``, ``dither``, ``dedupe``).
+    """
+    get_engine(engine or settings.GIF_ENGINE).convert(
+        video_path, output_path, max_duration, fps, **options
+    )
+
+
+def encode_gif(
+    video_path: str,
+    max_duration: int = 2,
+    fps: int = 3,
+    engine: Optional[str] = None,
+    max_bytes: int = 0,
+    **options,
+) -> bytes:
+    """Like ``convert_to_gif`` but return the GIF bytes instead of writing a file.
+
+    With ``max_bytes`` an oversized GIF is re-encoded up to
+    ``settings.GIF_OPTIMIZE_PASSES`` times, smaller and with fewer colours
+    each pass; the smallest attempt is returned even if it misses the target.
+    """
+    gif_engine = get_engine(engine or settings.GIF_ENGINE)
+    data = gif_engine.encode(video_path, max_duration, fps, **options)
+    return _shrink_gif(
+        gif_engine, data, video_path, max_duration, fps, max_bytes, options
+    )
+
+
+def _shrink_gif(
+    gif_engine: GIFEngine,
+    data: bytes,
+    video_path: str,
+    max_duration: int,
+    fps: int,
+    max_bytes: int,
+    options: dict,
+) -> bytes:
+    best = data
+    options = dict(options)
+    for _ in range(settings.GIF_OPTIMIZE_PASSES):
+        if not max_bytes or len(best) <= max_bytes:
+            break
+        width = gif_dimensions(data)[0]
+        # Size scales roughly with pixel count; aim a little under the target
+        scale = math.sqrt(max_bytes / len(data)) * 0.9
+        new_width = max(settings.GIF_MIN_WIDTH, int(width * scale))
+        colors = options.get("max_colors", 256)
+        if new_width >= width and colors <= 32:
+            break
+        options["max_width"] = min(new_width, width)
+        options["max_colors"] = max(32, colors // 2)
+        data = gif_engine.encode(video_path, max_duration, fps, **options)
+        if len(data) < len(best):
+            best = data
+    return best
+
+
+def render_clip(
+    video_path: str,
+    renditions: List[dict],
+    max_duration: int = 2,
+    fps: int = 3,
+    engine: Optional[str] = None,
+    max_bytes: int = 0,
+    select_clip: bool = False,
+    **options,
+) -> Tuple[bytes, List[bytes]]:
+    """Encode the GIF plus every extra rendition from one decode of the clip.
+
+    Each rendition is a dict with ``format``, ``max_width`` and ``fps``.
+    Returns the GIF and the rendition outputs in order. ``max_bytes``
+    applies to the GIF only, as in ``encode_gif``. With ``select_clip``
+    every output starts at the most active segment after ``start``
+    (see ``utils.clip_selection``); a URL is then fetched only once.
+    """
+    if select_clip:
+        with selected_clip(video_path, max_duration, options.get("start", 0)) as (
+            source,
+            start,
+        ):
+            return render_clip(
+                source,
+                renditions,
+                max_duration,
+                fps,
+                engine,
+                max_bytes,
+                **dict(options, start=start),
+            )
+    if not renditions:
+        return (
+            encode_gif(video_path, max_duration, fps, engine, max_bytes, **options),
+            [],
+        )
+    gif_engine = get_engine(engine or settings.GIF_ENGINE)
+    gif = {"format": "gif", "max_width": options.get("max_width", 0), "fps": fps}
+    shared = {k: v for k, v in options.items() if k != "max_width"}
+    outputs = gif_engine.render(video_path, max_duration, [gif, *renditions], **shared)
+    data = _shrink_gif(
+        gif_engine, outputs[0], video_path, max_duration, fps, max_bytes, options
+    )
+    return data, outputs[1:]
+
+
+async def _extract_douyin_video_url(url: str) -> str:
+    """Open the Douyin page in the browser pool; return the first video URL it loads."""
+    loop = asyncio.get_running_loop()
+    found = loop.create_future()
+
+    def capture(candidate: str):
+        if "video" in candidate and (
+            candidate.endswith(".mp4") or "mime_type=video_mp4" in candidate
+        ):
+            if not found.done():
+                found.set_result(candidate)
+
+    async with browser_pool.page() as page:
+        page.on("request", lambda request: capture(request.url))
+        page.on("response", lambda response: capture(response.url))
+        navigation = asyncio.create_task(
+            page.goto(url, timeout=120000, wait_until="domcontentloaded")
+        )
+
+        # Return as soon as the first video request is seen
+        deadline = loop.time() + settings.DOUYIN_EXTRACT_TIMEOUT
         try:
-            await page.wait_for_selector("video", timeout=15000)
-        except Exception:
-            pass
-        
-        await page.wait_for_timeout(5000)
-        await browser.close()
-    
-    if not video_url:
+            pending = {found, navigation}
+            while not found.done() and pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                if (
+                    navigation in done
+                    and navigation.exception() is not None
+                    and not found.done()
+                ):
+                    raise Exception(
+                        f"Failed to load Douyin page: {navigation.exception()}"
+                    )
+        finally:
+            navigation.cancel()
+            await asyncio.gather(navigation, return_exceptions=True)
+
+    if not found.done():
         raise Exception("Failed to extract video URL")
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
-        "Referer": "https://www.douyin.com/",
-        "Range": "bytes=0-"
-    }
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(video_url, headers=headers)
-        response.raise_for_status()
-        
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-    
-    return output_path 
\ No newline at end of file
+    return found.result()
+
+
+DOUYIN_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
+    ),
+    "Referer": "https://www.douyin.com/",
+    "Range": "bytes=0-",
+}
+
+
+async def resolve_douyin_video(url: str) -> str:
+    """Return the direct video URL behind a Douyin page, via Playwright."""
+    match = re.search(r"/video/(\d+)", url)
+    if not match:
+        raise ValueError("Unable to extract video ID from URL")
+
+    with metrics.stage("resolve"):
+        return await _extract_douyin_video_url(url)
@@ -1,86 +1,70 @@
-import httpx
-import asyncio
+from typing import List, Set
 from core.config import settings
+from utils.apify_runs import run_watcher, webhook_param
+from utils.http_client import http_client
+from utils.url_utils import normalize_url, youtube_video_id
 
 class YouTubeClient:
     def __init__(self):
         self.api_token = settings.APIFY_API_TOKEN
-        self.base_url = f"https://api.apify.com/v2/actor-tasks/{settings.YOUTUBE_SCRAPER_TASK_ID}/runs"
+        task_id = settings.YOUTUBE_SCRAPER_TASK_ID
+        self.base_url = f"{settings.APIFY_API_URL}/actor-tasks/{task_id}/runs"
 
-    async def run_actor_task(self, video_url: str) -> str:
-        """Run the Apify actor task for YouTube Shorts and return the run ID."""
+    async def run_actor_task(self, video_urls: List[str]) -> str:
+        """Run the Apify actor task for YouTube Shorts; return its run ID."""
         url = f"{self.base_url}?token={self.api_token}"
         headers = {"Content-Type": "application/json"}
-        
+
         data = {
             "includeFailedVideos": False,
-            "proxy": {
-                "useApifyProxy": True
-            },
+            "proxy": {"useApifyProxy": True},
             "quality": "480",
-            "startUrls": [video_url],
-            "useFfmpeg": False
+            "startUrls": video_urls,
+            "useFfmpeg": False,
         }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data, headers=headers)
-            response.raise_for_status()
-            return response.json()["data"]["id"]
+
+        webhooks = webhook_param()
+        params = {"webhooks": webhooks} if webhooks else None
+        response = await http_client.post(
+            url, json=data, headers=headers, params=params
+        )
+        response.raise_for_status()
+        return response.json()["data"]["id"]
 
     async def wait_for_completion(self, run_id: str) -> str:
         """Wait for the Apify run to complete and return the dataset ID."""
-        url = f"https://api.apify.com/v2/actor-runs/{run_id}?token={self.api_token}"
-        
-        while True:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                
-                status = data["data"]["status"]
-                if status == "SUCCEEDED":
-                    return data["data"]["defaultDatasetId"]
-                elif status == "FAILED":
-                    raise Exception(f"Apify run failed: {data['data'].get('error', 'Unknown error')}")
-                
-                await asyncio.sleep(5)
+        run = await run_watcher.wait(run_id, timeout=settings.APIFY_RUN_TIMEOUT)
+        return run["defaultDatasetId"]
 
     async def get_items(self, dataset_id: str) -> list:
         """Get items from the Apify dataset."""
-        url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?clean=true&token={self.api_token}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
+        url = (
+            f"{settings.APIFY_API_URL}/datasets/{dataset_id}/items"
+            f"?clean=true&token={self.api_token}"
+        )
+
+        response = await http_client.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_items(self, video_urls: List[str]) -> list:
+        """Resolve several videos in a single actor run and return the dataset items."""
+        run_id = await self.run_actor_task(video_urls)
+        dataset_id = await self.wait_for_completion(run_id)
+        return await self.get_items(dataset_id)
+
+    def match_key(self, video_url: str) -> str:
+        """Key used to pair a submitted URL with its dataset item."""
+        return youtube_video_id(video_url) or normalize_url(video_url)
 
-    async def download_video(self, video_url: str, output_path: str) -> str:
-        """Download a YouTube Shorts video using Apify."""
-        try:
-            # Run Apify actor task
-            run_id = await self.run_actor_task(video_url)
-            
-            # Wait for completion and get results
-            dataset_id = await self.wait_for_completion(run_id)
-            items = await self.get_items(dataset_id)
-            
-            if not items:
-                raise Exception("No items returned from Apify")
-            
-            # Get the first item's download URL
-            download_url = items[0].get('downloadUrl')
-            if not download_url:
-                raise Exception("No download URL returned from Apify")
-            
-            # Download the video
-            async with httpx.AsyncClient() as client:
-                response = await client.get(download_url)
-                response.raise_for_status()
-                
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-            
-            return output_path
-            
-        except Exception as e:
-            raise Exception(f"Failed to download YouTube Shorts video: {str(e)}") 
\ No newline at end of file
+    def item_keys(self, item: dict) -> Set[str]:
+        """Keys under which a dataset item can be matched to a submitted URL."""
+        keys = set()
+        for field in ("id", "videoId"):
+            if item.get(field):
+                keys.add(str(item[field]))
+        for field in ("input", "url", "sourceUrl", "originalUrl", "videoUrl"):
+            value = item.get(field)
+            if isinstance(value, str) and value:
+                keys.add(self.match_key(value))
+        return keys
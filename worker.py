@@ -0,0 +1,56 @@
+"""Queue worker: processes batch items enqueued by the API in ``EXECUTION_MODE=queue``.
+
+Run any number of these on the API's host:
+
+    python worker.py
+
+Workers share ``QUEUE_PATH`` and ``JOB_STORE_PATH`` with the API. Both are
+SQLite databases in WAL mode, which needs shared memory between the
+processes, so every worker must run on the same host as the API; the files
+must not live on NFS or another network filesystem.
+"""
+import asyncio
+import signal
+
+from core.config import settings
+from services.encoder import encoder_pool
+from services.job_store import create_job_store
+from services.queue_worker import QueueWorker
+from services.sheet_ledger import create_sheet_ledger
+from services.video_processor import VideoProcessor
+from services.work_queue import create_work_queue
+from utils.apify_runs import run_watcher
+from utils.browser_pool import browser_pool
+from utils.http_client import http_client
+
+
+async def main():
+    if settings.JOB_STORE == "memory":
+        raise SystemExit("worker.py needs JOB_STORE=sqlite so results reach the API")
+
+    processor = VideoProcessor()
+    worker = QueueWorker(
+        processor, create_job_store(), create_work_queue(), ledger=create_sheet_ledger()
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await http_client.start()
+    encoder_pool.start()
+    warm_browser = asyncio.create_task(browser_pool.warm_up())
+    print(f"Worker {worker.worker_id} started")
+    try:
+        await worker.run()
+    finally:
+        warm_browser.cancel()
+        await browser_pool.close()
+        await run_watcher.close()
+        await encoder_pool.close()
+        await http_client.close()
+        processor.close()
+        print(f"Worker {worker.worker_id} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())